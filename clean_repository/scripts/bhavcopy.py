@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+F&O Bhavcopy Bulk Ingestion
+Parses daily NSE F&O bhavcopy files into the canonical schema the derivatives_df collections use
+"""
+
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from schema import normalize
+
+# UDiFF (July 2024 onwards) instrument codes mapped to the legacy names
+UDIFF_INSTRUMENTS = {'IDO': 'OPTIDX', 'IDF': 'FUTIDX', 'STO': 'OPTSTK', 'STF': 'FUTSTK'}
+
+BHAVCOPY_PATTERNS = ('*.csv', '*.csv.zip', '*.zip')
+
+# Index lot sizes with the date each took effect (the trading day after the last expiry on the old lot)
+DEFAULT_LOT_SIZES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'calendar',
+                                      'nse_fo_lot_sizes.csv')
+
+
+def read_lot_sizes(path=DEFAULT_LOT_SIZES_FILE):
+    """Effective-dated lot table (SYMBOL, FROM_DATE, LOT), sorted by symbol and date"""
+    table = pd.read_csv(path, usecols=['SYMBOL', 'FROM_DATE', 'LOT'], parse_dates=['FROM_DATE'])
+    return table.sort_values(['SYMBOL', 'FROM_DATE']).reset_index(drop=True)
+
+
+def resolve_lots(symbols, dates, lot_sizes):
+    """Lot size in force for each (symbol, date); NaN for symbols or dates the table does not cover"""
+    symbols = pd.Series(symbols).astype(str).str.strip().to_numpy()
+    dates = np.asarray(pd.to_datetime(dates).values, dtype='datetime64[D]')
+    lots = np.full(len(symbols), np.nan)
+    if lot_sizes is None:
+        return lots
+    for symbol, periods in lot_sizes.groupby('SYMBOL'):
+        rows = np.flatnonzero(symbols == symbol)
+        period = np.searchsorted(periods['FROM_DATE'].values.astype('datetime64[D]'), dates[rows], side='right') - 1
+        lots[rows] = np.where(period >= 0, periods['LOT'].to_numpy(dtype=np.float64)[period], np.nan)
+    return lots
+
+
+def _parse_legacy(raw, lot_sizes):
+    """fo{DD}{MON}{YYYY}bhav.csv layout (INSTRUMENT, SYMBOL, EXPIRY_DT, ... TIMESTAMP)"""
+    dates = pd.to_datetime(raw['TIMESTAMP'], format='%d-%b-%Y')
+    lots = resolve_lots(raw['SYMBOL'], dates, lot_sizes)
+    return pd.DataFrame({
+        'DATE': dates,
+        'EXPIRY': pd.to_datetime(raw['EXPIRY_DT'], format='%d-%b-%Y'),
+        'OPTION TYPE': raw['OPTION_TYP'],
+        'STRIKE PRICE': raw['STRIKE_PR'].astype('float64'),
+        'OPEN': raw['OPEN'], 'HIGH': raw['HIGH'], 'LOW': raw['LOW'], 'CLOSE': raw['CLOSE'],
+        # The legacy file has no last-traded price column
+        'LTP': np.nan,
+        'SETTLE PRICE': raw['SETTLE_PR'],
+        # Volume is reported in contracts; quantities need the lot size
+        'TOTAL TRADED QUANTITY': raw['CONTRACTS'] * lots,
+        'MARKET LOT': lots,
+        'PREMIUM VALUE': raw['VAL_INLAKH'] * 1e5,
+        'OPEN INTEREST': raw['OPEN_INT'].astype('float64'),
+        'CHANGE IN OI': raw['CHG_IN_OI'].astype('float64'),
+        'SYMBOL': raw['SYMBOL'],
+        'INSTRUMENT_TYPE': raw['INSTRUMENT'],
+    })
+
+
+def _parse_udiff(raw):
+    """BhavCopy_NSE_FO_0_0_0_{YYYYMMDD}_F_0000.csv layout (TradDt, TckrSymb, XpryDt, ...)"""
+    return pd.DataFrame({
+        'DATE': pd.to_datetime(raw['TradDt']),
+        'EXPIRY': pd.to_datetime(raw['XpryDt']),
+        'OPTION TYPE': raw['OptnTp'],
+        'STRIKE PRICE': raw['StrkPric'].astype('float64'),
+        'OPEN': raw['OpnPric'], 'HIGH': raw['HghPric'], 'LOW': raw['LwPric'], 'CLOSE': raw['ClsPric'],
+        'LTP': raw['LastPric'],
+        'SETTLE PRICE': raw['SttlmPric'],
+        'TOTAL TRADED QUANTITY': raw['TtlTradgVol'],
+        'MARKET LOT': raw['NewBrdLotQty'],
+        'PREMIUM VALUE': raw['TtlTrfVal'],
+        'OPEN INTEREST': raw['OpnIntrst'].astype('float64'),
+        'CHANGE IN OI': raw['ChngInOpnIntrst'].astype('float64'),
+        'SYMBOL': raw['TckrSymb'],
+        'INSTRUMENT_TYPE': raw['FinInstrmTp'].map(UDIFF_INSTRUMENTS),
+    })
+
+
+def read_bhavcopy(path, lot_sizes=None):
+    """
+    Parse one F&O bhavcopy file (plain or zipped, legacy or UDiFF layout).
+
+    `lot_sizes` is a read_lot_sizes() table and is only needed for legacy
+    files, which report volume in contracts rather than quantity; each row
+    gets the lot in force on its DATE.
+    """
+    raw = pd.read_csv(path)
+    raw.columns = raw.columns.str.strip()
+    if 'TIMESTAMP' in raw.columns:
+        frame = _parse_legacy(raw, lot_sizes)
+    elif 'TradDt' in raw.columns:
+        frame = _parse_udiff(raw)
+    else:
+        raise ValueError(f"Unrecognised bhavcopy layout: {path}")
+
+    frame['SYMBOL'] = frame['SYMBOL'].str.strip()
+    futures = frame['INSTRUMENT_TYPE'].str.startswith('FUT')
+    frame.loc[futures, 'STRIKE PRICE'] = np.nan
+    frame['OPTION TYPE'] = frame['OPTION TYPE'].where(~futures)
+    # YEAR/MONTH (expiry month) are filled in by the canonical schema
+    return normalize(frame)
+
+
+def filter_bhavcopy(frame, symbols=None, instrument_types=('OPTIDX',), expiries=None):
+    """Keep only the requested underlyings, instrument types and expiries"""
+    mask = pd.Series(True, index=frame.index)
+    if symbols is not None:
+        mask &= frame['SYMBOL'].isin(symbols)
+    if instrument_types is not None:
+        mask &= frame['INSTRUMENT_TYPE'].isin(instrument_types)
+    if expiries is not None:
+        mask &= frame['EXPIRY'].isin(pd.to_datetime(list(expiries)))
+    return frame[mask].reset_index(drop=True)
+
+
+def bhavcopy_paths(directory):
+    """All bhavcopy files under a directory, oldest name first"""
+    paths = set()
+    for pattern in BHAVCOPY_PATTERNS:
+        paths.update(glob.glob(os.path.join(directory, '**', pattern), recursive=True))
+    return sorted(paths)
+
+
+def iter_bhavcopies(paths, symbols=None, instrument_types=('OPTIDX',), expiries=None, lot_sizes=None):
+    """Yield (path, filtered frame) per file, skipping files that fail to parse"""
+    for path in paths:
+        try:
+            frame = read_bhavcopy(path, lot_sizes)
+        except (ValueError, KeyError, OSError) as e:
+            print(f"   ⚠️  Skipping {os.path.basename(path)}: {str(e)[:50]}...")
+            continue
+        yield path, filter_bhavcopy(frame, symbols, instrument_types, expiries)
+
+
+def download_bhavcopies(dates, dest, rate=1.0):
+    """Save the F&O bhavcopy for each date into `dest` via jugaad_data (holidays are skipped)"""
+    from jugaad_data.nse import bhavcopy_fo_save
+    from fetch_engine import TokenBucket
+
+    os.makedirs(dest, exist_ok=True)
+    limiter = TokenBucket(rate, burst=1)
+    saved = []
+    for day in dates:
+        limiter.acquire()
+        try:
+            saved.append(bhavcopy_fo_save(day, dest))
+        except Exception as e:
+            print(f"   ⚠️  No bhavcopy for {day}: {str(e)[:50]}...")
+    return saved
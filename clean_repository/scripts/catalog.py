@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Partition Statistics Catalog
+SQLite sidecar per store with row counts, date ranges, strikes, expiries, null counts and checksums of every part file
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+CATALOG_FILE = '_catalog.sqlite'
+
+
+def file_checksum(path):
+    """sha256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _partition_of(relative):
+    """(symbol, year, month) from a symbol=/year=/month=/part path"""
+    symbol_dir, year_dir, month_dir = relative.split(os.sep)[:3]
+    return symbol_dir.split('=', 1)[1], int(year_dir.split('=', 1)[1]), int(month_dir.split('=', 1)[1])
+
+
+def frame_stats(frame):
+    """Catalog statistics of the rows written to one file"""
+    dates = pd.to_datetime(frame['DATE']) if 'DATE' in frame else pd.Series(dtype='datetime64[ns]')
+    strikes = frame['STRIKE PRICE'].dropna().unique() if 'STRIKE PRICE' in frame else []
+    expiries = pd.to_datetime(frame['EXPIRY']).dropna().unique() if 'EXPIRY' in frame else []
+    nulls = frame.isna().sum()
+    return {
+        'rows': len(frame),
+        'min_date': str(dates.min().date()) if len(dates.dropna()) else None,
+        'max_date': str(dates.max().date()) if len(dates.dropna()) else None,
+        'strikes': json.dumps(sorted(float(strike) for strike in strikes)),
+        'expiries': json.dumps(sorted(str(pd.Timestamp(expiry).date()) for expiry in expiries)),
+        'null_counts': json.dumps({column: int(count) for column, count in nulls.items() if count}),
+    }
+
+
+class PartitionCatalog:
+    """
+    Statistics of every part file of one symbol=/year=/month= store.
+
+    Writers record each file as they write it (stats come from the frame in
+    hand, so nothing is re-read); refresh() picks up files written without
+    the catalog. The partitions view aggregates per partition.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, CATALOG_FILE)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                symbol TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                month INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                min_date TEXT,
+                max_date TEXT,
+                strikes TEXT,
+                expiries TEXT,
+                null_counts TEXT,
+                size INTEGER,
+                mtime_ns INTEGER,
+                checksum TEXT,
+                updated REAL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_partition ON files (symbol, year, month)")
+        self._db.execute("""
+            CREATE VIEW IF NOT EXISTS partitions AS
+            SELECT symbol, year, month, COUNT(*) AS files, SUM(rows) AS rows,
+                   MIN(min_date) AS min_date, MAX(max_date) AS max_date, SUM(size) AS size
+            FROM files GROUP BY symbol, year, month
+        """)
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def record(self, path, frame):
+        """Record (or replace) the statistics of one part file written from `frame`"""
+        relative = os.path.relpath(path, self.root)
+        symbol, year, month = _partition_of(relative)
+        stats = frame_stats(frame)
+        stat = os.stat(path)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (relative, symbol, year, month, stats['rows'], stats['min_date'], stats['max_date'],
+                 stats['strikes'], stats['expiries'], stats['null_counts'], stat.st_size, stat.st_mtime_ns,
+                 file_checksum(path), time.time()))
+            self._db.commit()
+
+    def forget_partition(self, symbol, year, month):
+        with self._lock:
+            self._db.execute("DELETE FROM files WHERE symbol = ? AND year = ? AND month = ?",
+                             (symbol, int(year), int(month)))
+            self._db.commit()
+
+    def refresh(self):
+        """Record part files that are new or changed since they were cataloged and drop vanished ones"""
+        known = {path: (size, mtime) for path, size, mtime in
+                 self._db.execute("SELECT path, size, mtime_ns FROM files")}
+        present = [os.path.relpath(path, self.root) for path in
+                   glob.glob(os.path.join(self.root, 'symbol=*', 'year=*', 'month=*', '*.parquet'))]
+        changed = 0
+        for relative in present:
+            stat = os.stat(os.path.join(self.root, relative))
+            if known.get(relative) != (stat.st_size, stat.st_mtime_ns):
+                path = os.path.join(self.root, relative)
+                self.record(path, pq.read_table(path, memory_map=True).to_pandas())
+                changed += 1
+        vanished = set(known) - set(present)
+        with self._lock:
+            self._db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in vanished])
+            self._db.commit()
+        return changed + len(vanished)
+
+    def partitions(self, symbol=None):
+        """Per-partition totals (files, rows, DATE range, bytes)"""
+        query = "SELECT * FROM partitions"
+        params = ()
+        if symbol is not None:
+            query += " WHERE symbol = ?"
+            params = (symbol,)
+        return pd.read_sql_query(query + " ORDER BY symbol, year, month", self._db, params=params)
+
+    def files(self, symbol=None):
+        """Per-file statistics and checksums (paths relative to the store)"""
+        query = "SELECT path, year, month, rows, min_date, max_date, checksum FROM files"
+        params = ()
+        if symbol is not None:
+            query += " WHERE symbol = ?"
+            params = (symbol,)
+        return pd.read_sql_query(query + " ORDER BY path", self._db, params=params)
+
+    def skippable(self, symbol, start=None, end=None, strikes=None):
+        """
+        Part files (absolute paths) of a symbol that cannot hold rows for a query.
+
+        A file is skippable when its DATE range misses [start, end] or it holds
+        none of `strikes`. Files changed on disk since they were cataloged are
+        never skipped, whatever their recorded statistics say.
+        """
+        rows = self._db.execute("SELECT path, min_date, max_date, strikes, size, mtime_ns FROM files "
+                                "WHERE symbol = ?", (symbol,)).fetchall()
+        start = str(pd.Timestamp(start).date()) if start is not None else None
+        end = str(pd.Timestamp(end).date()) if end is not None else None
+        wanted = {float(strike) for strike in strikes} if strikes is not None else None
+        skipped = set()
+        for relative, min_date, max_date, file_strikes, size, mtime in rows:
+            path = os.path.join(self.root, relative)
+            if not os.path.exists(path):
+                continue
+            stat = os.stat(path)
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                continue
+            if ((start is not None and max_date is not None and max_date < start)
+                    or (end is not None and min_date is not None and min_date > end)
+                    or (wanted is not None and not wanted & set(json.loads(file_strikes)))):
+                skipped.add(path)
+        return skipped
+
+    def coverage(self, symbol, start, end):
+        """Rows per expiry month from start to end, 0 where a month has no data"""
+        months = pd.period_range(pd.Timestamp(start), pd.Timestamp(end), freq='M')
+        rows = self.partitions(symbol).set_index(['year', 'month'])['rows']
+        return pd.Series([int(rows.get((month.year, month.month), 0)) for month in months],
+                         index=months.astype(str), name='rows')
+
+    def gaps(self, symbol, start, end):
+        """Expiry months between start and end with no rows, as 'YYYY-MM' strings"""
+        coverage = self.coverage(symbol, start, end)
+        return list(coverage.index[coverage == 0])
+
+    def fingerprint(self, symbol=None):
+        """Digest of the checksums of a symbol's (or every) part file; changes whenever data changes"""
+        query = "SELECT path, checksum FROM files"
+        params = ()
+        if symbol is not None:
+            query += " WHERE symbol = ?"
+            params = (symbol,)
+        digest = hashlib.sha256()
+        for path, checksum in self._db.execute(query + " ORDER BY path", params):
+            digest.update(f'{path}:{checksum};'.encode())
+        return digest.hexdigest()[:16]
+
+    def describe(self, symbol):
+        """One-line summary of a symbol's coverage"""
+        partitions = self.partitions(symbol)
+        if partitions.empty:
+            return f"{symbol}: no data"
+        first, last = partitions.iloc[0], partitions.iloc[-1]
+        return (f"{symbol}: {int(partitions['rows'].sum())} rows in {len(partitions)} partitions, "
+                f"{partitions['min_date'].min()} to {partitions['max_date'].max()} "
+                f"(expiries {int(first['year'])}-{int(first['month']):02d} to "
+                f"{int(last['year'])}-{int(last['month']):02d})")
+
+
+def main():
+    """Catalog one or more stores and report their coverage"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('roots', nargs='+', help="dataset directories (symbol=/year=/month= stores)")
+    parser.add_argument('--start', help="report months without data from here")
+    parser.add_argument('--end', help="... up to here")
+    args = parser.parse_args()
+
+    for root in args.roots:
+        catalog = PartitionCatalog(root)
+        changed = catalog.refresh()
+        print(f"🗂️  {root} ({changed} catalog entries updated)")
+        for symbol in catalog.partitions()['symbol'].unique():
+            print(f"   {catalog.describe(symbol)}")
+            if args.start and args.end:
+                gaps = catalog.gaps(symbol, args.start, args.end)
+                if gaps:
+                    print(f"   ⚠️  {symbol} missing: {', '.join(gaps)}")
+        catalog.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Sorted Option-Chain Index
+Composite integer keys over (DATE, EXPIRY, STRIKE PRICE, OPTION TYPE) with searchsorted lookups, saved for mmap loading
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from parquet_store import list_partitions, read_dataset
+from schema import KEY_COLUMNS, normalize
+
+INDEX_DIR = '_index'
+INDEX_VERSION = 1
+
+# Key layout: days since EPOCH (16 bits each for DATE and EXPIRY), strike in 0.05 ticks
+# (24 bits, strikes up to 838,860) and option type (2 bits: CE, PE, none for futures)
+EPOCH = np.datetime64('1990-01-01', 'D')
+DAY_BITS = 16
+STRIKE_BITS = 24
+TYPE_BITS = 2
+STRIKE_TICK = 0.05
+OPTION_CODES = {'CE': 0, 'PE': 1}
+NO_OPTION = 2
+
+ENTRY = np.dtype([('key', '<i8'), ('row', '<i8')])
+
+
+def _days(values):
+    days = (np.asarray(values, dtype='datetime64[D]') - EPOCH).astype(np.int64)
+    if days.size and (days.min() < 0 or days.max() >= 1 << DAY_BITS):
+        raise ValueError("dates outside the index key range")
+    return days
+
+
+def _strikes(values):
+    strikes = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(strikes), 0, np.rint(strikes / STRIKE_TICK)).astype(np.int64)
+
+
+def _types(values):
+    return np.asarray([OPTION_CODES.get(value, NO_OPTION) for value in values], dtype=np.int64)
+
+
+def chain_keys(date, expiry, option_type, strike):
+    """DATE-major key: one day's chain, then expiry, option type and strike"""
+    return ((date << (DAY_BITS + TYPE_BITS + STRIKE_BITS)) | (expiry << (TYPE_BITS + STRIKE_BITS))
+            | (option_type << STRIKE_BITS) | strike)
+
+
+def contract_keys(expiry, option_type, strike, date):
+    """Contract-major key: expiry, option type and strike, then the contract's days"""
+    return ((expiry << (TYPE_BITS + STRIKE_BITS + DAY_BITS)) | (option_type << (STRIKE_BITS + DAY_BITS))
+            | (strike << DAY_BITS) | date)
+
+
+def _sorted_entries(keys):
+    order = np.argsort(keys, kind='stable')
+    entries = np.empty(len(keys), dtype=ENTRY)
+    entries['key'] = keys[order]
+    entries['row'] = order
+    return entries
+
+
+class ChainIndex:
+    """
+    Immutable lookup structure over one symbol's rows.
+
+    Rows are stored in chain order (DATE, EXPIRY, OPTION TYPE, STRIKE PRICE), so
+    a day's chain is a contiguous slice. A second sorted (key, row) array in
+    contract order serves time series and expiry-wide lookups. Every lookup is
+    two searchsorted calls on a key prefix.
+    """
+
+    def __init__(self, chain, contracts, frame=None):
+        self.chain = chain
+        self.contracts = contracts
+        self._frame = frame
+
+    @classmethod
+    def build(cls, frame):
+        """Index a canonical frame; the frame is re-ordered into chain order"""
+        frame = normalize(frame)
+        date = _days(frame['DATE'].values)
+        expiry = _days(frame['EXPIRY'].values)
+        option_type = _types(frame['OPTION TYPE'].astype(object).values)
+        strike = _strikes(frame['STRIKE PRICE'].values)
+
+        chain = _sorted_entries(chain_keys(date, expiry, option_type, strike))
+        frame = frame.iloc[chain['row']].reset_index(drop=True)
+        position = np.empty(len(chain), dtype=np.int64)
+        position[chain['row']] = np.arange(len(chain))
+        chain['row'] = np.arange(len(chain))
+
+        contracts = _sorted_entries(contract_keys(expiry, option_type, strike, date))
+        contracts['row'] = position[contracts['row']]
+        return cls(chain, contracts, frame)
+
+    def save(self, directory):
+        """Write the key arrays (.npy) and the chain-ordered rows (.parquet), replacing any old index"""
+        staging = directory.rstrip(os.sep) + '.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        np.save(os.path.join(staging, 'chain.npy'), self.chain)
+        np.save(os.path.join(staging, 'contracts.npy'), self.contracts)
+        self.frame().to_parquet(os.path.join(staging, 'rows.parquet'), index=False)
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'rows': len(self.chain)}, f)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+        return directory
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Open a saved index; key arrays are memory-mapped and rows read on first use"""
+        mode = 'r' if mmap else None
+        index = cls(np.load(os.path.join(directory, 'chain.npy'), mmap_mode=mode),
+                    np.load(os.path.join(directory, 'contracts.npy'), mmap_mode=mode))
+        index.directory = directory
+        return index
+
+    def frame(self):
+        """Rows in chain order; lookup results are positions into this frame"""
+        if self._frame is None:
+            self._frame = pd.read_parquet(os.path.join(self.directory, 'rows.parquet'), memory_map=True)
+        return self._frame
+
+    def __len__(self):
+        return len(self.chain)
+
+    @staticmethod
+    def _range(entries, low, high):
+        keys = entries['key']
+        return int(np.searchsorted(keys, low, side='left')), int(np.searchsorted(keys, high, side='left'))
+
+    def day_chain(self, date, expiry=None, option_type=None):
+        """Slice of the rows traded on `date`, optionally one expiry (and one option type) of it"""
+        date = int(_days([date])[0])
+        if expiry is None:
+            low = chain_keys(date, 0, 0, 0)
+            high = chain_keys(date + 1, 0, 0, 0)
+        elif option_type is None:
+            expiry = int(_days([expiry])[0])
+            low = chain_keys(date, expiry, 0, 0)
+            high = chain_keys(date, expiry + 1, 0, 0)
+        else:
+            expiry = int(_days([expiry])[0])
+            code = OPTION_CODES[option_type]
+            low = chain_keys(date, expiry, code, 0)
+            high = chain_keys(date, expiry, code + 1, 0)
+        start, stop = self._range(self.chain, low, high)
+        return slice(start, stop)
+
+    def series(self, expiry, strike, option_type):
+        """Row positions of one contract's daily rows, in date order"""
+        expiry = int(_days([expiry])[0])
+        code = OPTION_CODES[option_type]
+        strike = int(_strikes([strike])[0])
+        low = contract_keys(expiry, code, strike, 0)
+        high = contract_keys(expiry, code, strike + 1, 0)
+        start, stop = self._range(self.contracts, low, high)
+        return np.asarray(self.contracts['row'][start:stop])
+
+    def expiry_rows(self, expiry, option_type=None):
+        """Row positions of every strike (and day) of one expiry, by option type, strike, then date"""
+        expiry = int(_days([expiry])[0])
+        if option_type is None:
+            low = contract_keys(expiry, 0, 0, 0)
+            high = contract_keys(expiry + 1, 0, 0, 0)
+        else:
+            code = OPTION_CODES[option_type]
+            low = contract_keys(expiry, code, 0, 0)
+            high = contract_keys(expiry, code + 1, 0, 0)
+        start, stop = self._range(self.contracts, low, high)
+        return np.asarray(self.contracts['row'][start:stop])
+
+    def locate(self, date, expiry, strike, option_type):
+        """Row position of one contract-day, or -1 when it is not in the data"""
+        key = chain_keys(int(_days([date])[0]), int(_days([expiry])[0]), OPTION_CODES[option_type],
+                         int(_strikes([strike])[0]))
+        position = int(np.searchsorted(self.chain['key'], key))
+        if position < len(self.chain) and self.chain['key'][position] == key:
+            return int(self.chain['row'][position])
+        return -1
+
+
+def index_path(root, symbol):
+    """Directory of a symbol's saved chain index inside a dataset root"""
+    return os.path.join(root, INDEX_DIR, f'symbol={symbol}')
+
+
+def build_dataset_index(root, symbol):
+    """(Re)build and save the chain index of one symbol of a Parquet store"""
+    frame = read_dataset(root, symbol=symbol)
+    if frame.empty:
+        return None
+    # Part files may overlap; the index holds one row per contract-day
+    frame = frame.drop_duplicates(KEY_COLUMNS, keep='last')
+    return ChainIndex.build(frame).save(index_path(root, symbol))
+
+
+def build_indexes(root, symbols=None):
+    """Rebuild the chain index of every symbol (or the given ones) of a store; run after ingest"""
+    symbols = symbols or sorted({symbol for symbol, _, _ in list_partitions(root)})
+    return {symbol: build_dataset_index(root, symbol) for symbol in symbols}
+
+
+def load_dataset_index(root, symbol, mmap=True):
+    return ChainIndex.load(index_path(root, symbol), mmap=mmap)
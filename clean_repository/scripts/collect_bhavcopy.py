@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Collect Full Option Chains from Daily F&O Bhavcopy Files
+One file per trading day covers every strike and expiry, replacing per-strike API calls
+"""
+
+from datetime import date
+import os
+
+from bhavcopy import DEFAULT_LOT_SIZES_FILE, bhavcopy_paths, download_bhavcopies, iter_bhavcopies, read_lot_sizes
+from catalog import PartitionCatalog
+from expiry_calendar import ExpiryCalendar
+from stream_writer import PartitionWriter, RunningSummary
+
+def trading_days(start, end):
+    """Exchange trading days between start and end (weekends and listed holidays excluded)"""
+    return ExpiryCalendar().trading_days(start, end)
+
+def collect_from_bhavcopies(bhavcopy_dir, output_dir, symbols, lot_sizes_file=DEFAULT_LOT_SIZES_FILE):
+    """Stream every local bhavcopy, filtered to the symbols, into per-month option partitions"""
+    paths = bhavcopy_paths(bhavcopy_dir)
+    # Legacy files report contracts; quantities and MARKET LOT come from the lot in force on each DATE
+    lot_sizes = read_lot_sizes(lot_sizes_file)
+    print(f"📂 Found {len(paths)} bhavcopy files in {bhavcopy_dir}")
+
+    # One file (trading day) is the batch: it is written and folded into the totals, then dropped
+    writer = PartitionWriter(output_dir)
+    summaries = {symbol: RunningSummary() for symbol in symbols}
+    expiries = {symbol: set() for symbol in symbols}
+    strikes = {symbol: set() for symbol in symbols}
+    for path, data in iter_bhavcopies(paths, symbols=symbols, lot_sizes=lot_sizes):
+        batch_name = os.path.basename(path).split('.')[0]
+        for symbol, symbol_data in data.groupby('SYMBOL', observed=True):
+            # Same symbol=/year=/month= (expiry month) partitions as maximize_working_symbols.py
+            writer.write(symbol_data, symbol, batch_name)
+            summaries[symbol].update(symbol_data)
+            expiries[symbol].update(symbol_data['EXPIRY'].unique())
+            strikes[symbol].update(symbol_data['STRIKE PRICE'].dropna().unique())
+
+    results = {}
+    for symbol in symbols:
+        summary = summaries[symbol]
+        if not summary.total_records:
+            print(f"\n❌ {symbol}: No data")
+            continue
+
+        results[symbol] = {
+            'total_records': summary.total_records,
+            'expiries': len(expiries[symbol]),
+            'strikes': len(strikes[symbol]),
+            'date_range': summary.date_range
+        }
+        print(f"\n✅ {symbol}: {results[symbol]['total_records']} records, "
+              f"{results[symbol]['expiries']} expiries, {results[symbol]['strikes']} strikes")
+
+    if not results:
+        print(f"\n❌ No matching rows in any bhavcopy")
+        return None
+    return results
+
+def main():
+    """Main function"""
+    print("🚀 Bhavcopy-Based Options Collection")
+    print("=" * 70)
+    print("Strategy: One bhavcopy per trading day -> full chains for every expiry")
+    print("=" * 70)
+
+    bhavcopy_dir = "bhavcopy_fo"
+    output_dir = "bhavcopy_options"
+    symbols = ['NIFTY', 'BANKNIFTY']
+
+    if not bhavcopy_paths(bhavcopy_dir):
+        print(f"📥 No local bhavcopies, downloading 2020-2024 into {bhavcopy_dir}")
+        download_bhavcopies(trading_days(date(2020, 1, 1), date(2024, 12, 31)), bhavcopy_dir)
+
+    results = collect_from_bhavcopies(bhavcopy_dir, output_dir, symbols)
+
+    if results:
+        catalog = PartitionCatalog(output_dir)
+        print(f"\n📊 Catalog: {catalog.path}")
+        for symbol in results:
+            print(f"   {catalog.describe(symbol)}")
+        catalog.close()
+
+if __name__ == "__main__":
+    main()
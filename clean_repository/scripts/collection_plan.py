@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Declarative Collection Plan
+Expands collection_plan.yaml into one deduplicated, window-coalesced request graph and runs it
+"""
+
+import argparse
+import os
+from dataclasses import dataclass, replace
+from datetime import timedelta
+
+import pandas as pd
+import yaml
+
+from catalog import PartitionCatalog
+from chain_index import build_indexes
+from enrichment import enrich_store
+from expiry_calendar import MONTHLY, ExpiryCalendar
+from fetch_engine import FetchJob, run_jobs, tag_frame
+from greeks import greeks_store
+from job_manifest import JobManifest
+from liquidity import liquidity_store
+from response_cache import ResponseCache
+from stream_writer import PartitionWriter, RunningSummary
+from strike_planner import StrikePlanner
+from validator import Validator
+from vol_surface import build_surfaces
+
+DEFAULT_PLAN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'collection_plan.yaml')
+
+STRIKE_POLICIES = ('atm_ladder', 'fixed')
+
+
+@dataclass(frozen=True)
+class Collection:
+    """One named entry of the plan: what to fetch and where its rows go"""
+    name: str
+    output_dir: str
+    symbols: tuple
+    months: tuple
+    instruments: tuple = ('OPTIDX',)
+    option_types: tuple = ('CE', 'PE')
+    expiries: tuple = (MONTHLY,)
+    strike_policy: str = 'atm_ladder'
+    strike_count: int = 3
+    strikes: tuple = ()
+    window_days: int = 30
+
+
+def _months(periods):
+    """(year, month) of every month covered by the plan's {start, end} periods, in order"""
+    months = []
+    for period in periods:
+        for month in pd.period_range(str(period['start']), str(period['end']), freq='M'):
+            if (month.year, month.month) not in months:
+                months.append((month.year, month.month))
+    return tuple(months)
+
+
+def load_plan(path=DEFAULT_PLAN_FILE):
+    """Collections of the plan file by name, with `defaults` applied to each"""
+    with open(path) as f:
+        raw = yaml.safe_load(f)
+    defaults = raw.get('defaults', {})
+    collections = {}
+    for name, entry in raw['collections'].items():
+        spec = dict(defaults, **entry)
+        strikes = dict(defaults.get('strikes', {}), **spec.get('strikes', {}))
+        policy = strikes.get('policy', 'atm_ladder')
+        if policy not in STRIKE_POLICIES:
+            raise ValueError(f"{name}: unknown strike policy {policy!r} (expected one of {STRIKE_POLICIES})")
+        collections[name] = Collection(
+            name=name,
+            output_dir=spec['output_dir'],
+            symbols=tuple(spec['symbols']),
+            months=_months(spec['periods']),
+            instruments=tuple(spec.get('instruments', ('OPTIDX',))),
+            option_types=tuple(spec.get('option_types', ('CE', 'PE'))),
+            expiries=tuple(spec.get('expiries', (MONTHLY,))),
+            strike_policy=policy,
+            strike_count=int(strikes.get('count', 3)),
+            strikes=tuple(float(strike) for strike in strikes.get('values', ())),
+            window_days=int(spec.get('window_days', 30)),
+        )
+    return collections
+
+
+def collection_expiries(collection, symbol, calendar):
+    """Expiry dates of a collection for one symbol, in month order"""
+    expiries = []
+    for year, month in collection.months:
+        start = pd.Timestamp(year, month, 1)
+        end = start + pd.offsets.MonthEnd(0)
+        for kind in collection.expiries:
+            expiries.extend(calendar.expiries(symbol, start, end, kind=kind))
+    return sorted(set(expiries))
+
+
+def expand(collection, calendar, planner):
+    """
+    Every request a collection asks for, each with an explicit window.
+
+    Expiries whose request window has no underlying closes get no requests at
+    all (see StrikePlanner), futures included.
+    """
+    jobs = []
+    for symbol in collection.symbols:
+        for expiry in collection_expiries(collection, symbol, calendar):
+            from_date = expiry - timedelta(days=collection.window_days)
+            if collection.strike_policy == 'fixed':
+                strikes = list(collection.strikes)
+            else:
+                strikes = planner.strikes(symbol, expiry, collection.strike_count, from_date=from_date)
+                if not strikes:
+                    continue
+            base = FetchJob(symbol, expiry, from_date=from_date, to_date=expiry,
+                            year=expiry.year, month=expiry.month)
+            for instrument in collection.instruments:
+                if instrument.startswith('FUT'):
+                    jobs.append(replace(base, instrument_type=instrument))
+                    continue
+                jobs.extend(replace(base, instrument_type=instrument, strike_price=strike, option_type=option_type)
+                            for strike in strikes for option_type in collection.option_types)
+    return jobs
+
+
+def _contract(job):
+    return (job.symbol, job.instrument_type, job.expiry_date, job.strike_price, job.option_type)
+
+
+def coalesce(jobs):
+    """
+    Merge requests for the same contract whose windows overlap or touch.
+
+    Returns (requests, consumers) where consumers maps each merged request to
+    the original jobs it serves.
+    """
+    by_contract = {}
+    for job in jobs:
+        by_contract.setdefault(_contract(job), []).append(job)
+
+    consumers = {}
+    for contract_jobs in by_contract.values():
+        contract_jobs.sort(key=lambda job: (job.from_date, job.to_date))
+        group = [contract_jobs[0]]
+        start, end = contract_jobs[0].from_date, contract_jobs[0].to_date
+        for job in contract_jobs[1:]:
+            if job.from_date <= end + timedelta(days=1):
+                group.append(job)
+                end = max(end, job.to_date)
+                continue
+            consumers[replace(group[0], from_date=start, to_date=end)] = group
+            group = [job]
+            start, end = job.from_date, job.to_date
+        consumers[replace(group[0], from_date=start, to_date=end)] = group
+    return list(consumers), consumers
+
+
+class RequestPlan:
+    """Deduplicated request graph for a set of collections"""
+
+    def __init__(self, collections, calendar=None, planner=None):
+        self.collections = {collection.name: collection for collection in collections}
+        calendar = calendar or ExpiryCalendar()
+        planner = planner or StrikePlanner()
+        # (collection name, job) pairs: the same job may be wanted by several collections
+        self.wanted = [(collection.name, job) for collection in collections
+                       for job in expand(collection, calendar, planner)]
+        self.skipped = list(planner.skipped)
+        unique = sorted({job for _, job in self.wanted}, key=lambda job: (
+            job.symbol, job.expiry_date, job.instrument_type, job.strike_price or 0.0, job.option_type or '',
+            job.from_date))
+        self.requests, self.consumers = coalesce(unique)
+        self.destinations = {}
+        for name, job in self.wanted:
+            self.destinations.setdefault(job, []).append(name)
+
+    def describe(self):
+        unique = len({job for _, job in self.wanted})
+        return (f"{len(self.wanted)} planned, {unique} unique, {len(self.requests)} requests after coalescing"
+                f" ({len(self.skipped)} expiries skipped)")
+
+    def request_counts(self):
+        """Expected request count per collection before dedup"""
+        counts = {name: 0 for name in self.collections}
+        for name, _ in self.wanted:
+            counts[name] += 1
+        return counts
+
+
+def _window(data, job):
+    """Rows of a merged response that fall inside one original job's window"""
+    dates = pd.to_datetime(data['DATE'])
+    return data[(dates >= pd.Timestamp(job.from_date)) & (dates <= pd.Timestamp(job.to_date))]
+
+
+def run_collections(names=None, plan_file=DEFAULT_PLAN_FILE, dry_run=False, **run_kwargs):
+    """
+    Fetch every request of the named collections (all by default) once and route the rows.
+
+    Each original job's slice is written to its collection's output store as
+    part-{job key} (rows failing validation are quarantined next to it), and
+    folded into a RunningSummary per (collection, symbol).
+    The chain index and enriched copy of every store written to are rebuilt at the end.
+    Returns {collection: {symbol: RunningSummary}}, or the RequestPlan when
+    dry_run is set.
+    """
+    collections = load_plan(plan_file)
+    names = list(names or collections)
+    missing = [name for name in names if name not in collections]
+    if missing:
+        raise KeyError(f"Collections not in {plan_file}: {missing}")
+
+    plan = RequestPlan([collections[name] for name in names])
+    for name, count in plan.request_counts().items():
+        print(f"   📋 {name}: {count} requests -> {collections[name].output_dir}")
+    print(f"📡 {plan.describe()}")
+    if dry_run:
+        return plan
+
+    writers = {}
+    validator = Validator()
+    summaries = {name: {} for name in names}
+    manifest = JobManifest('plan_' + '_'.join(sorted(names)))
+    results = run_jobs(plan.requests, cache=ResponseCache(), manifest=manifest, **run_kwargs)
+    for request, data, error in results:
+        if error is not None:
+            print(f"   ⚠️  {request.symbol} {request.instrument_type} {request.expiry_date} "
+                  f"{request.strike_price or ''} {request.option_type or ''} error: {str(error)[:50]}...")
+            continue
+        if data is None:
+            continue
+        written = set()
+        for job in plan.consumers[request]:
+            rows = tag_frame(job, _window(data, job).copy())
+            if rows.empty:
+                continue
+            for name in plan.destinations[job]:
+                output_dir = collections[name].output_dir
+                if (output_dir, job) not in written:
+                    writer = writers.setdefault(output_dir, PartitionWriter(output_dir, validator))
+                    writer.write(rows, job.symbol, job.key[:16])
+                    written.add((output_dir, job))
+                summaries[name].setdefault(job.symbol, RunningSummary()).update(rows, job.year, job.month)
+    for output_dir in writers:
+        build_indexes(output_dir)
+        enrich_store(output_dir)
+        greeks_store(output_dir)
+        build_surfaces(output_dir)
+        liquidity_store(output_dir)
+    print(f"   🔍 Validation: {validator.describe()}")
+    print(f"   🗂️  Manifest: {manifest.describe()}")
+    return summaries
+
+
+def report_coverage(collection):
+    """Print what a collection's store holds per symbol, and its planned months with no data, from the catalog"""
+    catalog = PartitionCatalog(collection.output_dir)
+    (first_year, first_month), (last_year, last_month) = collection.months[0], collection.months[-1]
+    planned = {f'{year}-{month:02d}' for year, month in collection.months}
+    for symbol in collection.symbols:
+        print(f"   🗂️  {catalog.describe(symbol)}")
+        gaps = [month for month in catalog.gaps(symbol, f'{first_year}-{first_month:02d}',
+                                                f'{last_year}-{last_month:02d}') if month in planned]
+        if gaps:
+            print(f"   ⚠️  {symbol} missing: {', '.join(gaps)}")
+    catalog.close()
+
+
+def main():
+    """Run (or just plan) the named collections of the collection plan"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('collections', nargs='*', help="collection names (default: all)")
+    parser.add_argument('--plan', default=DEFAULT_PLAN_FILE, help="plan file")
+    parser.add_argument('--dry-run', action='store_true', help="only report the expected request count")
+    args = parser.parse_args()
+
+    print("🚀 NSE Derivatives Collection Plan")
+    print("=" * 70)
+    summaries = run_collections(args.collections, args.plan, dry_run=args.dry_run)
+    if args.dry_run:
+        return
+
+    collections = load_plan(args.plan)
+    for name, by_symbol in summaries.items():
+        print(f"\n📊 {name}:")
+        for symbol, summary in by_symbol.items():
+            print(f"   {symbol}: {summary.total_records} records, {summary.date_range}")
+        report_coverage(collections[name])
+
+if __name__ == "__main__":
+    main()
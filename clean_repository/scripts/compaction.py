@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Cross-Dataset Compaction into One Canonical Store
+Content-hash dedup of every dataset's contract-days with provenance bitmaps, recompacting only changed partitions
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from catalog import PartitionCatalog
+from data_store import CANONICAL_DATASET, DEFAULT_DATA_ROOT, SOURCES_FILE, DataStore
+from parquet_store import list_partitions, partition_path, write_partition
+from schema import COLUMNS, KEY_COLUMNS, concat, normalize
+
+DATASETS_FILE = '_datasets.json'
+
+# Columns hashed to tell whether two copies of a contract-day carry the same data
+VALUE_COLUMNS = [c for c in COLUMNS if c not in KEY_COLUMNS and c not in ('YEAR', 'MONTH')]
+
+
+def row_hashes(frame, columns):
+    """64-bit hash of each row over `columns` (vectorized)"""
+    return pd.util.hash_pandas_object(frame[columns].astype(object), index=False).to_numpy()
+
+
+def compact(frames, bits):
+    """
+    One row per contract-day from several datasets' copies of a partition.
+
+    `frames` are canonical frames in priority order and `bits` the provenance
+    bit of each. Where copies disagree the highest-priority dataset wins (ties:
+    the first row read). The result gains SOURCES, a bitmap of every dataset
+    holding the contract-day, and CONFLICT, set when their values differ.
+    """
+    sized = [(frame, bit) for frame, bit in zip(frames, bits) if len(frame)]
+    rows = concat([frame for frame, _ in sized]).reset_index(drop=True)
+    source = np.concatenate([np.full(len(frame), 1 << bit, dtype=np.uint32) for frame, bit in sized])
+
+    key = row_hashes(rows, KEY_COLUMNS)
+    content = row_hashes(rows, VALUE_COLUMNS)
+    # Stable sort on the key keeps priority order inside each contract-day
+    order = np.argsort(key, kind='stable')
+    key, content, source = key[order], content[order], source[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+
+    sources = np.bitwise_or.reduceat(source, starts)
+    differs = np.r_[False, (content[1:] != content[:-1]) & (key[1:] == key[:-1])]
+    conflict = np.logical_or.reduceat(differs, starts)
+
+    compacted = rows.iloc[order[starts]].reset_index(drop=True)
+    compacted['SOURCES'] = sources
+    compacted['CONFLICT'] = conflict
+    return compacted
+
+
+class Compactor:
+    """
+    Builds and maintains {root}/canonical from every other dataset under root.
+
+    Datasets are read in DataStore priority order. Each gets a fixed provenance
+    bit, recorded in canonical/_datasets.json. Every canonical partition stores
+    the size and mtime of the source files it was built from in _sources.json,
+    and run() recompacts only partitions whose sources changed.
+    """
+
+    def __init__(self, root=DEFAULT_DATA_ROOT):
+        self.root = root
+        self.target = os.path.join(root, CANONICAL_DATASET)
+        datasets = [name for name in DataStore(root).datasets if name != CANONICAL_DATASET]
+        self.bits = self._load_bits(datasets)
+        self.datasets = datasets
+
+    def _load_bits(self, datasets):
+        path = os.path.join(self.target, DATASETS_FILE)
+        bits = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                bits = json.load(f)
+        for name in datasets:
+            bits.setdefault(name, len(bits))
+        if len(bits) > 32:
+            raise ValueError("more than 32 datasets do not fit the SOURCES bitmap")
+        os.makedirs(self.target, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(bits, f, indent=2)
+        return bits
+
+    def _sources(self, symbol, year, month):
+        """{dataset: [(file, size, mtime)]} of one partition across the source datasets"""
+        sources = {}
+        for name in self.datasets:
+            directory = partition_path(os.path.join(self.root, name), symbol, year, month)
+            if not os.path.isdir(directory):
+                continue
+            files = [os.path.join(directory, file) for file in sorted(os.listdir(directory))
+                     if file.endswith('.parquet')]
+            if files:
+                sources[name] = [(path, os.path.getsize(path), os.stat(path).st_mtime_ns) for path in files]
+        return sources
+
+    def partitions(self):
+        """Every (symbol, year, month) present in at least one source dataset"""
+        return sorted({partition for name in self.datasets
+                       for partition in list_partitions(os.path.join(self.root, name))})
+
+    def compact_partition(self, symbol, year, month, force=False):
+        """Rebuild one canonical partition if its sources changed; returns its stats or None if skipped"""
+        sources = self._sources(symbol, year, month)
+        directory = partition_path(self.target, symbol, year, month)
+        state_file = os.path.join(directory, SOURCES_FILE)
+        state = json.loads(json.dumps(sources))
+        if not force and os.path.exists(state_file):
+            with open(state_file) as f:
+                if json.load(f) == state:
+                    return None
+
+        frames, bits = [], []
+        for name, files in sources.items():
+            for path, _, _ in files:
+                frames.append(normalize(pq.read_table(path, memory_map=True).to_pandas()))
+                bits.append(self.bits[name])
+        compacted = compact(frames, bits)
+        write_partition(compacted, self.target, symbol, year, month)
+        with open(state_file, 'w') as f:
+            json.dump(state, f)
+        return {'rows_in': sum(len(frame) for frame in frames), 'rows_out': len(compacted),
+                'conflicts': int(compacted['CONFLICT'].sum())}
+
+    def run(self, force=False):
+        """Bring the canonical store up to date; returns {(symbol, year, month): stats} of rebuilt partitions"""
+        wanted = self.partitions()
+        rebuilt = {}
+        for symbol, year, month in wanted:
+            stats = self.compact_partition(symbol, year, month, force)
+            if stats is not None:
+                rebuilt[(symbol, year, month)] = stats
+        # Partitions whose every source disappeared
+        stale = set(list_partitions(self.target)) - set(wanted)
+        catalog = PartitionCatalog(self.target)
+        for partition in stale:
+            shutil.rmtree(partition_path(self.target, *partition))
+            catalog.forget_partition(*partition)
+        catalog.close()
+        return rebuilt
+
+    def dataset_names(self, sources):
+        """Dataset names encoded in one SOURCES bitmap value"""
+        return [name for name, bit in sorted(self.bits.items(), key=lambda item: item[1]) if sources >> bit & 1]
+
+
+def main():
+    """Compact every dataset under the data root into the canonical store"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--root', default=DEFAULT_DATA_ROOT, help="data root")
+    parser.add_argument('--force', action='store_true', help="rebuild every partition")
+    args = parser.parse_args()
+
+    print("🧹 Compacting datasets into the canonical store")
+    print("=" * 50)
+    compactor = Compactor(args.root)
+    print(f"   Sources: {', '.join(compactor.datasets)}")
+    rebuilt = compactor.run(args.force)
+    if not rebuilt:
+        print("✅ Canonical store up to date")
+        return
+    rows_in = sum(stats['rows_in'] for stats in rebuilt.values())
+    rows_out = sum(stats['rows_out'] for stats in rebuilt.values())
+    conflicts = sum(stats['conflicts'] for stats in rebuilt.values())
+    print(f"📦 {len(rebuilt)} partitions rebuilt: {rows_in} rows -> {rows_out} ({conflicts} conflicting contract-days)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Analysis Configuration
+Reads config.yaml (analysis parameters, fees, output settings) for the analytics modules
+"""
+
+import os
+
+import yaml
+
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.yaml')
+
+
+def load_config(path=DEFAULT_CONFIG_FILE):
+    """The whole configuration file as a dict"""
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+
+def analysis_settings(section, path=DEFAULT_CONFIG_FILE):
+    """One block of `analysis:` (e.g. 'volatility', 'liquidity', 'events', 'market_making')"""
+    return load_config(path)['analysis'][section]
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Parallel Bulk Loader for the Collected CSV Archive
+Reads every per-month/per-year CSV in a process pool with fixed column types straight into preallocated arrays
+"""
+
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from parquet_store import partition_files, read_dataset
+from schema import ALIASES, COLUMNS, normalize
+
+# Legacy CSV files that only repeat rows of the per-month/per-year files next to them
+AGGREGATE_SUFFIXES = ('_combined.csv', '_full_options.csv', '_maximized_options.csv',
+                      '_working_periods_options.csv')
+
+# Arrow type each CSV column is parsed as (no inference); categorical columns are read as text
+CSV_TYPES = {
+    column: (pa.timestamp('ns') if str(dtype).startswith('datetime64')
+             else pa.string() if str(dtype) == 'category'
+             else pa.float64() if column in ('YEAR', 'MONTH')  # may be blank in older files
+             else pa.from_numpy_dtype(np.dtype(dtype)))
+    for column, dtype in COLUMNS.items()
+}
+
+
+def legacy_csv_files(directory, symbol=None):
+    """Row-level CSV files of a legacy dataset directory (aggregate copies skipped)"""
+    files = [path for path in sorted(glob.glob(os.path.join(directory, '**', '*.csv'), recursive=True))
+             if not path.endswith(AGGREGATE_SUFFIXES)]
+    if symbol is not None:
+        files = [path for path in files if os.path.basename(path).startswith(f'{symbol}_')]
+    return files
+
+
+def _header(path):
+    with open(path) as f:
+        return f.readline().rstrip('\r\n').split(',')
+
+
+def read_csv_arrays(path):
+    """
+    One CSV file as (rows, {canonical column: numpy array}).
+
+    Columns are parsed with CSV_TYPES and aliases folded into their canonical
+    names. Categorical columns come back as category codes, except SYMBOL,
+    whose values are returned as a (categories, codes) pair.
+    """
+    header = _header(path)
+    types = {name: CSV_TYPES[ALIASES.get(name, name)] for name in header if ALIASES.get(name, name) in CSV_TYPES}
+    table = pacsv.read_csv(path, convert_options=pacsv.ConvertOptions(
+        column_types=types, include_columns=list(types), strings_can_be_null=True))
+
+    columns = {}
+    for name in table.column_names:
+        canonical = ALIASES.get(name, name)
+        values = table.column(name).to_pandas()
+        # First non-missing value wins, as in schema.normalize
+        columns[canonical] = values if canonical not in columns else columns[canonical].fillna(values)
+
+    arrays = {}
+    for column, dtype in COLUMNS.items():
+        values = columns.get(column)
+        if values is None:
+            continue
+        if column == 'SYMBOL':
+            codes, categories = pd.factorize(values)
+            arrays[column] = (list(categories), codes.astype(np.int32))
+        elif isinstance(dtype, pd.CategoricalDtype):
+            arrays[column] = pd.Categorical(values, dtype=dtype).codes
+        elif column in ('YEAR', 'MONTH'):
+            arrays[column] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            arrays[column] = values.to_numpy(dtype=dtype)
+    return table.num_rows, arrays
+
+
+def _assemble(results):
+    """Copy every file's arrays into one preallocated array per column and build the canonical frame"""
+    total = sum(rows for rows, _ in results)
+    symbols = sorted({symbol for _, arrays in results if 'SYMBOL' in arrays
+                      for symbol in arrays['SYMBOL'][0] if symbol is not None})
+
+    columns = {}
+    for column, dtype in COLUMNS.items():
+        if column == 'SYMBOL' or isinstance(dtype, pd.CategoricalDtype):
+            columns[column] = np.full(total, -1, dtype=np.int32)
+        elif column in ('YEAR', 'MONTH'):
+            columns[column] = np.full(total, np.nan, dtype=np.float64)
+        elif str(dtype).startswith('datetime64'):
+            columns[column] = np.full(total, np.datetime64('NaT'), dtype=dtype)
+        else:
+            columns[column] = np.full(total, np.nan, dtype=dtype)
+
+    start = 0
+    for rows, arrays in results:
+        stop = start + rows
+        for column, values in arrays.items():
+            if column == 'SYMBOL':
+                categories, codes = values
+                lookup = np.array([symbols.index(symbol) for symbol in categories] + [-1], dtype=np.int32)
+                values = lookup[codes]  # factorize marks missing values with -1, the last lookup entry
+            columns[column][start:stop] = values
+        start = stop
+
+    frame = {}
+    for column, dtype in COLUMNS.items():
+        values = columns[column]
+        if column == 'SYMBOL':
+            frame[column] = pd.Categorical.from_codes(values, categories=symbols)
+        elif isinstance(dtype, pd.CategoricalDtype):
+            frame[column] = pd.Categorical.from_codes(values, dtype=dtype)
+        else:
+            frame[column] = values
+    frame = pd.DataFrame(frame, copy=False)
+    # YEAR/MONTH default to the expiry's, as in schema.normalize
+    frame['YEAR'] = frame['YEAR'].fillna(frame['EXPIRY'].dt.year).astype(COLUMNS['YEAR'])
+    frame['MONTH'] = frame['MONTH'].fillna(frame['EXPIRY'].dt.month).astype(COLUMNS['MONTH'])
+    return frame
+
+
+def load_csv_files(paths, workers=None):
+    """Canonical frame of the rows of `paths`, in file order, parsed by `workers` processes"""
+    if not paths:
+        return normalize(pd.DataFrame())
+    if workers == 1 or len(paths) == 1:
+        results = [read_csv_arrays(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(read_csv_arrays, paths))
+    return _assemble(results)
+
+
+def load_history(directory, symbol=None, workers=None):
+    """
+    Every row of a dataset directory in the canonical schema.
+
+    Reads the Parquet store when the directory has one, else the legacy CSV
+    archive (aggregate files skipped) in parallel.
+    """
+    if partition_files(directory):
+        return read_dataset(directory, symbol=symbol)
+    frame = load_csv_files(legacy_csv_files(directory, symbol), workers)
+    if symbol is not None:
+        frame = frame[frame['SYMBOL'] == symbol].reset_index(drop=True)
+    return frame
+
+
+def main():
+    """Time a cold load of one or more dataset directories"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directories', nargs='+')
+    parser.add_argument('--symbol')
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    for directory in args.directories:
+        started = time.perf_counter()
+        frame = load_history(directory, args.symbol, args.workers)
+        elapsed = time.perf_counter() - started
+        print(f"📂 {directory}: {len(frame)} rows in {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
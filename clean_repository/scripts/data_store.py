@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Query API over the Collected Derivatives Datasets
+One entry point across every Parquet store, with partition, row-group and column pruning
+"""
+
+import argparse
+import glob
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+from catalog import CATALOG_FILE, PartitionCatalog
+from chain_index import build_indexes
+from csv_loader import legacy_csv_files, load_csv_files
+from enrichment import enrich_store
+from greeks import greeks_store
+from liquidity import liquidity_store
+from parquet_store import list_partitions, partition_path
+from schema import KEY_COLUMNS, normalize
+from stream_writer import PartitionWriter
+from validator import Validator
+from vol_surface import build_surfaces
+
+DEFAULT_DATA_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+# Deduplicated union of the datasets below (see compaction.py)
+CANONICAL_DATASET = 'canonical'
+# Source part files (path, size, mtime) each canonical partition was compacted from
+SOURCES_FILE = '_sources.json'
+
+# Order in which datasets win when several hold the same contract-day
+DATASET_PRIORITY = [
+    CANONICAL_DATASET,
+    'maximized_working_symbols',
+    'full_5year_monthly_derivatives',
+    'monthly_5year_derivatives',
+    'bhavcopy_options',
+    'full_5year_derivatives',
+    'historical_derivatives',
+    'working_banknifty_data',
+]
+
+
+def _timestamp(value):
+    return pa.scalar(pd.Timestamp(value), type=pa.timestamp('ns'))
+
+
+def _part_stats(directory, symbol, year, month):
+    """(file name, size, mtime) of one partition's part files, sorted"""
+    partition = partition_path(directory, symbol, year, month)
+    if not os.path.isdir(partition):
+        return []
+    return sorted((name, os.path.getsize(os.path.join(partition, name)),
+                   os.stat(os.path.join(partition, name)).st_mtime_ns)
+                  for name in os.listdir(partition) if name.endswith('.parquet'))
+
+
+def import_csv_dataset(directory, validator=None):
+    """
+    Convert a legacy CSV dataset into the symbol=/year=/month= store in place.
+
+    Each CSV becomes part-{file name} files in the partitions it covers, so
+    re-running the import replaces rather than duplicates its rows. Rows the
+    validator rejects are quarantined rather than imported. Returns the number
+    of rows written to the store.
+    """
+    writer = PartitionWriter(directory, validator=validator)
+    for path in legacy_csv_files(directory):
+        frame = load_csv_files([path])
+        name = os.path.splitext(os.path.basename(path))[0]
+        for symbol, part in frame.groupby('SYMBOL', observed=True):
+            writer.write(part, symbol, name)
+    return writer.rows_written
+
+
+class DataStore:
+    """
+    Read-only view over every Parquet store under a data root.
+
+    A dataset is any directory holding symbol=/year=/month= partitions. Queries
+    prune in three steps: partition directories by symbol and expiry month
+    (then part files by their cataloged DATE range and strikes), row groups
+    by the DATE/EXPIRY/STRIKE PRICE min/max statistics (files are written
+    sorted, see parquet_store.SORT_COLUMNS), and columns to the ones
+    requested. A source dataset's partition is not read at all while the
+    canonical store holds an up-to-date compaction of it. Files are read
+    through memory maps.
+    """
+
+    def __init__(self, root=DEFAULT_DATA_ROOT, datasets=None):
+        self.root = root
+        self.filesystem = pafs.LocalFileSystem(use_mmap=True)
+        if datasets is None:
+            found = [name for name in sorted(os.listdir(root))
+                     if glob.glob(os.path.join(root, name, 'symbol=*'))]
+            datasets = sorted(found, key=lambda name: (DATASET_PRIORITY.index(name)
+                                                       if name in DATASET_PRIORITY else len(DATASET_PRIORITY)))
+        self.datasets = list(datasets)
+
+    def _canonical_coverage(self, symbol):
+        """{(year, month): datasets} whose current part files a canonical partition was compacted from"""
+        canonical = os.path.join(self.root, CANONICAL_DATASET)
+        covered = {}
+        for _, year, month in list_partitions(canonical, symbol):
+            try:
+                with open(os.path.join(partition_path(canonical, symbol, year, month), SOURCES_FILE)) as f:
+                    sources = json.load(f)
+            except (OSError, ValueError):
+                continue
+            covered[(year, month)] = {name for name, files in sources.items()
+                                      if _part_stats(os.path.join(self.root, name), symbol, year, month)
+                                      == sorted((os.path.basename(path), size, mtime) for path, size, mtime in files)}
+        return covered
+
+    def _files(self, dataset, symbol, start, end, expiry, strikes, skip=()):
+        """Part files of the partitions that can hold rows for the query, less the (year, month)s in skip"""
+        directory = os.path.join(self.root, dataset)
+        # Partitions are expiry months, and a contract trades only up to its expiry,
+        # so nothing expiring before `start` can match
+        first = (start.year, start.month)
+        files = []
+        for _, year, month in list_partitions(directory, symbol):
+            if expiry is not None and (year, month) != (expiry.year, expiry.month):
+                continue
+            if (year, month) < first or (year, month) in skip:
+                continue
+            partition = partition_path(directory, symbol, year, month)
+            files.extend(os.path.join(partition, name) for name in sorted(os.listdir(partition))
+                         if name.endswith('.parquet'))
+        # The catalog's per-file DATE ranges and strikes rule out more files without opening them
+        if files and os.path.exists(os.path.join(directory, CATALOG_FILE)):
+            catalog = PartitionCatalog(directory)
+            skipped = catalog.skippable(symbol, start, end, strikes)
+            catalog.close()
+            files = [path for path in files if path not in skipped]
+        return files
+
+    def _filter(self, start, end, expiry, strikes, option_type):
+        condition = (ds.field('DATE') >= _timestamp(start)) & (ds.field('DATE') <= _timestamp(end))
+        if expiry is not None:
+            condition &= ds.field('EXPIRY') == _timestamp(expiry)
+        if strikes is not None:
+            condition &= ds.field('STRIKE PRICE').isin(pa.array([float(s) for s in strikes], pa.float32()))
+        if option_type is not None:
+            condition &= ds.field('OPTION TYPE') == option_type
+        return condition
+
+    def query(self, symbol, start, end, expiry=None, strikes=None, option_type=None, columns=None):
+        """
+        Rows of one symbol traded between start and end (inclusive).
+
+        `expiry`, `strikes` (iterable) and `option_type` ('CE'/'PE') narrow the
+        contracts; `columns` limits what is read. Partitions the canonical store
+        covers come from it alone, with its conflict resolution; elsewhere a
+        contract-day held by more than one dataset is returned once, from the
+        dataset earliest in DATASET_PRIORITY. Without `columns` the result is in
+        the canonical schema.
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        expiry = pd.Timestamp(expiry) if expiry is not None else None
+        condition = self._filter(start, end, expiry, strikes, option_type)
+        covered = self._canonical_coverage(symbol) if CANONICAL_DATASET in self.datasets else {}
+
+        tables = []
+        for dataset in self.datasets:
+            skip = {partition for partition, names in covered.items() if dataset in names}
+            files = self._files(dataset, symbol, start, end, expiry, strikes, skip)
+            if not files:
+                continue
+            schema = pa.unify_schemas([pq.read_schema(path, memory_map=True) for path in files],
+                                      promote_options='permissive')
+            read = list(columns or schema.names)
+            # Key columns are needed to drop contract-days repeated across datasets
+            keys = [c for c in KEY_COLUMNS if c in schema.names and c not in read]
+            data = ds.dataset(files, schema=schema, format='parquet', filesystem=self.filesystem)
+            table = data.to_table(columns=[c for c in read + keys if c in schema.names], filter=condition)
+            if table.num_rows:
+                tables.append(table.to_pandas())
+
+        if not tables:
+            return normalize(pd.DataFrame()) if columns is None else pd.DataFrame(columns=list(columns))
+        frame = pd.concat([normalize(table) for table in tables], ignore_index=True)
+        frame = frame.drop_duplicates([c for c in KEY_COLUMNS if c in frame.columns])
+        frame = frame.sort_values(['DATE', 'EXPIRY', 'OPTION TYPE', 'STRIKE PRICE'], kind='stable')
+        frame = frame.reset_index(drop=True)
+        return frame if columns is None else frame[list(columns)]
+
+
+def main():
+    """Import the legacy CSV datasets into Parquet stores, or run one query"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--root', default=DEFAULT_DATA_ROOT, help="data root")
+    parser.add_argument('--import-csv', action='store_true', help="convert legacy CSV datasets under root")
+    parser.add_argument('--symbol')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--expiry')
+    parser.add_argument('--strike', type=float, action='append')
+    parser.add_argument('--option-type', choices=['CE', 'PE'])
+    args = parser.parse_args()
+
+    if args.import_csv:
+        for name in DATASET_PRIORITY:
+            directory = os.path.join(args.root, name)
+            if os.path.isdir(directory) and legacy_csv_files(directory):
+                validator = Validator()
+                print(f"📦 {name}: {import_csv_dataset(directory, validator)} rows imported")
+                print(f"   🔍 {validator.describe()}")
+                build_indexes(directory)
+                enrich_store(directory)
+                greeks_store(directory)
+                build_surfaces(directory)
+                liquidity_store(directory)
+    if args.symbol:
+        store = DataStore(args.root)
+        result = store.query(args.symbol, args.start, args.end, args.expiry, args.strike, args.option_type)
+        print(result.to_string(max_rows=20))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Underlying Enrichment of Options Rows
+As-of joins every row with the underlying close and futures price, and caches moneyness and time to expiry
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from parquet_store import list_partitions, read_dataset, refresh_derived
+from schema import normalize
+from strike_planner import DEFAULT_HISTORY_DIR, load_spot
+
+ENRICHED_DIR = '_enriched'
+ENRICHMENT_VERSION = 1
+
+# Derived columns added to every row (NaN where they do not apply)
+ENRICHED_COLUMNS = {
+    'SPOT': 'float32',            # last underlying close on or before DATE
+    'FORWARD': 'float32',         # same-day FUTIDX price of the row's expiry
+    'LOG_MONEYNESS': 'float32',   # ln(STRIKE / FORWARD), ln(STRIKE / SPOT) without a future
+    'TIME_TO_EXPIRY': 'float32',  # calendar years from DATE to EXPIRY
+}
+
+# Oldest underlying close an as-of match may use (covers long exchange holidays)
+SPOT_TOLERANCE = pd.Timedelta(days=5)
+DAYS_PER_YEAR = 365.0
+
+
+def futures_forwards(frame):
+    """(DATE, EXPIRY, FORWARD) from the FUTIDX rows of a frame: settle price, else close"""
+    futures = frame[frame['INSTRUMENT_TYPE'].astype(object) == 'FUTIDX']
+    forwards = pd.DataFrame({
+        'DATE': futures['DATE'],
+        'EXPIRY': futures['EXPIRY'],
+        'FORWARD': futures['SETTLE PRICE'].where(futures['SETTLE PRICE'] > 0, futures['CLOSE']),
+    })
+    forwards = forwards.dropna().drop_duplicates(['DATE', 'EXPIRY'], keep='last')
+    return forwards.astype({'FORWARD': ENRICHED_COLUMNS['FORWARD']})
+
+
+def enrich(frame, spot, forwards=None):
+    """
+    Canonical `frame` with ENRICHED_COLUMNS added, rows in their original order.
+
+    `spot` is a load_spot() table; `forwards` defaults to the frame's own
+    FUTIDX rows (see futures_forwards).
+    """
+    frame = normalize(frame).drop(columns=list(ENRICHED_COLUMNS), errors='ignore')
+    if forwards is None:
+        forwards = futures_forwards(frame)
+
+    position = np.arange(len(frame))
+    left = frame[['DATE', 'EXPIRY']].assign(_ROW=position).sort_values('DATE', kind='stable')
+    right = spot[['DATE', 'CLOSE']].rename(columns={'CLOSE': 'SPOT'}).sort_values('DATE')
+    joined = pd.merge_asof(left, right, on='DATE', direction='backward', tolerance=SPOT_TOLERANCE)
+    joined = joined.merge(forwards, on=['DATE', 'EXPIRY'], how='left').sort_values('_ROW')
+
+    spot_price = joined['SPOT'].to_numpy(dtype=np.float64)
+    forward = joined['FORWARD'].to_numpy(dtype=np.float64)
+    reference = np.where(np.isnan(forward), spot_price, forward)
+    strike = frame['STRIKE PRICE'].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_moneyness = np.log(strike / reference)
+    days = (frame['EXPIRY'] - frame['DATE']).dt.days.to_numpy(dtype=np.float64)
+
+    enriched = frame.copy()
+    enriched['SPOT'] = spot_price
+    enriched['FORWARD'] = forward
+    enriched['LOG_MONEYNESS'] = log_moneyness
+    enriched['TIME_TO_EXPIRY'] = days / DAYS_PER_YEAR
+    return enriched.astype(ENRICHED_COLUMNS)
+
+
+def enriched_root(root):
+    """Store (symbol=/year=/month=) holding the enriched rows of a dataset, partition for partition"""
+    return os.path.join(root, ENRICHED_DIR)
+
+
+def _spot_inputs(spot):
+    """Digest of the underlying closes an enriched partition's as-of joins can use (refresh_derived inputs)"""
+    def inputs(min_date, max_date):
+        if min_date is None or max_date is None:
+            return None
+        window = spot[spot['DATE'].between(pd.Timestamp(min_date) - SPOT_TOLERANCE, pd.Timestamp(max_date))]
+        return int(pd.util.hash_pandas_object(window[['DATE', 'CLOSE']], index=False).sum())
+    return inputs
+
+
+def enrich_dataset(root, symbol, history_dir=DEFAULT_HISTORY_DIR):
+    """Enrich the partitions of one symbol whose rows or underlying closes changed; returns those partitions"""
+    spot = load_spot(symbol, history_dir)
+    return refresh_derived(root, enriched_root(root), symbol, ENRICHMENT_VERSION, lambda rows: enrich(rows, spot),
+                           inputs=_spot_inputs(spot))
+
+
+def enrich_store(root, symbols=None, history_dir=DEFAULT_HISTORY_DIR):
+    """Refresh the enriched partitions of every symbol (or the given ones) whose inputs changed; run after ingest"""
+    symbols = symbols or sorted({symbol for symbol, _, _ in list_partitions(root)})
+    refreshed = {symbol: enrich_dataset(root, symbol, history_dir) for symbol in symbols}
+    return {symbol: partitions for symbol, partitions in refreshed.items() if partitions}
+
+
+def read_enriched(root, symbol, years=None, columns=None, history_dir=DEFAULT_HISTORY_DIR):
+    """Enriched rows of one symbol, recomputing stale partitions first"""
+    enrich_dataset(root, symbol, history_dir)
+    return read_dataset(enriched_root(root), symbol=symbol, years=years, columns=columns)
+
+
+def main():
+    """Refresh the enriched copies of one or more Parquet stores"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('roots', nargs='+', help="dataset directories (symbol=/year=/month= stores)")
+    parser.add_argument('--symbol', action='append', help="only these symbols")
+    parser.add_argument('--history-dir', default=DEFAULT_HISTORY_DIR)
+    args = parser.parse_args()
+
+    for root in args.roots:
+        refreshed = enrich_store(root, args.symbol, args.history_dir)
+        if not refreshed:
+            print(f"✅ {root}: enriched copy up to date")
+        for symbol, partitions in refreshed.items():
+            print(f"🧮 {root}: {symbol} {len(partitions)} partitions enriched ({partitions[0]} to {partitions[-1]})")
+
+if __name__ == "__main__":
+    main()
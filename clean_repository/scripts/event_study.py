@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Batched Event Study for Expiry and Regulatory Windows
+One trading-day panel per symbol and moneyness series, every event window gathered in one index matrix, parallel bootstrap CIs
+"""
+
+import argparse
+import warnings
+
+import numba
+import numpy as np
+import pandas as pd
+
+from config import DEFAULT_CONFIG_FILE, analysis_settings, load_config
+from expiry_calendar import MONTHLY, ExpiryCalendar
+from greeks import read_greeks
+from strike_planner import DEFAULT_HISTORY_DIR, load_spot
+from vol_surface import update_dataset_surface
+
+# Daily metrics studied around each event, per series
+METRICS = [
+    'LOG_VOLUME',  # log of option contracts traded
+    'OI_CHANGE',   # net change in option open interest, contracts
+    'IV',          # median IV of the series' contracts (front-contract ATM IV from vol_surface for ALL_SERIES)
+    'RETURN',      # underlying log return (the same for every series)
+]
+
+# Series every metric is measured for: all options together, then option type x moneyness bucket
+ALL_SERIES = 'ALL'
+
+# Trading days before each window whose mean is the "normal" level
+ESTIMATION_DAYS = 20
+BOOTSTRAP_SAMPLES = 2000
+CONFIDENCE = 0.95
+
+EXPIRY_EVENTS = 'expiry'
+REGULATORY_EVENTS = 'regulatory'
+
+
+def moneyness_buckets(log_moneyness, levels):
+    """Nearest configured moneyness level (STRIKE / FORWARD, e.g. 0.95) to each row; NaN where unknown"""
+    levels = np.asarray(sorted(levels), dtype=np.float64)
+    moneyness = np.exp(np.asarray(log_moneyness, dtype=np.float64))
+    # Midpoints between neighbouring levels split the axis into buckets
+    position = np.searchsorted((levels[1:] + levels[:-1]) / 2.0, np.nan_to_num(moneyness, nan=1.0))
+    return np.where(np.isnan(moneyness), np.nan, levels[position])
+
+
+def event_panel(root, symbol, history_dir=DEFAULT_HISTORY_DIR, config_file=DEFAULT_CONFIG_FILE):
+    """
+    METRICS of one symbol per DATE (rows) and series (first column level).
+
+    Besides ALL_SERIES, every option type x analysis.volatility
+    moneyness_levels bucket ('CE 0.95', ...) is its own series, so abnormal
+    activity is measured where in the chain it happens, not only in total.
+    """
+    rows = read_greeks(root, symbol, columns=['DATE', 'OPTION TYPE', 'TOTAL TRADED QUANTITY', 'MARKET LOT',
+                                              'CHANGE IN OI', 'LOG_MONEYNESS', 'IV'],
+                       history_dir=history_dir, config_file=config_file)
+    rows = rows[rows['OPTION TYPE'].notna()]
+    lot = rows['MARKET LOT'].to_numpy(dtype=np.float64, na_value=np.nan)
+    levels = analysis_settings('volatility', config_file)['moneyness_levels']
+    bucket = moneyness_buckets(rows['LOG_MONEYNESS'].to_numpy(dtype=np.float64, na_value=np.nan), levels)
+    option_type = rows['OPTION TYPE'].astype(str).to_numpy()
+    daily = pd.DataFrame({
+        'DATE': rows['DATE'].to_numpy(),
+        'SERIES': [f'{kind} {level:g}' if level == level else None for kind, level in zip(option_type, bucket)],
+        'CONTRACTS': rows['TOTAL TRADED QUANTITY'].to_numpy(dtype=np.float64, na_value=np.nan) / lot,
+        'OI_CHANGE': rows['CHANGE IN OI'].to_numpy(dtype=np.float64, na_value=np.nan) / lot,
+        'IV': rows['IV'].to_numpy(dtype=np.float64, na_value=np.nan),
+    })
+    totals = daily.groupby('DATE')[['CONTRACTS', 'OI_CHANGE']].sum(min_count=1)
+    surface, _ = update_dataset_surface(root, symbol, history_dir, config_file)
+    totals['IV'] = surface.front_atm()
+    by_series = daily.dropna(subset=['SERIES']).groupby(['SERIES', 'DATE']).agg(
+        CONTRACTS=('CONTRACTS', lambda values: values.sum(min_count=1)),
+        OI_CHANGE=('OI_CHANGE', lambda values: values.sum(min_count=1)),
+        IV=('IV', 'median'))
+    metrics = pd.concat([totals.assign(SERIES=ALL_SERIES).set_index('SERIES', append=True).swaplevel(),
+                         by_series])
+
+    spot = load_spot(symbol, history_dir).set_index('DATE')['CLOSE'].astype(np.float64)
+    returns = np.log(spot).diff()
+    with np.errstate(divide='ignore'):
+        metrics['LOG_VOLUME'] = np.log(metrics['CONTRACTS'].where(metrics['CONTRACTS'] > 0))
+    panel = metrics[['LOG_VOLUME', 'OI_CHANGE', 'IV']].unstack('SERIES').swaplevel(axis=1)
+    series = [ALL_SERIES] + sorted(set(panel.columns.get_level_values(0)) - {ALL_SERIES},
+                                   key=lambda name: (name.split()[0], float(name.split()[1])))
+    panel = panel.reindex(columns=pd.MultiIndex.from_product([series, METRICS]))
+    panel.loc[:, (slice(None), 'RETURN')] = np.repeat(returns.reindex(panel.index).to_numpy()[:, None],
+                                                      len(series), axis=1)
+    return panel
+
+
+@numba.njit(parallel=True, cache=True)
+def _bootstrap_means(abnormal, draws, out):
+    """Mean over resampled events (rows of draws) of each (offset, metric), NaNs skipped"""
+    for b in numba.prange(draws.shape[0]):
+        for w in range(abnormal.shape[1]):
+            for m in range(abnormal.shape[2]):
+                total = 0.0
+                count = 0
+                for e in draws[b]:
+                    value = abnormal[e, w, m]
+                    if not np.isnan(value):
+                        total += value
+                        count += 1
+                out[b, w, m] = total / count if count else np.nan
+
+
+class EventStudy:
+    """
+    Abnormal metrics of every series around sets of event dates.
+
+    The panel is aligned once to the exchange's trading days (holidays from
+    the expiry calendar) as a (days x series x metrics) array, with one NaN
+    day at the end as the target of out-of-range offsets. Each set of events
+    is a matrix of day positions (events x window offsets) shared by all
+    series, so adding events only adds rows to it; the data is never re-read.
+    """
+
+    def __init__(self, panel, calendar=None, estimation_days=ESTIMATION_DAYS):
+        calendar = calendar or ExpiryCalendar()
+        if not isinstance(panel.columns, pd.MultiIndex):
+            panel = pd.concat({ALL_SERIES: panel}, axis=1)
+        first, last = panel.index.min(), panel.index.max()
+        self.days = np.array(calendar.trading_days(first.date(), last.date()), dtype='datetime64[D]')
+        self.series = list(panel.columns.get_level_values(0).unique())
+        self.metrics = list(panel.columns.get_level_values(1).unique())
+        columns = pd.MultiIndex.from_product([self.series, self.metrics])
+        aligned = panel.reindex(index=pd.DatetimeIndex(self.days), columns=columns).to_numpy(dtype=np.float64)
+        aligned = aligned.reshape(len(self.days), len(self.series), len(self.metrics))
+        self.values = np.concatenate([aligned, np.full((1, len(self.series), len(self.metrics)), np.nan)])
+        self.estimation_days = estimation_days
+        self.events = {}
+
+    def add_events(self, kind, dates, window):
+        """Add event dates (moved to the next trading day) to a set studied over [window[0], window[1]] days"""
+        start, end = int(window[0]), int(window[1])
+        dates = np.asarray(pd.to_datetime(list(dates)).values.astype('datetime64[D]'))
+        if kind in self.events:
+            known, known_window = self.events[kind]
+            if known_window != (start, end):
+                raise ValueError(f"{kind} events already use window {known_window}")
+            dates = np.concatenate([known, dates])
+        self.events[kind] = (np.unique(dates), (start, end))
+
+    def gather_index(self, kind, offsets=None):
+        """(events x offsets) row positions into the panel; out-of-range cells point at the NaN row"""
+        dates, (start, end) = self.events[kind]
+        if offsets is None:
+            offsets = np.arange(start, end + 1)
+        centre = np.searchsorted(self.days, dates)
+        index = centre[:, None] + offsets[None, :]
+        # Events outside the panel's dates have no anchor day at all
+        unanchored = (dates < self.days[0]) | (centre >= len(self.days))
+        outside = (index < 0) | (index >= len(self.days)) | unanchored[:, None]
+        return np.where(outside, len(self.days), index)
+
+    def abnormal(self, kind):
+        """
+        (events x offsets x series x metrics) of window values less each
+        event's estimation-period mean (the ESTIMATION_DAYS before the window).
+        """
+        _, (start, _) = self.events[kind]
+        windows = self.values[self.gather_index(kind)]
+        estimation = self.values[self.gather_index(kind, np.arange(start - self.estimation_days, start))]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # events with no estimation data
+            baseline = np.nanmean(estimation, axis=1)
+        return windows - baseline[:, None, :]
+
+    def run(self, kind, samples=BOOTSTRAP_SAMPLES, seed=None, confidence=CONFIDENCE):
+        """
+        Mean abnormal metrics per window offset and series with bootstrap
+        confidence intervals (events resampled with replacement, draws run in
+        parallel). Columns are (series, metric, statistic).
+        """
+        abnormal = self.abnormal(kind)
+        dates, (start, end) = self.events[kind]
+        offsets = abnormal.shape[1]
+        # Series and metrics share the event draws, so they go through the kernel as one axis
+        abnormal = abnormal.reshape(len(dates), offsets, -1)
+        rng = np.random.default_rng(seed)
+        draws = rng.integers(0, len(dates), size=(samples, len(dates)))
+        means = np.empty((samples, offsets, abnormal.shape[2]), dtype=np.float64)
+        _bootstrap_means(abnormal, draws, means)
+
+        tail = (1.0 - confidence) / 2.0 * 100.0
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # offsets without any data
+            stats = {
+                'MEAN': np.nanmean(abnormal, axis=0),
+                'LOW': np.nanpercentile(means, tail, axis=0),
+                'HIGH': np.nanpercentile(means, 100.0 - tail, axis=0),
+                'EVENTS': np.sum(~np.isnan(abnormal), axis=0),
+            }
+        columns = [(series, metric) for series in self.series for metric in self.metrics]
+        return pd.DataFrame({(series, metric, stat): values[:, c] for c, (series, metric) in enumerate(columns)
+                             for stat, values in stats.items()},
+                            index=pd.Index(np.arange(start, end + 1), name='OFFSET'))
+
+
+def configured_study(root, symbol, history_dir=DEFAULT_HISTORY_DIR, config_file=DEFAULT_CONFIG_FILE,
+                     calendar=None):
+    """EventStudy of one symbol with the monthly expiries and regulatory dates of analysis.events"""
+    settings = analysis_settings('events', config_file)
+    calendar = calendar or ExpiryCalendar()
+    study = EventStudy(event_panel(root, symbol, history_dir, config_file), calendar)
+    first, last = study.days[0].item(), study.days[-1].item()
+    study.add_events(EXPIRY_EVENTS, calendar.expiries(symbol, first, last, kind=MONTHLY), settings['expiry_window'])
+    study.add_events(REGULATORY_EVENTS, [settings['jane_street_ban_date']], settings['regulatory_window'])
+    return study
+
+
+def main():
+    """Run the configured expiry and regulatory event studies on one store"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('root', help="dataset directory (symbol=/year=/month= store)")
+    parser.add_argument('--symbol', default='NIFTY')
+    parser.add_argument('--event', action='append', default=[], help="extra regulatory event date")
+    parser.add_argument('--samples', type=int, default=BOOTSTRAP_SAMPLES)
+    parser.add_argument('--history-dir', default=DEFAULT_HISTORY_DIR)
+    parser.add_argument('--series', default=ALL_SERIES, help="series printed in full, e.g. 'PE 0.95'")
+    args = parser.parse_args()
+
+    study = configured_study(args.root, args.symbol, args.history_dir)
+    if args.event:
+        study.add_events(REGULATORY_EVENTS, args.event, study.events[REGULATORY_EVENTS][1])
+    seed = load_config()['analysis']['random_seed']
+    for kind in study.events:
+        dates, window = study.events[kind]
+        print(f"📅 {args.symbol} {kind}: {len(dates)} events, window {list(window)}, "
+              f"{int(CONFIDENCE * 100)}% bootstrap CIs")
+        result = study.run(kind, args.samples, seed)
+        for metric in study.metrics:
+            print(f"   {args.series} {metric}")
+            print(result[args.series][metric].round(4).to_string())
+        print(f"   Mean abnormal value on the event day, per series")
+        means = result.xs('MEAN', axis=1, level=2).loc[0].unstack()
+        print(means.reindex(index=study.series, columns=study.metrics).round(4).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Exchange Expiry Calendar for NSE Index Derivatives
+Monthly and weekly expiries per symbol, shifted for holidays, precomputed once and cached to disk
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from csv_loader import load_history
+
+DEFAULT_HOLIDAYS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'calendar',
+                                     'nse_fo_holidays.csv')
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cache',
+                                 'expiry_calendar')
+
+MONTHLY = 'monthly'
+WEEKLY = 'weekly'
+
+WEEKDAYS = ['MON', 'TUE', 'WED', 'THU', 'FRI']
+
+# Expiry-day regimes: (symbol, kind, effective from, effective until (exclusive), weekday).
+# Monthly regimes switch by contract month, weekly ones by date.
+EXPIRY_REGIMES = [
+    ('NIFTY', MONTHLY, '2000-01', '2025-09', 'THU'),
+    ('NIFTY', MONTHLY, '2025-09', None, 'TUE'),
+    ('NIFTY', WEEKLY, '2019-02-11', '2025-09-01', 'THU'),
+    ('NIFTY', WEEKLY, '2025-09-01', None, 'TUE'),
+    # Wednesday monthly expiries began with the April 2024 contract; March 2024 had already been listed for Thursday
+    ('BANKNIFTY', MONTHLY, '2000-01', '2024-04', 'THU'),
+    ('BANKNIFTY', MONTHLY, '2024-04', '2025-01', 'WED'),
+    ('BANKNIFTY', MONTHLY, '2025-01', '2025-09', 'THU'),
+    ('BANKNIFTY', MONTHLY, '2025-09', None, 'TUE'),
+    ('BANKNIFTY', WEEKLY, '2016-05-23', '2023-09-04', 'THU'),
+    # Weekly Bank Nifty contracts were discontinued after the 13 Nov 2024 expiry
+    ('BANKNIFTY', WEEKLY, '2023-09-04', '2024-11-14', 'WED'),
+]
+
+
+def read_holidays(path=DEFAULT_HOLIDAYS_FILE):
+    """Trading holidays from the local list, as a sorted datetime64[D] array"""
+    holidays = pd.read_csv(path, parse_dates=['DATE'])['DATE']
+    return np.sort(holidays.values.astype('datetime64[D]'))
+
+
+def holiday_years(holidays):
+    """First and last calendar year the holiday list covers"""
+    if len(holidays) == 0:
+        raise ValueError("Holiday list is empty")
+    return int(str(holidays[0])[:4]), int(str(holidays[-1])[:4])
+
+
+def shift_to_trading_day(dates, holidays):
+    """Move expiries that fall on a holiday or weekend back to the previous trading day"""
+    days = np.asarray(dates, dtype='datetime64[D]')
+    return np.busday_offset(days, 0, roll='backward', holidays=holidays)
+
+
+def _last_weekdays(first_month, last_month, weekday):
+    """Last `weekday` of every month in [first_month, last_month]"""
+    months = pd.period_range(first_month, last_month, freq='M')
+    month_ends = months.end_time.normalize()
+    back = (month_ends.weekday - WEEKDAYS.index(weekday)) % 7
+    return pd.DatetimeIndex(month_ends - pd.to_timedelta(back, unit='D'))
+
+
+def _regime_expiries(kind, start, end, weekday, first_year, last_year):
+    """Scheduled (unshifted) expiries of one regime clipped to [first_year, last_year]"""
+    if kind == MONTHLY:
+        first = max(pd.Period(start, 'M'), pd.Period(f'{first_year}-01', 'M'))
+        last = pd.Period(f'{last_year}-12', 'M')
+        if end is not None:
+            last = min(last, pd.Period(end, 'M') - 1)
+        if first > last:
+            return pd.DatetimeIndex([])
+        return _last_weekdays(first, last, weekday)
+    first = max(pd.Timestamp(start), pd.Timestamp(f'{first_year}-01-01'))
+    last = pd.Timestamp(f'{last_year}-12-31')
+    if end is not None:
+        last = min(last, pd.Timestamp(end) - pd.Timedelta(days=1))
+    return pd.date_range(first, last, freq=f'W-{weekday}')
+
+
+def build_calendar(holidays, first_year, last_year, regimes=EXPIRY_REGIMES):
+    """
+    Expiry table with SYMBOL, KIND, SCHEDULED (rule date), EXPIRY (holiday-shifted), YEAR, MONTH.
+
+    Weekly dates in the same week as the monthly expiry are dropped, since the
+    monthly contract is that week's expiry.
+    """
+    frames = []
+    for symbol, kind, start, end, weekday in regimes:
+        scheduled = _regime_expiries(kind, start, end, weekday, first_year, last_year)
+        frames.append(pd.DataFrame({'SYMBOL': symbol, 'KIND': kind, 'SCHEDULED': scheduled}))
+    table = pd.concat(frames, ignore_index=True)
+    table['EXPIRY'] = shift_to_trading_day(table['SCHEDULED'].values, holidays).astype('datetime64[ns]')
+
+    week = table['EXPIRY'].dt.to_period('W')
+    monthly_weeks = set(zip(table.loc[table['KIND'] == MONTHLY, 'SYMBOL'], week[table['KIND'] == MONTHLY]))
+    in_monthly_week = pd.Series([key in monthly_weeks for key in zip(table['SYMBOL'], week)], index=table.index)
+    table = table[(table['KIND'] == MONTHLY) | ~in_monthly_week]
+
+    table = table.sort_values(['SYMBOL', 'EXPIRY', 'KIND']).drop_duplicates(['SYMBOL', 'EXPIRY'])
+    table['YEAR'] = table['EXPIRY'].dt.year.astype('int16')
+    table['MONTH'] = table['EXPIRY'].dt.month.astype('int8')
+    return table.reset_index(drop=True)
+
+
+class ExpiryCalendar:
+    """
+    Precomputed expiry table with O(1) monthly lookups and sorted per-symbol arrays for ranges.
+
+    The table is built from the local holiday list and EXPIRY_REGIMES, and
+    cached as Parquet under a fingerprint of both, so editing either rebuilds it.
+    `years` defaults to the years the holiday list covers; years outside it
+    raise, since their expiries could not be shifted for holidays.
+    """
+
+    def __init__(self, holidays_file=DEFAULT_HOLIDAYS_FILE, cache_dir=DEFAULT_CACHE_DIR, years=None):
+        self.holidays = read_holidays(holidays_file)
+        covered = holiday_years(self.holidays)
+        self.first_year, self.last_year = years or covered
+        if self.first_year < covered[0] or self.last_year > covered[1]:
+            raise ValueError(f"Years {self.first_year}-{self.last_year} outside the holiday list "
+                             f"({covered[0]}-{covered[1]}): add the missing years to {holidays_file}")
+        self.table = self._load(cache_dir)
+
+        monthly = self.table[self.table['KIND'] == MONTHLY]
+        # Monthly contracts are keyed by the month they expire in (after any holiday shift)
+        self._monthly = {
+            (symbol, int(year), int(month)): expiry.date()
+            for symbol, year, month, expiry in zip(monthly['SYMBOL'], monthly['YEAR'], monthly['MONTH'],
+                                                    monthly['EXPIRY'])
+        }
+        self._dates = {}
+        self._kinds = {}
+        for symbol, rows in self.table.groupby('SYMBOL'):
+            self._dates[symbol] = rows['EXPIRY'].values.astype('datetime64[D]')
+            self._kinds[symbol] = rows['KIND'].values
+
+    def _fingerprint(self):
+        payload = json.dumps({
+            'holidays': [str(day) for day in self.holidays],
+            'regimes': EXPIRY_REGIMES,
+            'years': [self.first_year, self.last_year],
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def _load(self, cache_dir):
+        path = os.path.join(cache_dir, f'calendar-{self._fingerprint()}.parquet')
+        if os.path.exists(path):
+            return pd.read_parquet(path)
+        table = build_calendar(self.holidays, self.first_year, self.last_year)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = path + '.tmp'
+        table.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        return table
+
+    def monthly(self, symbol, year, month):
+        """Monthly expiry date of a symbol in a given month"""
+        return self._monthly[(symbol, int(year), int(month))]
+
+    def monthly_expiries(self, symbol, year):
+        """All monthly expiry dates of a symbol in a year"""
+        return [self._monthly[(symbol, year, month)] for month in range(1, 13)
+                if (symbol, year, month) in self._monthly]
+
+    def expiries(self, symbol, start, end, kind=None):
+        """Expiry dates of a symbol in [start, end], optionally only MONTHLY or WEEKLY ones"""
+        dates = self._dates[symbol]
+        low = np.searchsorted(dates, np.datetime64(start, 'D'), side='left')
+        high = np.searchsorted(dates, np.datetime64(end, 'D'), side='right')
+        selected = slice(low, high)
+        days = dates[selected]
+        if kind is not None:
+            days = days[self._kinds[symbol][selected] == kind]
+        return [day.item() for day in days]
+
+    def mismatches(self, frame):
+        """
+        Distinct (SYMBOL, EXPIRY) pairs of a canonical frame that are not expiries in the calendar.
+
+        CALENDAR holds the symbol's monthly expiry in that month (NaT if none),
+        the date the stored contract was most likely meant to match.
+        """
+        pairs = frame[['SYMBOL', 'EXPIRY']].dropna().astype({'SYMBOL': str}).drop_duplicates()
+        known = {(symbol, day) for symbol, days in self._dates.items() for day in days.astype('datetime64[ns]')}
+        stored = pairs['EXPIRY'].to_numpy(dtype='datetime64[ns]')
+        missing = pairs[[(symbol, day) not in known for symbol, day in zip(pairs['SYMBOL'], stored)]]
+        calendar = [self._monthly.get((symbol, expiry.year, expiry.month))
+                    for symbol, expiry in zip(missing['SYMBOL'], missing['EXPIRY'])]
+        return missing.assign(CALENDAR=pd.to_datetime(calendar)).sort_values(['SYMBOL', 'EXPIRY'], ignore_index=True)
+
+    def _check_covered(self, start, end):
+        first, last = holiday_years(self.holidays)
+        if np.datetime64(start, 'D').item().year < first or np.datetime64(end, 'D').item().year > last:
+            raise ValueError(f"Dates {start}..{end} outside the holiday list ({first}-{last})")
+
+    def is_trading_day(self, day):
+        self._check_covered(day, day)
+        return bool(np.is_busday(np.datetime64(day, 'D'), holidays=self.holidays))
+
+    def trading_days(self, start, end):
+        """Weekdays in [start, end] that are not exchange holidays"""
+        self._check_covered(start, end)
+        days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+        return [day.item() for day in days[np.is_busday(days, holidays=self.holidays)]]
+
+
+def main():
+    """Check the expiries stored in one or more datasets against the calendar"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directories', nargs='+', help="dataset directories (Parquet store or legacy CSVs)")
+    args = parser.parse_args()
+
+    calendar = ExpiryCalendar()
+    failed = False
+    for directory in args.directories:
+        mismatches = calendar.mismatches(load_history(directory))
+        if mismatches.empty:
+            print(f"✅ {directory}: every stored expiry is in the calendar")
+            continue
+        failed = True
+        print(f"❌ {directory}: {len(mismatches)} stored expiries not in the calendar")
+        print(mismatches.to_string(index=False))
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
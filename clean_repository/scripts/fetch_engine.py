@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Shared Fetch Engine for NSE Derivatives Requests
+Runs derivatives_df calls through a bounded worker pool behind a token-bucket rate limiter
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import date, timedelta
+from itertools import islice
+from typing import Optional
+
+from job_manifest import DONE, EMPTY, FAILED
+from response_cache import cache_key, is_final
+
+# Requests per second allowed towards NSE, and how many may be sent back to back
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 4
+DEFAULT_WORKERS = 4
+
+
+@dataclass(frozen=True)
+class FetchJob:
+    """One derivatives_df request plus the metadata the collectors attach to its rows"""
+    symbol: str
+    expiry_date: date
+    instrument_type: str = 'OPTIDX'
+    strike_price: Optional[float] = None
+    option_type: Optional[str] = None
+    from_date: Optional[date] = None
+    to_date: Optional[date] = None
+    year: Optional[int] = None
+    month: Optional[int] = None
+
+    def request_kwargs(self):
+        """Keyword arguments for nse.derivatives_df (30-day window ending at expiry by default)"""
+        kwargs = {
+            'symbol': self.symbol,
+            'from_date': self.from_date or self.expiry_date - timedelta(days=30),
+            'to_date': self.to_date or self.expiry_date,
+            'expiry_date': self.expiry_date,
+            'instrument_type': self.instrument_type,
+        }
+        if self.strike_price is not None:
+            kwargs['strike_price'] = self.strike_price
+        if self.option_type is not None:
+            kwargs['option_type'] = self.option_type
+        return kwargs
+
+    @property
+    def key(self):
+        """Content address of the request, shared with the response cache"""
+        return cache_key(self.request_kwargs())
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `burst` stored"""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until one token is available, then consume it"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+def default_fetch(**kwargs):
+    """Call jugaad_data's nse.derivatives_df (imported lazily so tests can run without it)"""
+    from jugaad_data import nse
+    return nse.derivatives_df(**kwargs)
+
+
+def tag_frame(job, df):
+    """Attach the INSTRUMENT_TYPE/YEAR/MONTH/SYMBOL_NAME metadata columns for a job"""
+    df['INSTRUMENT_TYPE'] = job.instrument_type
+    df['YEAR'] = job.year
+    df['MONTH'] = job.month
+    df['SYMBOL_NAME'] = job.symbol
+    return df
+
+
+def run_jobs(jobs, fetch=None, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_workers=DEFAULT_WORKERS,
+             limiter=None, cache=None, manifest=None):
+    """
+    Run jobs concurrently and yield (job, frame, error) as each one completes.
+
+    `frame` is None when the request failed or returned no rows; `error` holds the
+    exception for failed requests. Every network request first takes a token from
+    the limiter, so throughput is set by `rate` rather than by fixed sleeps.
+    Responses already in `cache` (a ResponseCache) are served without a token.
+
+    With a `manifest` (a JobManifest) every outcome is checkpointed. On restart,
+    jobs whose window is final (see response_cache.is_final) and recorded as
+    empty are skipped, and those recorded as done are replayed from the cache,
+    even if stale; done jobs missing from the cache are re-run. Jobs on a live
+    window go through the cache's normal TTL whatever their recorded state.
+    """
+    jobs = list(jobs)
+    fetch = fetch or default_fetch
+    limiter = limiter or TokenBucket(rate, burst)
+    final = cache.is_immutable if cache is not None else (lambda params: is_final(params, date.today()))
+    states = {}
+    if manifest is not None:
+        manifest.register(jobs)
+        states = manifest.states()
+
+    def call(job):
+        params = job.request_kwargs()
+        state = states.get(job.key) if final(params) else None
+        if state == EMPTY:
+            return None
+        if cache is not None:
+            hit, data = cache.lookup(params, allow_stale=state == DONE)
+            if hit:
+                if manifest is not None and state != DONE:
+                    manifest.mark(job, DONE if data is not None else EMPTY, 0 if data is None else len(data))
+                return data
+        limiter.acquire()
+        try:
+            data = fetch(**params)
+        except Exception as e:
+            if manifest is not None:
+                manifest.mark(job, FAILED, error=e)
+            raise
+        if cache is not None:
+            cache.store(params, data)
+        if data is None or len(data) == 0:
+            data = None
+        if manifest is not None:
+            manifest.mark(job, EMPTY if data is None else DONE, 0 if data is None else len(data))
+        return data
+
+    # Keep only a small window of requests in flight so finished frames are handed
+    # to the consumer as they arrive instead of piling up in memory
+    pending_jobs = iter(jobs)
+    window = max_workers * 2
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for job in islice(pending_jobs, window):
+            futures[pool.submit(call, job)] = job
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = futures.pop(future)
+                for next_job in islice(pending_jobs, 1):
+                    futures[pool.submit(call, next_job)] = next_job
+                try:
+                    yield job, future.result(), None
+                except Exception as e:
+                    yield job, None, e
+
+
+def option_jobs(symbol, expiry_date, strikes, year=None, month=None, option_types=('CE', 'PE')):
+    """Flat list of option jobs for every strike and option type of one expiry"""
+    return [
+        FetchJob(symbol, expiry_date, 'OPTIDX', strike, option_type, year=year, month=month)
+        for strike in strikes
+        for option_type in option_types
+    ]
+
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Batch Greeks Engine with Delta Buckets
+Black-76 delta, gamma, vega, theta, vanna and volga from the solved IVs, cached per partition and model version
+"""
+
+import argparse
+import json
+import math
+import os
+
+import numba
+import numpy as np
+import pandas as pd
+
+from config import DEFAULT_CONFIG_FILE, analysis_settings
+from enrichment import enrich_dataset, enriched_root
+from implied_vol import SQRT_2PI, _norm_cdf, frame_implied_vols
+from parquet_store import list_partitions, read_dataset, refresh_derived
+from strike_planner import DEFAULT_HISTORY_DIR
+
+GREEKS_DIR = '_greeks'
+
+# Bump whenever the pricing model or a Greek's definition changes; cached columns are rebuilt
+MODEL_VERSION = 'black76-2'
+
+DAYS_PER_YEAR = 365.0
+
+# Units: delta and gamma per 1 INR of forward, vega/vanna/volga per 1.00 of volatility,
+# theta per calendar day
+GREEK_COLUMNS = ['DELTA', 'GAMMA', 'VEGA', 'THETA', 'VANNA', 'VOLGA']
+
+
+@numba.njit(parallel=True, cache=True, fastmath=True)
+def _greeks(forward, strike, tte, sigma, is_call, rate, out):
+    for i in numba.prange(forward.shape[0]):
+        if not (forward[i] > 0.0 and strike[i] > 0.0 and tte[i] > 0.0 and sigma[i] > 0.0):
+            for j in range(6):
+                out[i, j] = np.nan
+            continue
+        root_t = math.sqrt(tte[i])
+        total_vol = sigma[i] * root_t
+        d1 = math.log(forward[i] / strike[i]) / total_vol + 0.5 * total_vol
+        d2 = d1 - total_vol
+        discount = math.exp(-rate * tte[i])
+        density = math.exp(-0.5 * d1 * d1) / SQRT_2PI
+        call = forward[i] * _norm_cdf(d1) - strike[i] * _norm_cdf(d2)
+        price = call if is_call[i] else call - (forward[i] - strike[i])
+
+        vega = discount * forward[i] * density * root_t
+        out[i, 0] = discount * (_norm_cdf(d1) if is_call[i] else _norm_cdf(d1) - 1.0)
+        out[i, 1] = discount * density / (forward[i] * total_vol)
+        out[i, 2] = vega
+        out[i, 3] = (-discount * forward[i] * density * sigma[i] / (2.0 * root_t)
+                     + rate * discount * price) / DAYS_PER_YEAR
+        out[i, 4] = -discount * density * d2 / sigma[i]
+        out[i, 5] = vega * d1 * d2 / sigma[i]
+
+
+def greeks(forward, strike, tte, sigma, is_call, rate=0.0):
+    """
+    Black-76 Greeks of whole arrays as an (n, 6) array in GREEK_COLUMNS order.
+
+    Rows without a usable volatility (NaN IV) come back as NaN.
+    """
+    forward = np.ascontiguousarray(forward, dtype=np.float64)
+    n = forward.shape[0]
+    strike, tte, sigma = (np.ascontiguousarray(np.broadcast_to(np.asarray(values, dtype=np.float64), n))
+                          for values in (strike, tte, sigma))
+    is_call = np.ascontiguousarray(np.broadcast_to(np.asarray(is_call, dtype=np.bool_), n))
+    out = np.empty((n, len(GREEK_COLUMNS)), dtype=np.float64)
+    _greeks(forward, strike, tte, sigma, is_call, float(rate), out)
+    return out
+
+
+def delta_buckets(delta, levels):
+    """Nearest configured delta level (in delta points, e.g. 25) to each |delta|; 0 where delta is NaN"""
+    levels = np.asarray(sorted(levels), dtype=np.float64)
+    points = np.abs(np.asarray(delta, dtype=np.float64)) * 100.0
+    # Midpoints between neighbouring levels split the axis into buckets
+    position = np.searchsorted((levels[1:] + levels[:-1]) / 2.0, np.nan_to_num(points, nan=0.0))
+    return np.where(np.isnan(points), 0, levels[position]).astype(np.int8)
+
+
+def frame_greeks(frame, price_column='SETTLE PRICE', rate=0.0, config_file=DEFAULT_CONFIG_FILE):
+    """
+    IV, IV_STATUS, GREEK_COLUMNS and DELTA_BUCKET for the option rows of an enriched frame.
+
+    `rate` (continuously compounded) discounts both the IV solve and the
+    Greeks, so the two always describe the same price; the cached store
+    uses rate 0 throughout.
+    """
+    settings = analysis_settings('volatility', config_file)
+    discount = np.exp(-rate * frame['TIME_TO_EXPIRY'].to_numpy(dtype=np.float64, na_value=np.nan))
+    solved = frame_implied_vols(frame, price_column, discount=discount, min_iv=settings['min_iv'],
+                                max_iv=settings['max_iv'])
+    forward = frame['FORWARD'].to_numpy(dtype=np.float64, na_value=np.nan)
+    spot = frame['SPOT'].to_numpy(dtype=np.float64, na_value=np.nan)
+    values = greeks(np.where(np.isnan(forward), spot, forward),
+                    frame['STRIKE PRICE'].to_numpy(dtype=np.float64, na_value=np.nan),
+                    frame['TIME_TO_EXPIRY'].to_numpy(dtype=np.float64, na_value=np.nan),
+                    solved['IV'].to_numpy(dtype=np.float64),
+                    frame['OPTION TYPE'].astype(object).to_numpy() == 'CE', rate)
+    result = solved.copy()
+    for j, column in enumerate(GREEK_COLUMNS):
+        result[column] = values[:, j].astype(np.float32)
+    result['DELTA_BUCKET'] = delta_buckets(values[:, 0], settings['delta_levels'])
+    return result
+
+
+def portfolio_greeks(frame, position=None, by=('DATE', 'EXPIRY')):
+    """
+    Position-weighted Greeks summed per group in one grouped reduction.
+
+    `position` is the signed number of contracts per row (default one long
+    contract each); Greeks are scaled by MARKET LOT, so results are per INR
+    of the whole position.
+    """
+    position = np.ones(len(frame)) if position is None else np.asarray(position, dtype=np.float64)
+    scale = position * frame['MARKET LOT'].to_numpy(dtype=np.float64, na_value=1.0)
+    weighted = pd.DataFrame({column: frame[column].to_numpy(dtype=np.float64) * scale
+                             for column in GREEK_COLUMNS}, index=frame.index)
+    for column in by:
+        weighted[column] = frame[column].to_numpy()
+    return weighted.groupby(list(by), sort=True).sum(min_count=1)
+
+
+def greeks_root(root):
+    """Store holding the enriched rows plus IV/Greeks columns of a dataset, partition for partition"""
+    return os.path.join(root, GREEKS_DIR)
+
+
+def _version(config_file):
+    """MODEL_VERSION plus the volatility settings the cached columns were computed with"""
+    settings = analysis_settings('volatility', config_file)
+    return json.dumps({'model': MODEL_VERSION,
+                       'volatility': {key: settings[key] for key in ('min_iv', 'max_iv', 'delta_levels')}},
+                      sort_keys=True)
+
+
+def greeks_dataset(root, symbol, history_dir=DEFAULT_HISTORY_DIR, config_file=DEFAULT_CONFIG_FILE):
+    """Compute IV and Greeks for the enriched partitions of one symbol that are new or changed; returns those"""
+    enrich_dataset(root, symbol, history_dir)
+    return refresh_derived(enriched_root(root), greeks_root(root), symbol, _version(config_file),
+                           lambda rows: pd.concat([rows, frame_greeks(rows, config_file=config_file)], axis=1))
+
+
+def greeks_store(root, symbols=None, history_dir=DEFAULT_HISTORY_DIR, config_file=DEFAULT_CONFIG_FILE):
+    """Refresh the Greeks partitions of every symbol (or the given ones) whose inputs or model changed"""
+    symbols = symbols or sorted({symbol for symbol, _, _ in list_partitions(root)})
+    refreshed = {symbol: greeks_dataset(root, symbol, history_dir, config_file) for symbol in symbols}
+    return {symbol: partitions for symbol, partitions in refreshed.items() if partitions}
+
+
+def read_greeks(root, symbol, years=None, columns=None, history_dir=DEFAULT_HISTORY_DIR,
+                config_file=DEFAULT_CONFIG_FILE):
+    """Enriched rows with IV and Greeks columns, computed once per partition version and MODEL_VERSION"""
+    greeks_dataset(root, symbol, history_dir, config_file)
+    return read_dataset(greeks_root(root), symbol=symbol, years=years, columns=columns)
+
+
+def main():
+    """Refresh the Greeks copies of one or more stores and print per-expiry portfolio Greeks"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('roots', nargs='+', help="dataset directories (symbol=/year=/month= stores)")
+    parser.add_argument('--symbol', action='append', help="only these symbols")
+    parser.add_argument('--history-dir', default=DEFAULT_HISTORY_DIR)
+    args = parser.parse_args()
+
+    for root in args.roots:
+        refreshed = greeks_store(root, args.symbol, args.history_dir)
+        for symbol in args.symbol or sorted({symbol for symbol, _, _ in list_partitions(root)}):
+            frame = read_greeks(root, symbol, history_dir=args.history_dir)
+            options = frame[frame['IV'].notna()]
+            state = f"{len(refreshed[symbol])} partitions recomputed" if symbol in refreshed else 'cached'
+            print(f"🧮 {root} {symbol}: {len(options)}/{len(frame)} rows with Greeks ({MODEL_VERSION}, {state})")
+            counts = options['DELTA_BUCKET'].value_counts().sort_index()
+            print("   Delta buckets: " + ", ".join(f"{bucket}Δ {count}" for bucket, count in counts.items()))
+            print(portfolio_greeks(options).tail(3).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Job Manifest for Checkpointed, Resumable Collection Runs
+SQLite record of every (symbol, expiry, strike, type) request and its state
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MANIFEST_DIR = "manifests"
+
+PENDING = 'pending'
+DONE = 'done'
+EMPTY = 'empty'
+FAILED = 'failed'
+
+# States that never need another request on restart, once the job's window is final
+FINISHED_STATES = (DONE, EMPTY)
+
+
+class JobManifest:
+    """
+    Per-run manifest of FetchJobs keyed by their request content address.
+
+    Each state change is committed immediately, so a run killed at any point
+    restarts with every finished unit intact and re-requests only pending and
+    failed jobs, plus any on a window that is still open (see fetch_engine.run_jobs).
+    """
+
+    def __init__(self, name, root=DEFAULT_MANIFEST_DIR):
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, f'{name}.sqlite')
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                key TEXT PRIMARY KEY,
+                symbol TEXT NOT NULL,
+                instrument_type TEXT NOT NULL,
+                expiry_date TEXT NOT NULL,
+                strike_price REAL,
+                option_type TEXT,
+                state TEXT NOT NULL,
+                rows INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def register(self, jobs):
+        """Add jobs as pending; jobs already in the manifest keep their state"""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO jobs (key, symbol, instrument_type, expiry_date, strike_price,"
+                " option_type, state, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(job.key, job.symbol, job.instrument_type, job.expiry_date.isoformat(),
+                  job.strike_price, job.option_type, PENDING, now) for job in jobs]
+            )
+            self._db.commit()
+
+    def mark(self, job, state, rows=0, error=None):
+        """Record the outcome of one request attempt"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, rows = ?, error = ?, attempts = attempts + 1, updated_at = ?"
+                " WHERE key = ?",
+                (state, rows, None if error is None else str(error)[:500], time.time(), job.key)
+            )
+            self._db.commit()
+
+    def states(self):
+        """{job key: state} for every registered job"""
+        with self._lock:
+            return dict(self._db.execute("SELECT key, state FROM jobs").fetchall())
+
+    def summary(self):
+        """Job counts per state"""
+        with self._lock:
+            counts = dict(self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return {state: counts.get(state, 0) for state in (PENDING, DONE, EMPTY, FAILED)}
+
+    def describe(self):
+        counts = self.summary()
+        return ", ".join(f"{counts[state]} {state}" for state in counts)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Liquidity Screening Engine
+Turnover, Amihud illiquidity and Corwin-Schultz/Roll spread estimates per contract-day, with a stored liquidity mask
+"""
+
+import argparse
+import json
+import math
+import os
+
+import numba
+import numpy as np
+import pandas as pd
+
+from config import DEFAULT_CONFIG_FILE, analysis_settings
+from parquet_store import list_partitions, read_dataset, refresh_derived
+from schema import KEY_COLUMNS
+
+LIQUIDITY_DIR = '_liquidity'
+LIQUIDITY_VERSION = 1
+
+# Trading days (rows of the same contract) averaged by the rolling estimators
+WINDOW = 5
+
+# Bits of LIQUIDITY_FLAGS, one per analysis.liquidity threshold passed
+VOLUME_OK = 1     # CONTRACTS >= min_volume
+TURNOVER_OK = 2   # TURNOVER >= min_turnover
+SPREAD_OK = 4     # SPREAD_BPS <= max_spread_bps
+ALL_OK = VOLUME_OK | TURNOVER_OK | SPREAD_OK
+
+LIQUIDITY_COLUMNS = {
+    'CONTRACTS': 'float32',        # TOTAL TRADED QUANTITY / MARKET LOT
+    'TURNOVER': 'float64',         # premium traded (INR): PREMIUM VALUE less the strike notional for options
+    'AMIHUD': 'float32',           # rolling mean |log return| per INR 1M of TURNOVER
+    'CS_SPREAD_BPS': 'float32',    # rolling Corwin-Schultz high-low spread estimate
+    'ROLL_SPREAD_BPS': 'float32',  # rolling Roll serial-covariance spread estimate
+    'SPREAD_BPS': 'float32',       # Corwin-Schultz, Roll where it is undefined
+    'LIQUIDITY_FLAGS': 'uint8',
+    'LIQUID': 'bool',              # every threshold passed
+}
+
+_CS_DENOMINATOR = 3.0 - 2.0 * math.sqrt(2.0)
+
+
+@numba.njit(cache=True)
+def _corwin_schultz(high, low, previous_high, previous_low, previous_close):
+    """Two-day Corwin-Schultz spread (fraction of price) with the overnight-gap adjustment"""
+    # Shift today's range onto yesterday's close when the market gapped past it
+    if low > previous_close:
+        high, low = high - (low - previous_close), previous_close
+    elif high < previous_close:
+        high, low = previous_close, low + (previous_close - high)
+    beta = math.log(high / low) ** 2 + math.log(previous_high / previous_low) ** 2
+    gamma = math.log(max(high, previous_high) / min(low, previous_low)) ** 2
+    alpha = (math.sqrt(2.0 * beta) - math.sqrt(beta)) / _CS_DENOMINATOR - math.sqrt(gamma / _CS_DENOMINATOR)
+    spread = 2.0 * (math.exp(alpha) - 1.0) / (1.0 + math.exp(alpha))
+    return spread if spread > 0.0 else 0.0
+
+
+@numba.njit(parallel=True, cache=True)
+def _rolling_liquidity(close, high, low, turnover, starts, window, out):
+    """AMIHUD, CS_SPREAD_BPS and ROLL_SPREAD_BPS per row; rows are grouped by contract, in date order"""
+    for g in numba.prange(starts.shape[0] - 1):
+        lo, hi = starts[g], starts[g + 1]
+        returns = np.full(hi - lo, np.nan)
+        amihud = np.full(hi - lo, np.nan)
+        spread = np.full(hi - lo, np.nan)
+        for i in range(lo + 1, hi):
+            if close[i] > 0.0 and close[i - 1] > 0.0:
+                returns[i - lo] = math.log(close[i] / close[i - 1])
+                if turnover[i] > 0.0:
+                    amihud[i - lo] = abs(returns[i - lo]) / (turnover[i] / 1e6)
+            if low[i] > 0.0 and low[i - 1] > 0.0 and high[i] >= low[i] and high[i - 1] >= low[i - 1] \
+                    and close[i - 1] > 0.0:
+                spread[i - lo] = _corwin_schultz(high[i], low[i], high[i - 1], low[i - 1], close[i - 1])
+
+        # Running sums over the last `window` rows of the contract (NaNs skipped)
+        amihud_sum = amihud_n = spread_sum = spread_n = 0.0
+        sx = sy = sxy = pairs = 0.0
+        for k in range(hi - lo):
+            if not math.isnan(amihud[k]):
+                amihud_sum += amihud[k]
+                amihud_n += 1
+            if not math.isnan(spread[k]):
+                spread_sum += spread[k]
+                spread_n += 1
+            if k > 0 and not math.isnan(returns[k]) and not math.isnan(returns[k - 1]):
+                sx += returns[k]
+                sy += returns[k - 1]
+                sxy += returns[k] * returns[k - 1]
+                pairs += 1
+            old = k - window
+            if old >= 0:
+                if not math.isnan(amihud[old]):
+                    amihud_sum -= amihud[old]
+                    amihud_n -= 1
+                if not math.isnan(spread[old]):
+                    spread_sum -= spread[old]
+                    spread_n -= 1
+                if old > 0 and not math.isnan(returns[old]) and not math.isnan(returns[old - 1]):
+                    sx -= returns[old]
+                    sy -= returns[old - 1]
+                    sxy -= returns[old] * returns[old - 1]
+                    pairs -= 1
+
+            out[lo + k, 0] = amihud_sum / amihud_n if amihud_n > 0 else np.nan
+            out[lo + k, 1] = 1e4 * spread_sum / spread_n if spread_n > 0 else np.nan
+            if pairs >= 2:
+                covariance = (sxy - sx * sy / pairs) / (pairs - 1)
+                out[lo + k, 2] = 1e4 * 2.0 * math.sqrt(-covariance) if covariance < 0.0 else 0.0
+            else:
+                out[lo + k, 2] = np.nan
+
+
+def liquidity_metrics(frame, settings, window=WINDOW):
+    """
+    KEY_COLUMNS plus LIQUIDITY_COLUMNS for every contract-day of a canonical frame.
+
+    `settings` is the analysis.liquidity block (min_volume in contracts,
+    min_turnover in INR of premium, max_spread_bps). The rolling estimators
+    look back only, over the contract's last `window` rows.
+    """
+    frame = frame.drop_duplicates(KEY_COLUMNS, keep='last')
+    contract = frame.groupby(KEY_COLUMNS[:-1], observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    order = np.lexsort((frame['DATE'].to_numpy(), contract))
+    frame = frame.iloc[order].reset_index(drop=True)
+    contract = contract[order]
+    starts = np.r_[np.flatnonzero(np.r_[True, contract[1:] != contract[:-1]]), len(frame)].astype(np.int64)
+
+    quantity = frame['TOTAL TRADED QUANTITY'].to_numpy(dtype=np.float64, na_value=np.nan)
+    strike = frame['STRIKE PRICE'].to_numpy(dtype=np.float64, na_value=np.nan)
+    turnover = frame['PREMIUM VALUE'].to_numpy(dtype=np.float64, na_value=np.nan) - np.nan_to_num(strike) * quantity
+
+    def prices(column):
+        return np.ascontiguousarray(frame[column].to_numpy(dtype=np.float64, na_value=np.nan))
+
+    estimates = np.empty((len(frame), 3), dtype=np.float64)
+    _rolling_liquidity(prices('CLOSE'), prices('HIGH'), prices('LOW'), turnover, starts, int(window), estimates)
+
+    result = frame[KEY_COLUMNS].copy()
+    result['CONTRACTS'] = quantity / frame['MARKET LOT'].to_numpy(dtype=np.float64, na_value=np.nan)
+    result['TURNOVER'] = turnover
+    result['AMIHUD'] = estimates[:, 0]
+    result['CS_SPREAD_BPS'] = estimates[:, 1]
+    result['ROLL_SPREAD_BPS'] = estimates[:, 2]
+    result['SPREAD_BPS'] = np.where(np.isnan(estimates[:, 1]), estimates[:, 2], estimates[:, 1])
+    flags = ((result['CONTRACTS'] >= settings['min_volume']).to_numpy() * VOLUME_OK
+             | (result['TURNOVER'] >= settings['min_turnover']).to_numpy() * TURNOVER_OK
+             | (result['SPREAD_BPS'] <= settings['max_spread_bps']).to_numpy() * SPREAD_OK)
+    result['LIQUIDITY_FLAGS'] = flags
+    result['LIQUID'] = flags == ALL_OK
+    return result.astype(LIQUIDITY_COLUMNS)
+
+
+def liquidity_root(root):
+    """Store holding the liquidity metrics and mask of a dataset's contract-days, partition for partition"""
+    return os.path.join(root, LIQUIDITY_DIR)
+
+
+def liquidity_dataset(root, symbol, config_file=DEFAULT_CONFIG_FILE):
+    """Recompute the liquidity metrics of one symbol's new or changed partitions; returns those partitions"""
+    settings = analysis_settings('liquidity', config_file)
+    version = json.dumps({'version': LIQUIDITY_VERSION, 'window': WINDOW, 'settings': settings}, sort_keys=True)
+    return refresh_derived(root, liquidity_root(root), symbol, version,
+                           lambda rows: liquidity_metrics(rows, settings))
+
+
+def liquidity_store(root, symbols=None, config_file=DEFAULT_CONFIG_FILE):
+    """Refresh the liquidity metrics of every symbol (or the given ones) whose data or thresholds changed"""
+    symbols = symbols or sorted({symbol for symbol, _, _ in list_partitions(root)})
+    refreshed = {symbol: liquidity_dataset(root, symbol, config_file) for symbol in symbols}
+    return {symbol: partitions for symbol, partitions in refreshed.items() if partitions}
+
+
+def read_liquidity(root, symbol, years=None, columns=None, config_file=DEFAULT_CONFIG_FILE):
+    """KEY_COLUMNS and LIQUIDITY_COLUMNS of one symbol, recomputing stale partitions first"""
+    liquidity_dataset(root, symbol, config_file)
+    columns = columns or KEY_COLUMNS + list(LIQUIDITY_COLUMNS)
+    return read_dataset(liquidity_root(root), symbol=symbol, years=years, columns=columns)
+
+
+def liquid_mask(frame, root, symbol, config_file=DEFAULT_CONFIG_FILE):
+    """Boolean mask over `frame`'s rows from the stored LIQUID column (False for unknown contract-days)"""
+    stored = read_liquidity(root, symbol, columns=KEY_COLUMNS + ['LIQUID'], config_file=config_file)
+    stored = stored.drop_duplicates(KEY_COLUMNS, keep='last')
+    keys = frame[KEY_COLUMNS].astype({column: object for column in ('SYMBOL', 'INSTRUMENT_TYPE', 'OPTION TYPE')})
+    stored = stored.astype({column: object for column in ('SYMBOL', 'INSTRUMENT_TYPE', 'OPTION TYPE')})
+    joined = keys.merge(stored, on=KEY_COLUMNS, how='left')
+    return pd.Series(joined['LIQUID'].fillna(False).to_numpy(dtype=bool), index=frame.index, name='LIQUID')
+
+
+def main():
+    """Refresh the liquidity metrics of one or more stores and report how much passes the screen"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('roots', nargs='+', help="dataset directories (symbol=/year=/month= stores)")
+    parser.add_argument('--symbol', action='append', help="only these symbols")
+    args = parser.parse_args()
+
+    settings = analysis_settings('liquidity')
+    print(f"💧 Thresholds: >= {settings['min_volume']} contracts, >= INR {settings['min_turnover']:,} premium, "
+          f"<= {settings['max_spread_bps']} bps spread")
+    for root in args.roots:
+        liquidity_store(root, args.symbol)
+        for symbol in args.symbol or sorted({symbol for symbol, _, _ in list_partitions(root)}):
+            metrics = read_liquidity(root, symbol)
+            flags = metrics['LIQUIDITY_FLAGS'].to_numpy()
+            print(f"   {root} {symbol}: {int(metrics['LIQUID'].sum())}/{len(metrics)} liquid "
+                  f"(volume {int((flags & VOLUME_OK).astype(bool).sum())}, "
+                  f"turnover {int((flags & TURNOVER_OK).astype(bool).sum())}, "
+                  f"spread {int((flags & SPREAD_OK).astype(bool).sum())}); "
+                  f"median spread {metrics['SPREAD_BPS'].median():.0f} bps")
+
+if __name__ == "__main__":
+    main()
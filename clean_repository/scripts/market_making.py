@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Market-Making Simulator with Parameter-Grid Sweeps
+Compiled replay of each option contract's daily bars against a symmetric quoting policy, swept over the config grid
+"""
+
+import argparse
+import hashlib
+import itertools
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numba
+import numpy as np
+import pandas as pd
+
+from config import DEFAULT_CONFIG_FILE, analysis_settings
+from enrichment import read_enriched
+from implied_vol import TICK_SIZE
+from schema import KEY_COLUMNS
+from strike_planner import DEFAULT_HISTORY_DIR
+
+DEFAULT_CACHE_DIR = "cache/market_making"
+
+# Bump whenever the quoting or fill rules change; cached results are then ignored
+SIMULATOR_VERSION = 3
+
+# Share of a day's traded contracts a quote can be filled for, per side
+PARTICIPATION = 0.01
+
+INPUT_ARRAYS = ['high', 'low', 'settle', 'mark', 'contracts', 'lot']
+CONTRACT_COLUMNS = ['EXPIRY', 'STRIKE PRICE', 'OPTION TYPE']
+RESULT_COLUMNS = ['PNL', 'TRADED', 'MAX_INVENTORY', 'FINAL_INVENTORY', 'DAYS_QUOTED']
+
+
+@numba.njit(cache=True)
+def _simulate_contract(high, low, settle, mark, contracts, lot, lo, hi, half_spread, cap, latency, out):
+    """
+    One contract's days [lo, hi): quotes around a settle `latency` days older
+    than the previous one, fills where the day's range trades through.
+    """
+    cash = 0.0
+    inventory = 0.0
+    traded = 0.0
+    max_inventory = 0.0
+    quoted = 0
+    for i in range(lo + 1 + latency, hi):
+        reference = settle[i - 1 - latency]
+        if not (reference > 0.0 and high[i] >= low[i] and contracts[i] > 0.0):
+            continue
+        quoted += 1
+        size = np.floor(PARTICIPATION * contracts[i])
+        bid = reference - half_spread
+        ask = reference + half_spread
+        # The order of fills within a day is unknown, so both sides are sized off the opening inventory
+        bought = min(size, cap - inventory) if bid > 0.0 and low[i] <= bid else 0.0
+        sold = min(size, cap + inventory) if high[i] >= ask else 0.0
+        bought = max(bought, 0.0)
+        sold = max(sold, 0.0)
+        cash += (sold * ask - bought * bid) * lot[i]
+        inventory += bought - sold
+        traded += bought + sold
+        max_inventory = max(max_inventory, abs(inventory))
+
+    # Open inventory is marked at the last row's mark (intrinsic value on expiry day, see prepare_inputs)
+    last = hi - 1
+    out[0] = cash + inventory * mark[last] * lot[last] if mark[last] >= 0.0 else np.nan
+    out[1] = traded
+    out[2] = max_inventory
+    out[3] = inventory
+    out[4] = quoted
+
+
+@numba.njit(parallel=True, cache=True)
+def _simulate(high, low, settle, mark, contracts, lot, starts, ends, half_spread, cap, latency, out):
+    for c in numba.prange(starts.shape[0]):
+        _simulate_contract(high, low, settle, mark, contracts, lot, starts[c], ends[c], half_spread, cap, latency,
+                           out[c])
+
+
+def simulate(arrays, starts, ends, width, cap, latency=0):
+    """
+    RESULT_COLUMNS per contract for one grid point.
+
+    `arrays` holds INPUT_ARRAYS (rows grouped by contract, in date order) and
+    [starts, ends) each contract's rows. The policy quotes `width` ticks wide
+    around the previous settle, for up to PARTICIPATION of the day's volume
+    per side, never holding more than `cap` contracts either way. With
+    `latency` > 0 the quotes are that many bars stale: they are set off the
+    settle `latency` days before the previous one.
+    """
+    out = np.empty((len(starts), len(RESULT_COLUMNS)), dtype=np.float64)
+    _simulate(*(arrays[name] for name in INPUT_ARRAYS), np.asarray(starts, np.int64), np.asarray(ends, np.int64),
+              width * TICK_SIZE / 2.0, float(cap), int(latency), out)
+    return out
+
+
+def grid(settings):
+    """(width, cap, latency) of every analysis.market_making grid point"""
+    return list(itertools.product(settings['quote_widths'], settings['inventory_caps'], settings['latency_shifts']))
+
+
+def prepare_inputs(root, symbol, cache_dir=DEFAULT_CACHE_DIR, history_dir=DEFAULT_HISTORY_DIR):
+    """
+    Write a symbol's option bars once as .npy arrays for memory-mapped sharing.
+
+    Returns (directory, contracts): contracts has CONTRACT_COLUMNS, the row
+    range of each contract and DIGEST, a hash of its rows that versions its
+    cached results. The directory is keyed by the digests, so unchanged data
+    reuses it. Rows come from the enriched store, whose SPOT gives the
+    intrinsic value open inventory is marked at on expiry day.
+    """
+    rows = read_enriched(root, symbol, history_dir=history_dir)
+    rows = rows[rows['OPTION TYPE'].notna()].drop_duplicates(KEY_COLUMNS, keep='last')
+    rows = rows.sort_values(CONTRACT_COLUMNS + ['DATE'], kind='stable').reset_index(drop=True)
+    # Expiry-day rows carry the underlying as SETTLE PRICE; outside the day's range it is no tradable price
+    settle = rows['SETTLE PRICE'].where(rows['SETTLE PRICE'].between(rows['LOW'], rows['HIGH']), rows['CLOSE'])
+    settle = settle.to_numpy(dtype=np.float64, na_value=np.nan)
+    strike = rows['STRIKE PRICE'].to_numpy(dtype=np.float64, na_value=np.nan)
+    spot = rows['SPOT'].to_numpy(dtype=np.float64, na_value=np.nan)
+    intrinsic = np.maximum(np.where(rows['OPTION TYPE'].astype(object) == 'CE', spot - strike, strike - spot), 0.0)
+    expiry_day = (rows['DATE'] == rows['EXPIRY']).to_numpy()
+    lot = rows['MARKET LOT'].to_numpy(dtype=np.float64, na_value=np.nan)
+    arrays = {
+        'high': rows['HIGH'].to_numpy(dtype=np.float64, na_value=np.nan),
+        'low': rows['LOW'].to_numpy(dtype=np.float64, na_value=np.nan),
+        'settle': settle,
+        # Intrinsic value on expiry day (NaN, so no PnL, without a spot close), the settle before it
+        'mark': np.where(expiry_day, intrinsic, settle),
+        'contracts': rows['TOTAL TRADED QUANTITY'].to_numpy(dtype=np.float64, na_value=np.nan) / lot,
+        'lot': lot,
+    }
+
+    row_hashes = pd.util.hash_pandas_object(
+        rows[['DATE', 'HIGH', 'LOW', 'SETTLE PRICE', 'CLOSE', 'TOTAL TRADED QUANTITY', 'MARKET LOT', 'SPOT']],
+        index=False).to_numpy()
+    contract = rows.groupby(CONTRACT_COLUMNS, observed=True, sort=False).ngroup().to_numpy()
+    starts = np.flatnonzero(np.r_[True, contract[1:] != contract[:-1]])
+    ends = np.r_[starts[1:], len(rows)]
+    contracts = rows.iloc[starts][CONTRACT_COLUMNS].reset_index(drop=True)
+    contracts['START'] = starts
+    contracts['END'] = ends
+    digests = np.add.reduceat(row_hashes, starts) if len(starts) else np.zeros(0, np.uint64)
+    contracts['DIGEST'] = [f'{digest:016x}' for digest in digests]
+
+    version = hashlib.sha256(f'{SIMULATOR_VERSION}:{",".join(contracts["DIGEST"])}'.encode()).hexdigest()[:16]
+    directory = os.path.join(cache_dir, 'inputs', f'{symbol}-{version}')
+    if not os.path.exists(directory):
+        staging = directory + '.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for name, values in arrays.items():
+            np.save(os.path.join(staging, f'{name}.npy'), values)
+        os.replace(staging, directory)
+    return directory, contracts
+
+
+def _run_task(directory, width, cap, latency, starts, ends):
+    """Process-pool task: simulate some contracts of one grid point on memory-mapped inputs"""
+    numba.set_num_threads(1)
+    arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in INPUT_ARRAYS}
+    return simulate(arrays, starts, ends, width, cap, latency)
+
+
+def _result_file(cache_dir, symbol, width, cap, latency):
+    return os.path.join(cache_dir, 'results', symbol, f'v{SIMULATOR_VERSION}-w{width}-c{cap}-l{latency}.parquet')
+
+
+def sweep(root, symbol, settings=None, workers=None, cache_dir=DEFAULT_CACHE_DIR, config_file=DEFAULT_CONFIG_FILE,
+          history_dir=DEFAULT_HISTORY_DIR):
+    """
+    Simulate every contract of a symbol at every grid point.
+
+    Results are cached per grid point with the DIGEST of each contract's
+    data, so a rerun only simulates (contract, grid point) pairs that are
+    missing or whose data changed, and an interrupted sweep resumes where it
+    stopped. Returns one row per contract and grid point.
+    """
+    settings = settings or analysis_settings('market_making', config_file)
+    directory, contracts = prepare_inputs(root, symbol, cache_dir, history_dir)
+    points = grid(settings)
+
+    cached, tasks = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for point in points:
+            path = _result_file(cache_dir, symbol, *point)
+            known = pd.read_parquet(path) if os.path.exists(path) else pd.DataFrame(columns=['DIGEST'])
+            known = known[known['DIGEST'].isin(contracts['DIGEST'])].drop_duplicates('DIGEST')
+            # Contracts with identical rows share a DIGEST and a result, so each digest runs once
+            missing = contracts[~contracts['DIGEST'].isin(known['DIGEST'])].drop_duplicates('DIGEST')
+            cached[point] = known
+            if len(missing):
+                tasks[point] = (missing, pool.submit(
+                    _run_task, directory, *point, missing['START'].to_numpy(), missing['END'].to_numpy()))
+
+        frames = []
+        for point in points:
+            results = cached[point]
+            if point in tasks:
+                missing, future = tasks[point]
+                fresh = pd.DataFrame(future.result(), columns=RESULT_COLUMNS)
+                fresh['DIGEST'] = missing['DIGEST'].to_numpy()
+                results = pd.concat([results, fresh], ignore_index=True) if len(results) else fresh
+                path = _result_file(cache_dir, symbol, *point)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                results.to_parquet(path + '.tmp', index=False)
+                os.replace(path + '.tmp', path)
+            frame = contracts.drop(columns=['START', 'END']).merge(results, on='DIGEST', how='left',
+                                                                   validate='many_to_one')
+            frame.insert(0, 'QUOTE_WIDTH', point[0])
+            frame.insert(1, 'INVENTORY_CAP', point[1])
+            frame.insert(2, 'LATENCY', point[2])
+            frames.append(frame)
+    result = pd.concat(frames, ignore_index=True)
+    result.attrs['simulated'] = sum(len(missing) for missing, _ in tasks.values())
+    return result
+
+
+def main():
+    """Sweep the configured market-making grid over one symbol and rank the grid points"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('root', help="dataset directory (symbol=/year=/month= store)")
+    parser.add_argument('--symbol', default='NIFTY')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--history-dir', default=DEFAULT_HISTORY_DIR)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = sweep(args.root, args.symbol, workers=args.workers, cache_dir=args.cache_dir,
+                    history_dir=args.history_dir)
+    elapsed = time.perf_counter() - started
+    points = results.groupby(['QUOTE_WIDTH', 'INVENTORY_CAP', 'LATENCY'])
+    print(f"🏦 {args.symbol}: {points.ngroups} grid points x {results['DIGEST'].nunique()} contracts in "
+          f"{elapsed:.2f}s ({results.attrs['simulated']} contract runs simulated, the rest cached)")
+    summary = points[['PNL', 'TRADED']].sum().sort_values('PNL', ascending=False)
+    print(summary.head(10).round(0).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Partitioned Parquet Store for Collected Derivatives Data
+Hive-style symbol=/year=/month= dataset written once per partition; combined files are views
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from catalog import PartitionCatalog
+from schema import normalize
+
+PARTITION_KEYS = ['symbol', 'year', 'month']
+
+# Low-cardinality string columns stored dictionary-encoded
+DICTIONARY_COLUMNS = ['SYMBOL', 'OPTION TYPE', 'INSTRUMENT_TYPE']
+
+COMPRESSION = 'zstd'
+
+# Rows are written in this order so each row group covers a narrow band of contracts,
+# which keeps the min/max statistics useful for pruning strike and date predicates
+SORT_COLUMNS = ['INSTRUMENT_TYPE', 'EXPIRY', 'OPTION TYPE', 'STRIKE PRICE', 'DATE']
+ROW_GROUP_SIZE = 16384
+
+# Per-symbol record of the source key each derived partition was computed from
+DERIVED_MANIFEST = '_derived.json'
+
+
+def symbol_path(root, symbol):
+    """Directory holding every partition of one symbol"""
+    return os.path.join(root, f'symbol={symbol}')
+
+
+def partition_path(root, symbol, year, month):
+    """Directory of one symbol/year/month partition"""
+    return os.path.join(symbol_path(root, symbol), f'year={int(year)}', f'month={int(month):02d}')
+
+
+def write_table(frame, path):
+    """Write a frame as one Parquet file in the canonical schema, sorted for row-group pruning"""
+    frame = normalize(frame).sort_values(SORT_COLUMNS, kind='stable')
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    pq.write_table(table, path, compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE,
+                   use_dictionary=[c for c in DICTIONARY_COLUMNS if c in table.column_names])
+    return path
+
+
+def write_partition(frame, root, symbol, year, month):
+    """Write (or replace) one partition as a single compressed Parquet file"""
+    directory = partition_path(root, symbol, year, month)
+
+    # Stage next to the partition and swap it in, so readers never see a half-written one
+    staging = os.path.join(os.path.dirname(directory), '_staging-' + os.path.basename(directory))
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    write_table(frame, os.path.join(staging, 'part-0.parquet'))
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+
+    catalog = PartitionCatalog(root)
+    catalog.forget_partition(symbol, year, month)
+    catalog.record(os.path.join(directory, 'part-0.parquet'), frame)
+    catalog.close()
+    return directory
+
+
+def partition_months(frame):
+    """Expiry (year, month) of each row: the YEAR/MONTH metadata when present, else from EXPIRY"""
+    if 'MONTH' in frame.columns and 'YEAR' in frame.columns:
+        return frame['YEAR'].astype(int), frame['MONTH'].astype(int)
+    expiry = pd.to_datetime(frame['EXPIRY'])
+    return expiry.dt.year, expiry.dt.month
+
+
+def write_partitions(frame, root, symbol):
+    """Split a frame of one symbol by expiry month and write each partition"""
+    years, months = partition_months(frame)
+    written = []
+    for (year, month), part in frame.groupby([years, months]):
+        written.append(write_partition(part, root, symbol, year, month))
+    return written
+
+
+def partition_files(root):
+    """Parquet files of every committed partition (staging directories excluded)"""
+    return [
+        os.path.join(partition_path(root, symbol, year, month), name)
+        for symbol, year, month in list_partitions(root)
+        for name in sorted(os.listdir(partition_path(root, symbol, year, month)))
+        if name.endswith('.parquet')
+    ]
+
+
+def dataset(root):
+    """pyarrow dataset over every partition under root, with the part files' schemas unified"""
+    files = partition_files(root)
+    schema = pa.unify_schemas([pq.read_schema(path) for path in files], promote_options='permissive')
+    partitioning = ds.partitioning(pa.schema([('symbol', pa.string()), ('year', pa.int32()),
+                                              ('month', pa.int32())]), flavor='hive')
+    for key in PARTITION_KEYS:
+        schema = schema.append(partitioning.schema.field(key))
+    return ds.dataset(files, schema=schema, format='parquet', partitioning=partitioning,
+                      partition_base_dir=root)
+
+
+def read_dataset(root, symbol=None, years=None, columns=None):
+    """
+    Combined view over the partitions, optionally pruned to a symbol and years.
+
+    Replaces the old *_full_options.csv / *_combined.csv files; partition keys
+    are used for pruning only and are not returned as columns. Full reads come
+    back in the canonical schema.
+    """
+    if not partition_files(root):
+        return pd.DataFrame()
+    data = dataset(root)
+    condition = None
+    if symbol is not None:
+        condition = ds.field('symbol') == symbol
+    if years is not None:
+        year_filter = ds.field('year').isin([int(y) for y in years])
+        condition = year_filter if condition is None else condition & year_filter
+    if columns is None:
+        columns = [name for name in data.schema.names if name not in PARTITION_KEYS]
+        return normalize(data.to_table(columns=columns, filter=condition).to_pandas())
+    return data.to_table(columns=columns, filter=condition).to_pandas()
+
+
+def list_partitions(root, symbol=None):
+    """(symbol, year, month) of every partition present under root"""
+    partitions = []
+    if not os.path.isdir(root):
+        return partitions
+    for symbol_dir in sorted(os.listdir(root)):
+        if not symbol_dir.startswith('symbol='):
+            continue
+        name = symbol_dir.split('=', 1)[1]
+        if symbol is not None and name != symbol:
+            continue
+        for year_dir in sorted(os.listdir(os.path.join(root, symbol_dir))):
+            if not year_dir.startswith('year='):
+                continue
+            for month_dir in sorted(os.listdir(os.path.join(root, symbol_dir, year_dir))):
+                if month_dir.startswith('month='):
+                    partitions.append((name, int(year_dir[5:]), int(month_dir[6:])))
+    return partitions
+
+
+def read_partition(root, symbol, year, month):
+    """Rows of one symbol/year/month partition (every part file) in the canonical schema"""
+    files = sorted(glob.glob(os.path.join(partition_path(root, symbol, year, month), '*.parquet')))
+    if not files:
+        return pd.DataFrame()
+    schema = pa.unify_schemas([pq.read_schema(path) for path in files], promote_options='permissive')
+    return normalize(ds.dataset(files, schema=schema, format='parquet').to_table().to_pandas())
+
+
+def _derived_keys(source_root, symbol, version, inputs):
+    """Key of every source partition of a symbol: its part files' checksums, `version` and inputs(dates)"""
+    catalog = PartitionCatalog(source_root)
+    catalog.refresh()
+    files = catalog.files(symbol)
+    catalog.close()
+    keys = {}
+    for (year, month), part in files.groupby(['year', 'month']):
+        payload = {'version': version, 'files': sorted(zip(part['path'], part['checksum']))}
+        if inputs is not None:
+            payload['inputs'] = inputs(part['min_date'].min(), part['max_date'].max())
+        keys[f'{int(year)}-{int(month):02d}'] = hashlib.sha256(
+            json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return keys
+
+
+def _derived_manifest(derived_root, symbol):
+    return os.path.join(symbol_path(derived_root, symbol), DERIVED_MANIFEST)
+
+
+def _load_manifest(derived_root, symbol):
+    """{'YYYY-MM': {'key', 'rows'}} of the partitions computed so far"""
+    try:
+        with open(_derived_manifest(derived_root, symbol)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _drop_partition(root, symbol, year, month):
+    shutil.rmtree(partition_path(root, symbol, year, month), ignore_errors=True)
+    catalog = PartitionCatalog(root)
+    catalog.forget_partition(symbol, year, month)
+    catalog.close()
+
+
+def stale_derived(source_root, derived_root, symbol, version, inputs=None):
+    """
+    (keys, stale, orphaned) of a derived store against its source.
+
+    `keys` maps each source partition ('YYYY-MM') to its current key,
+    `stale` lists the partitions whose derived copy is missing or was
+    computed from another key, `orphaned` the derived partitions whose
+    source partition is gone.
+    """
+    keys = _derived_keys(source_root, symbol, version, inputs)
+    known = _load_manifest(derived_root, symbol)
+    present = {f'{year}-{month:02d}' for _, year, month in list_partitions(derived_root, symbol)}
+    stale = [partition for partition, key in keys.items()
+             if known.get(partition, {}).get('key') != key
+             or (partition not in present and known[partition].get('rows'))]
+    return keys, stale, sorted(present - set(keys))
+
+
+def refresh_derived(source_root, derived_root, symbol, version, compute, inputs=None):
+    """
+    Recompute only the partitions of a derived store whose source partition changed.
+
+    `derived_root` mirrors the symbol=/year=/month= layout of `source_root`
+    with one part file per partition holding compute(rows) of the source
+    partition's rows. Each partition is keyed by the checksums of its source
+    part files (from the source's PartitionCatalog), by `version` (model and
+    settings of the computation) and, for data read from elsewhere, by
+    inputs(min_date, max_date) of the partition. Partitions gone from the
+    source are dropped. Returns the 'YYYY-MM' partitions recomputed.
+    """
+    keys, stale, orphaned = stale_derived(source_root, derived_root, symbol, version, inputs)
+    if not stale and not orphaned:
+        return []
+    manifest = _derived_manifest(derived_root, symbol)
+    known = _load_manifest(derived_root, symbol)
+    for partition in orphaned:
+        _drop_partition(derived_root, symbol, *map(int, partition.split('-')))
+        known.pop(partition, None)
+
+    for partition in stale:
+        year, month = map(int, partition.split('-'))
+        derived = compute(read_partition(source_root, symbol, year, month))
+        if len(derived):
+            write_partition(derived, derived_root, symbol, year, month)
+        else:
+            _drop_partition(derived_root, symbol, year, month)
+        known[partition] = {'key': keys[partition], 'rows': len(derived)}
+        # Recorded after every partition, so an interrupted refresh resumes where it stopped
+        os.makedirs(os.path.dirname(manifest), exist_ok=True)
+        with open(manifest + '.tmp', 'w') as f:
+            json.dump(known, f, sort_keys=True)
+        os.replace(manifest + '.tmp', manifest)
+    return stale
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Persistent On-Disk Response Cache for nse.derivatives_df
+Content-addressed zstd Parquet blobs plus a SQLite index with expiry-aware TTL rules
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = "cache/derivatives_df"
+
+# Responses for expiries that have not finished yet are refreshed after this many seconds
+MUTABLE_TTL_SECONDS = 12 * 3600
+
+
+def _as_date(value):
+    """Normalise date/datetime/str request arguments to a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def canonical_params(params):
+    """Request arguments in a stable, JSON-serialisable form (dates as ISO, strikes as floats)"""
+    canonical = {}
+    for name, value in params.items():
+        if value is None:
+            continue
+        if name.endswith('date'):
+            value = _as_date(value).isoformat()
+        elif name == 'strike_price':
+            value = float(value)
+        canonical[name] = value
+    return canonical
+
+
+def is_final(params, today):
+    """A window is final once its expiry is before `today` and it does not extend beyond it"""
+    expiry = params.get('expiry_date')
+    if expiry is None:
+        return False
+    expiry = _as_date(expiry)
+    to_date = _as_date(params.get('to_date', expiry))
+    return expiry < today and to_date <= expiry
+
+
+def cache_key(params):
+    """Content address of a request: sha256 of its canonical JSON"""
+    payload = json.dumps(canonical_params(params), sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache of derivatives_df responses keyed by request arguments.
+
+    Windows whose expiry has passed can never change and are kept forever;
+    anything touching a live expiry goes stale after `mutable_ttl` seconds.
+    Empty responses are cached too, so known-empty windows are not re-requested.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, mutable_ttl=MUTABLE_TTL_SECONDS, max_bytes=None, today=date.today):
+        self.root = root
+        self.mutable_ttl = mutable_ttl
+        self.max_bytes = max_bytes
+        self._today = today
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, 'index.sqlite'), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                symbol TEXT,
+                expiry_date TEXT,
+                path TEXT,
+                rows INTEGER NOT NULL,
+                bytes INTEGER NOT NULL,
+                immutable INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def _blob_path(self, key):
+        return os.path.join(self.root, 'blobs', key[:2], f'{key}.parquet')
+
+    def is_immutable(self, params):
+        """Whether a request's window can no longer change (see is_final)"""
+        return is_final(params, self._today())
+
+    def lookup(self, params, allow_stale=False):
+        """Return (hit, frame); frame is None for a cached empty response"""
+        key = cache_key(params)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, rows, immutable, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return False, None
+            path, rows, immutable, fetched_at = row
+            if not immutable and not allow_stale and time.time() - fetched_at > self.mutable_ttl:
+                return False, None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        if rows == 0:
+            return True, None
+        try:
+            return True, pd.read_parquet(os.path.join(self.root, path))
+        except (OSError, ValueError):
+            # Blob vanished or is corrupt: treat as a miss so it gets re-fetched
+            return False, None
+
+    def store(self, params, frame):
+        """Persist one response (None or empty frames are recorded as empty)"""
+        key = cache_key(params)
+        canonical = canonical_params(params)
+        rows = 0 if frame is None else len(frame)
+        path = None
+        size = 0
+        if rows:
+            blob = self._blob_path(key)
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            tmp = f'{blob}.{threading.get_ident()}.tmp'
+            frame.to_parquet(tmp, compression='zstd', index=False)
+            os.replace(tmp, blob)
+            path = os.path.relpath(blob, self.root)
+            size = os.path.getsize(blob)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(canonical, sort_keys=True), canonical.get('symbol'),
+                 canonical.get('expiry_date'), path, rows, size,
+                 int(self.is_immutable(params)), now, now)
+            )
+            self._db.commit()
+        if self.max_bytes is not None:
+            self.evict()
+
+    def _delete(self, keys_and_paths):
+        for key, path in keys_and_paths:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            if path:
+                try:
+                    os.remove(os.path.join(self.root, path))
+                except FileNotFoundError:
+                    pass
+        self._db.commit()
+
+    def evict(self):
+        """Drop stale mutable entries, then least-recently-used ones until under max_bytes"""
+        with self._lock:
+            stale = self._db.execute(
+                "SELECT key, path FROM responses WHERE immutable = 0 AND fetched_at < ?",
+                (time.time() - self.mutable_ttl,)
+            ).fetchall()
+            self._delete(stale)
+            if self.max_bytes is None:
+                return len(stale)
+            total = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM responses").fetchone()[0]
+            evicted = []
+            for key, path, size in self._db.execute(
+                "SELECT key, path, bytes FROM responses ORDER BY last_access"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                evicted.append((key, path))
+                total -= size
+            self._delete(evicted)
+            return len(stale) + len(evicted)
+
+    def stats(self):
+        """Entry count, total blob bytes and immutable entry count"""
+        with self._lock:
+            entries, size, immutable = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0), COALESCE(SUM(immutable), 0) FROM responses"
+            ).fetchone()
+        return {'entries': entries, 'bytes': size, 'immutable': immutable}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def cached_fetch(fetch, cache):
+    """Wrap a derivatives_df-style callable so every call goes through the cache first"""
+    def wrapper(**params):
+        hit, frame = cache.lookup(params)
+        if hit:
+            return frame
+        frame = fetch(**params)
+        cache.store(params, frame)
+        return frame
+    return wrapper
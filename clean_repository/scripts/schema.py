@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Canonical Schema for NSE Derivatives Data
+Every writer and loader normalises frames here: one set of column names, compact typed columns
+"""
+
+import numpy as np
+import pandas as pd
+
+OPTION_TYPES = pd.CategoricalDtype(['CE', 'PE'])
+INSTRUMENT_TYPES = pd.CategoricalDtype(['OPTIDX', 'FUTIDX', 'OPTSTK', 'FUTSTK'])
+
+# Canonical column order and dtypes. Prices fit float32 (two-decimal prices below
+# 131,072 round-trip exactly); volumes, OI and turnover need float64.
+# Symbols are categorical with data-driven categories.
+COLUMNS = {
+    'DATE': 'datetime64[ns]',
+    'EXPIRY': 'datetime64[ns]',
+    'SYMBOL': 'category',
+    'INSTRUMENT_TYPE': INSTRUMENT_TYPES,
+    'OPTION TYPE': OPTION_TYPES,
+    'STRIKE PRICE': 'float32',
+    'OPEN': 'float32',
+    'HIGH': 'float32',
+    'LOW': 'float32',
+    'CLOSE': 'float32',
+    'LTP': 'float32',
+    'SETTLE PRICE': 'float32',
+    'TOTAL TRADED QUANTITY': 'float64',
+    'MARKET LOT': 'float32',
+    'PREMIUM VALUE': 'float64',
+    'OPEN INTEREST': 'float64',
+    'CHANGE IN OI': 'float64',
+    'YEAR': 'int16',
+    'MONTH': 'int8',
+}
+
+# Spellings used by the older collectors, mapped to the canonical names
+ALIASES = {
+    'OPTION_TYPE': 'OPTION TYPE',
+    'STRIKE_PRICE': 'STRIKE PRICE',
+    'SETTLE_PRICE': 'SETTLE PRICE',
+    'TOTAL_TRADED_QUANTITY': 'TOTAL TRADED QUANTITY',
+    'MARKET_LOT': 'MARKET LOT',
+    'PREMIUM_VALUE': 'PREMIUM VALUE',
+    'OPEN_INTEREST': 'OPEN INTEREST',
+    'CHANGE_IN_OI': 'CHANGE IN OI',
+    'SYMBOL_NAME': 'SYMBOL',
+}
+
+CATEGORICAL_COLUMNS = ['SYMBOL', 'INSTRUMENT_TYPE', 'OPTION TYPE']
+
+# Natural key of one contract-day
+KEY_COLUMNS = ['SYMBOL', 'INSTRUMENT_TYPE', 'EXPIRY', 'STRIKE PRICE', 'OPTION TYPE', 'DATE']
+
+
+def _blank_to_nan(series):
+    """'' / whitespace placeholders (futures strikes and option types) become missing values"""
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        series = series.astype(object).where(series.astype(str).str.strip() != '', np.nan)
+    return series
+
+
+def normalize(frame):
+    """
+    Return `frame` in the canonical schema.
+
+    Alias columns are merged into their canonical names (first non-missing value
+    wins), '' placeholders become NaN, missing canonical columns are added as
+    missing values, and YEAR/MONTH default to the expiry's year and month (0
+    when the expiry is missing too).
+    Columns outside the schema are kept after the canonical ones.
+    """
+    frame = frame.copy()
+    for alias, canonical in ALIASES.items():
+        if alias not in frame.columns:
+            continue
+        values = _blank_to_nan(frame.pop(alias))
+        if canonical in frame.columns:
+            frame[canonical] = _blank_to_nan(frame[canonical]).astype(object).combine_first(values.astype(object))
+        else:
+            frame[canonical] = values
+
+    for column, dtype in COLUMNS.items():
+        if column not in frame.columns:
+            frame[column] = np.nan
+        values = _blank_to_nan(frame[column])
+        if column in ('YEAR', 'MONTH'):
+            expiry = frame['EXPIRY']
+            derived = expiry.dt.year if column == 'YEAR' else expiry.dt.month
+            values = pd.to_numeric(values, errors='coerce').fillna(derived).fillna(0).astype(dtype)
+        elif str(dtype).startswith('datetime64'):
+            values = pd.to_datetime(values).astype(dtype)
+        elif isinstance(dtype, pd.CategoricalDtype):
+            # Fixed categories: anything else (e.g. '-' / 'XX' on futures rows) becomes missing
+            values = pd.Series(pd.Categorical(values.astype(object).where(values.notna(), None), dtype=dtype),
+                               index=frame.index)
+        elif dtype == 'category':
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.cat.remove_unused_categories()
+            else:
+                values = pd.Series(pd.Categorical(values.astype(object).where(values.notna(), None)),
+                                   index=frame.index)
+        else:
+            values = pd.to_numeric(values, errors='coerce').astype(dtype)
+        frame[column] = values
+
+    extra = [column for column in frame.columns if column not in COLUMNS]
+    return frame[list(COLUMNS) + extra]
+
+
+def concat(frames):
+    """Concatenate canonical frames keeping categorical columns categorical"""
+    frames = [frame for frame in frames if frame is not None and len(frame) > 0]
+    if not frames:
+        return normalize(pd.DataFrame(columns=list(COLUMNS)))
+    symbols = sorted(set().union(*(frame['SYMBOL'].cat.categories for frame in frames)))
+    aligned = []
+    for frame in frames:
+        frame = frame.copy()
+        frame['SYMBOL'] = frame['SYMBOL'].cat.set_categories(symbols)
+        aligned.append(frame)
+    return pd.concat(aligned, ignore_index=True)
+
+
+def read_csv(path):
+    """Read one collected CSV file straight into the canonical schema"""
+    return normalize(pd.read_csv(path, low_memory=False))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Streaming Partition Writer
+Fetched batches go straight to Parquet part files while summaries are kept as running aggregates
+"""
+
+import os
+import threading
+
+import pandas as pd
+
+from catalog import PartitionCatalog
+from parquet_store import partition_months, partition_path, write_table
+from schema import normalize
+
+
+class PartitionWriter:
+    """
+    Incremental writer into the symbol=/year=/month= store.
+
+    Every batch becomes its own part file named after the batch (the job key or
+    source file), so rewriting a batch is idempotent and nothing but the current
+    batch is ever held in memory. With a validator (see validator.Validator),
+    each batch is screened first and its bad rows are quarantined instead.
+    Without one, rows missing DATE or EXPIRY are dropped, counted in
+    rows_dropped and reported. Every file written is recorded in the store's
+    PartitionCatalog.
+    """
+
+    def __init__(self, root, validator=None):
+        self.root = root
+        self.validator = validator
+        self.files_written = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self._catalog = None
+
+    @property
+    def catalog(self):
+        if self._catalog is None:
+            self._catalog = PartitionCatalog(self.root)
+        return self._catalog
+
+    def write(self, frame, symbol, name):
+        """Write one batch, split by expiry month, as part-{name}.parquet files"""
+        frame = normalize(frame)
+        if self.validator is not None:
+            frame = self.validator.screen(frame, self.root, symbol, name)
+        missing = (frame['DATE'].isna() | frame['EXPIRY'].isna()).to_numpy()
+        if missing.any():
+            print(f"⚠️  {symbol} part-{name}: dropped {int(missing.sum())} rows without DATE/EXPIRY")
+            self.rows_dropped += int(missing.sum())
+            frame = frame[~missing]
+        years, months = partition_months(frame)
+        written = []
+        for (year, month), part in frame.groupby([years, months]):
+            directory = partition_path(self.root, symbol, year, month)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'part-{name}.parquet')
+            tmp = os.path.join(directory, f'.part-{name}.tmp')
+            write_table(part, tmp)
+            os.replace(tmp, path)
+            self.catalog.record(path, part)
+            written.append(path)
+        self.files_written += len(written)
+        self.rows_written += len(frame)
+        return written
+
+
+class RunningSummary:
+    """Record counts, DATE range and years/months seen, updated one batch at a time"""
+
+    def __init__(self):
+        self.total_records = 0
+        self.min_date = None
+        self.max_date = None
+        self.years = set()
+        self.month_records = {}
+        self.month_batches = {}
+        self._lock = threading.Lock()
+
+    def update(self, frame, year=None, month=None):
+        """Fold one batch into the aggregates; year/month default to each row's expiry month"""
+        if frame is None or len(frame) == 0:
+            return
+        dates = pd.to_datetime(frame['DATE'])
+        if year is None or month is None:
+            years, months = partition_months(frame)
+            counts = pd.Series(1, index=frame.index).groupby([years, months]).sum()
+        else:
+            counts = {(year, month): len(frame)}
+        with self._lock:
+            self.total_records += len(frame)
+            low, high = dates.min(), dates.max()
+            self.min_date = low if self.min_date is None else min(self.min_date, low)
+            self.max_date = high if self.max_date is None else max(self.max_date, high)
+            for (y, m), n in counts.items():
+                key = (int(y), int(m))
+                self.years.add(key[0])
+                self.month_records[key] = self.month_records.get(key, 0) + int(n)
+                self.month_batches[key] = self.month_batches.get(key, 0) + 1
+
+    def merge(self, other):
+        """Fold another summary (e.g. one year's) into this one"""
+        with self._lock:
+            self.total_records += other.total_records
+            for value in (other.min_date, other.max_date):
+                if value is None:
+                    continue
+                self.min_date = value if self.min_date is None else min(self.min_date, value)
+                self.max_date = value if self.max_date is None else max(self.max_date, value)
+            self.years |= other.years
+            for key, n in other.month_records.items():
+                self.month_records[key] = self.month_records.get(key, 0) + n
+            for key, n in other.month_batches.items():
+                self.month_batches[key] = self.month_batches.get(key, 0) + n
+        return self
+
+    def records(self, year=None, month=None):
+        """Records seen for a year, a (year, month), or overall"""
+        if year is None:
+            return self.total_records
+        return sum(n for (y, m), n in self.month_records.items()
+                   if y == year and (month is None or m == month))
+
+    def batches(self, year, month):
+        """Number of non-empty batches (responses) that landed in a (year, month)"""
+        return self.month_batches.get((year, month), 0)
+
+    def months(self, year):
+        """Months of a year that received any records"""
+        return sorted(m for (y, m) in self.month_records if y == year)
+
+    @property
+    def date_range(self):
+        return f"{self.min_date} to {self.max_date}"
+
+
+def stream_to_store(results, writer, summary, tag=None):
+    """
+    Drain (job, frame, error) results into the writer and summary one batch at a time.
+
+    `tag` adds the collector's metadata columns to each frame before it is
+    written. Returns {job: error} for failed requests.
+    """
+    errors = {}
+    for job, data, error in results:
+        if error is not None:
+            errors[job] = error
+            continue
+        if data is None:
+            continue
+        if tag is not None:
+            data = tag(job, data)
+        writer.write(data, job.symbol, job.key[:16])
+        summary.update(data, job.year, job.month)
+    return errors
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Spot-Driven Strike Ladder Planner
+Picks option strikes per expiry from the underlying's closes instead of fixed per-year lists
+"""
+
+import hashlib
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from fetch_engine import option_jobs
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'historical_data')
+DEFAULT_SPOT_CACHE_DIR = "cache/spot"
+
+# Underlying close history (yfinance download) per derivatives symbol
+SPOT_FILES = {
+    'NIFTY': 'nifty_50_5y',
+    'BANKNIFTY': 'banknifty_5y',
+}
+
+# Exchange strike interval of the monthly contracts
+STRIKE_INTERVALS = {
+    'NIFTY': 50,
+    'BANKNIFTY': 100,
+}
+
+# Typed columns of the parsed underlying history
+SPOT_COLUMNS = {
+    'DATE': 'datetime64[ns]',
+    'OPEN': 'float64',
+    'HIGH': 'float64',
+    'LOW': 'float64',
+    'CLOSE': 'float64',
+    'VOLUME': 'int64',
+}
+
+DEFAULT_LADDER_SIZE = 5
+
+# Same request window as FetchJob's default (30 days up to expiry)
+WINDOW_DAYS = 30
+
+
+def read_spot_history(symbol, directory=DEFAULT_HISTORY_DIR):
+    """
+    Daily OHLCV of a symbol's underlying, indexed by date.
+
+    Reads {name}.parquet when present, else the CSV export; both come from
+    yfinance with (Price, Ticker) column levels, which are flattened to Price.
+    """
+    name = SPOT_FILES[symbol]
+    parquet_file = os.path.join(directory, f'{name}.parquet')
+    if os.path.exists(parquet_file):
+        history = pd.read_parquet(parquet_file)
+    else:
+        # Price/Ticker/Date three-line header
+        history = pd.read_csv(os.path.join(directory, f'{name}.csv'), skiprows=[1, 2], index_col=0)
+    if isinstance(history.columns, pd.MultiIndex):
+        history.columns = history.columns.get_level_values(0)
+    history.index = pd.to_datetime(history.index)
+    history.index.name = 'DATE'
+    history.columns = [str(column).title() for column in history.columns]
+    return history.sort_index()
+
+
+def _spot_source(symbol, directory):
+    name = SPOT_FILES[symbol]
+    parquet_file = os.path.join(directory, f'{name}.parquet')
+    return parquet_file if os.path.exists(parquet_file) else os.path.join(directory, f'{name}.csv')
+
+
+def load_spot(symbol, directory=DEFAULT_HISTORY_DIR, cache_dir=DEFAULT_SPOT_CACHE_DIR):
+    """
+    Typed daily history of a symbol's underlying (SPOT_COLUMNS), sorted by DATE.
+
+    The yfinance export is parsed once and cached as Parquet under a
+    fingerprint of the source file, so replacing the export re-parses it.
+    """
+    source = _spot_source(symbol, directory)
+    stat = os.stat(source)
+    fingerprint = hashlib.sha256(f'{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    path = os.path.join(cache_dir, f'{symbol}-{fingerprint.hexdigest()[:16]}.parquet')
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+
+    history = read_spot_history(symbol, directory).reset_index()
+    history.columns = [str(column).upper() for column in history.columns]
+    spot = pd.DataFrame({column: history[column] if column in history else np.nan for column in SPOT_COLUMNS})
+    spot = spot.dropna(subset=['CLOSE'])
+    spot['VOLUME'] = spot['VOLUME'].fillna(0)
+    spot = spot.astype(SPOT_COLUMNS).drop_duplicates('DATE', keep='last').reset_index(drop=True)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = path + '.tmp'
+    spot.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return spot
+
+
+def strike_ladder(spot, interval, n_strikes=DEFAULT_LADDER_SIZE):
+    """n_strikes consecutive strikes at `interval` centred on spot (odd n puts ATM in the middle)"""
+    first = np.floor(spot / interval - (n_strikes - 1) / 2 + 0.5)
+    return [float((first + i) * interval) for i in range(n_strikes)]
+
+
+class StrikePlanner:
+    """
+    ATM-centred strike ladders per (symbol, expiry) from the underlying's closes.
+
+    The ladder is centred on the median close over the request window, so it
+    follows wherever the index actually traded while the contract was fetched.
+    Expiries whose window has no closes (non-trading windows, dates past the
+    history) get no ladder, and their option requests are never made.
+    """
+
+    def __init__(self, directory=DEFAULT_HISTORY_DIR, n_strikes=DEFAULT_LADDER_SIZE,
+                 intervals=None, window_days=WINDOW_DAYS):
+        self.directory = directory
+        self.n_strikes = n_strikes
+        self.intervals = dict(STRIKE_INTERVALS, **(intervals or {}))
+        self.window_days = window_days
+        self.skipped = []
+        self._closes = {}
+
+    def closes(self, symbol):
+        """Close series of a symbol's underlying (read once per planner)"""
+        if symbol not in self._closes:
+            self._closes[symbol] = load_spot(symbol, self.directory).set_index('DATE')['CLOSE']
+        return self._closes[symbol]
+
+    def reference_spot(self, symbol, expiry_date, from_date=None):
+        """Median close over [from_date, expiry_date], or None when nothing traded in that window"""
+        from_date = from_date or expiry_date - timedelta(days=self.window_days)
+        window = self.closes(symbol).loc[pd.Timestamp(from_date):pd.Timestamp(expiry_date)].dropna()
+        if window.empty:
+            return None
+        return float(window.median())
+
+    def strikes(self, symbol, expiry_date, n_strikes=None, from_date=None):
+        """Strike ladder for one expiry; [] (and recorded in .skipped) when no data can exist"""
+        spot = self.reference_spot(symbol, expiry_date, from_date)
+        if spot is None:
+            self.skipped.append((symbol, expiry_date))
+            return []
+        return strike_ladder(spot, self.intervals[symbol], n_strikes or self.n_strikes)
+
+    def option_jobs(self, symbol, expiry_date, year=None, month=None, n_strikes=None):
+        """CE/PE fetch jobs for the planned ladder of one expiry"""
+        return option_jobs(symbol, expiry_date, self.strikes(symbol, expiry_date, n_strikes), year, month)
+
+    def describe(self):
+        if not self.skipped:
+            return "no expiries skipped"
+        return f"{len(self.skipped)} expiries skipped (no underlying closes in window)"
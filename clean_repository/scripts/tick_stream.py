@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Streaming Intraday Tick Ingestion
+Chunked typed reads of NSE snapshot/tick CSVs, O(1)-per-tick rolling aggregates per horizon, zstd per-day partitions
+"""
+
+import argparse
+import os
+import time
+
+import numba
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from config import DEFAULT_CONFIG_FILE, load_config
+from parquet_store import COMPRESSION
+
+DEFAULT_OUTPUT_DIR = "data/intraday"
+
+# Bytes of CSV parsed per chunk; memory stays proportional to this, not to the file
+CHUNK_BYTES = 64 << 20
+
+# Column each tick is parsed as (no inference). Only TIMESTAMP, SYMBOL and LTP are required.
+TICK_TYPES = {
+    'TIMESTAMP': pa.timestamp('ns'),
+    'SYMBOL': pa.string(),
+    'EXPIRY': pa.timestamp('ns'),   # read as dictionary strings, each distinct value parsed once
+    'STRIKE PRICE': pa.float32(),
+    'OPTION TYPE': pa.string(),
+    'LTP': pa.float64(),
+    'VOLUME': pa.float64(),         # cumulative traded quantity of the session
+    'BID': pa.float64(),
+    'ASK': pa.float64(),
+    'OPEN INTEREST': pa.float64(),
+}
+REQUIRED_COLUMNS = ['TIMESTAMP', 'SYMBOL', 'LTP']
+
+# Header spellings seen in NSE snapshot exports, mapped to TICK_TYPES names
+TICK_ALIASES = {
+    'TIME': 'TIMESTAMP', 'DATETIME': 'TIMESTAMP', 'TIMESTAMP': 'TIMESTAMP',
+    'SYMBOL': 'SYMBOL', 'SYMBOL_NAME': 'SYMBOL',
+    'EXPIRY': 'EXPIRY', 'EXPIRY_DATE': 'EXPIRY',
+    'STRIKE': 'STRIKE PRICE', 'STRIKE_PRICE': 'STRIKE PRICE', 'STRIKE PRICE': 'STRIKE PRICE',
+    'OPTION_TYPE': 'OPTION TYPE', 'OPTION TYPE': 'OPTION TYPE',
+    'LTP': 'LTP', 'LAST_PRICE': 'LTP', 'PRICE': 'LTP',
+    'VOLUME': 'VOLUME', 'TOTAL_TRADED_QUANTITY': 'VOLUME', 'TOTAL TRADED QUANTITY': 'VOLUME',
+    'BID': 'BID', 'BID_PRICE': 'BID', 'BEST_BID': 'BID',
+    'ASK': 'ASK', 'ASK_PRICE': 'ASK', 'BEST_ASK': 'ASK', 'OFFER': 'ASK',
+    'OPEN_INTEREST': 'OPEN INTEREST', 'OPEN INTEREST': 'OPEN INTEREST', 'OI': 'OPEN INTEREST',
+}
+
+TIMESTAMP_FORMATS = [pacsv.ISO8601, '%d-%m-%Y %H:%M:%S', '%d-%b-%Y %H:%M:%S']
+EXPIRY_FORMATS = ['%d-%b-%Y', '%d%b%Y', '%Y-%m-%d', '%d-%m-%Y']
+
+INSTRUMENT_COLUMNS = ['SYMBOL', 'EXPIRY', 'STRIKE PRICE', 'OPTION TYPE']
+
+
+def aggregate_columns(horizons):
+    """Names of the rolling columns added for each horizon (seconds)"""
+    return [f'{name}_{horizon}S' for horizon in horizons for name in ('RETURN', 'VOLUME', 'UPDATES')]
+
+
+@numba.njit(cache=True)
+def _aggregate(seconds, instrument, price, cumulative, bid, ask, horizons, current, total_volume, total_updates,
+               last_price, last_cumulative, last_bid, last_ask, bucket_volume, bucket_updates, bucket_price, out):
+    """
+    Rolling aggregates of every tick over the `h` one-second buckets ending with its own second, in arrival order.
+
+    Each instrument keeps a ring of max(horizons) + 1 buckets holding its
+    running traded quantity, quote-update count and last price as of the end
+    of that second. A window's volume and updates are today's running totals
+    less those of the bucket just before the window, and its return is taken
+    against that bucket's price (the last price at or before the window
+    start), so the work per tick is O(1) per horizon however many ticks a
+    window holds. Seconds without ticks are filled forward on the next tick.
+    """
+    size = bucket_volume.shape[1]
+    for i in range(seconds.shape[0]):
+        k = instrument[i]
+        t = seconds[i]
+        if t < 0:  # no timestamp
+            out[i, :] = np.nan
+            continue
+        if current[k] < 0:
+            first = t - size + 1
+        else:
+            first = max(current[k] + 1, t - size + 1)
+            # Ticks out of time order count towards the instrument's latest second
+            t = max(t, current[k])
+        for s in range(first, t + 1):
+            bucket_volume[k, s % size] = total_volume[k]
+            bucket_updates[k, s % size] = total_updates[k]
+            bucket_price[k, s % size] = last_price[k]
+
+        # Traded quantity from the cumulative session volume (a drop means a new session)
+        traded = 0.0
+        if not np.isnan(cumulative[i]):
+            if not np.isnan(last_cumulative[k]):
+                traded = cumulative[i] - last_cumulative[k] if cumulative[i] >= last_cumulative[k] else cumulative[i]
+            last_cumulative[k] = cumulative[i]
+        same_bid = bid[i] == last_bid[k] or (np.isnan(bid[i]) and np.isnan(last_bid[k]))
+        same_ask = ask[i] == last_ask[k] or (np.isnan(ask[i]) and np.isnan(last_ask[k]))
+        updated = 0.0 if current[k] >= 0 and same_bid and same_ask else 1.0
+        last_bid[k] = bid[i]
+        last_ask[k] = ask[i]
+        if not np.isnan(price[i]):
+            last_price[k] = price[i]
+
+        current[k] = t
+        total_volume[k] += traded
+        total_updates[k] += updated
+        slot = t % size
+        bucket_volume[k, slot] = total_volume[k]
+        bucket_updates[k, slot] = total_updates[k]
+        bucket_price[k, slot] = last_price[k]
+
+        for h in range(horizons.shape[0]):
+            before = (t - horizons[h]) % size
+            reference = bucket_price[k, before]
+            out[i, 3 * h] = np.log(price[i] / reference) if reference > 0.0 and price[i] > 0.0 else np.nan
+            out[i, 3 * h + 1] = total_volume[k] - bucket_volume[k, before]
+            out[i, 3 * h + 2] = total_updates[k] - bucket_updates[k, before]
+
+
+class TickAggregator:
+    """
+    Rolling per-instrument state carried across chunks.
+
+    Instruments are numbered as they first appear; every state array is
+    indexed by that number and grows geometrically, so memory depends on the
+    number of instruments and the longest horizon, never on the number or
+    rate of ticks.
+    """
+
+    def __init__(self, horizons):
+        self.horizons = [int(horizon) for horizon in horizons]
+        if min(self.horizons) < 1:
+            raise ValueError(f"horizons must be whole seconds >= 1, got {self.horizons}")
+        self.buckets = max(self.horizons) + 1
+        self.instruments = {}
+        self._allocate(64)
+
+    def _allocate(self, capacity):
+        fresh = {
+            'current': np.full(capacity, -1, dtype=np.int64),
+            'total_volume': np.zeros(capacity, dtype=np.float64),
+            'total_updates': np.zeros(capacity, dtype=np.float64),
+            'last_price': np.full(capacity, np.nan),
+            'last_cumulative': np.full(capacity, np.nan),
+            'last_bid': np.full(capacity, np.nan),
+            'last_ask': np.full(capacity, np.nan),
+            'bucket_volume': np.zeros((capacity, self.buckets), dtype=np.float64),
+            'bucket_updates': np.zeros((capacity, self.buckets), dtype=np.float64),
+            'bucket_price': np.full((capacity, self.buckets), np.nan),
+        }
+        old = getattr(self, 'state', None)
+        if old is not None:
+            for name, values in fresh.items():
+                values[:len(old[name])] = old[name]
+        self.state = fresh
+
+    def instrument_ids(self, chunk):
+        """Number of each tick's instrument, registering new ones"""
+        keys = chunk[INSTRUMENT_COLUMNS]
+        codes = keys.groupby(INSTRUMENT_COLUMNS, dropna=False, sort=False).ngroup().to_numpy()
+        first = np.unique(codes, return_index=True)[1]
+        # Missing parts of a key (futures strikes, option types) become None so keys match across chunks
+        uniques = [tuple(None if pd.isna(value) else value for value in row)
+                   for row in keys.iloc[first].itertuples(index=False)]
+        lookup = np.array([self.instruments.setdefault(key, len(self.instruments)) for key in uniques],
+                          dtype=np.int64)
+        if len(self.instruments) > len(self.state['current']):
+            self._allocate(max(len(self.instruments), 2 * len(self.state['current'])))
+        return lookup[codes]
+
+    def update(self, chunk):
+        """The chunk with aggregate_columns(horizons) appended; ticks must arrive in time order per instrument"""
+        instrument = self.instrument_ids(chunk)
+        out = np.empty((len(chunk), 3 * len(self.horizons)), dtype=np.float64)
+        nanoseconds = chunk['TIMESTAMP'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        state = self.state
+        _aggregate(np.where(nanoseconds >= 0, nanoseconds // 1_000_000_000, -1), instrument,
+                   chunk['LTP'].to_numpy(dtype=np.float64, na_value=np.nan),
+                   chunk['VOLUME'].to_numpy(dtype=np.float64, na_value=np.nan),
+                   chunk['BID'].to_numpy(dtype=np.float64, na_value=np.nan),
+                   chunk['ASK'].to_numpy(dtype=np.float64, na_value=np.nan),
+                   np.array(self.horizons, dtype=np.int64), state['current'], state['total_volume'],
+                   state['total_updates'], state['last_price'], state['last_cumulative'], state['last_bid'],
+                   state['last_ask'], state['bucket_volume'], state['bucket_updates'], state['bucket_price'], out)
+        result = chunk.copy()
+        for j, column in enumerate(aggregate_columns(self.horizons)):
+            result[column] = out[:, j].astype(np.float32 if column.startswith('RETURN') else np.float64)
+        return result
+
+
+def _parse_expiries(values):
+    """datetime64 EXPIRY from a categorical of date strings, trying EXPIRY_FORMATS on each distinct value"""
+    categories = pd.Series(values.cat.categories.astype(str))
+    parsed = pd.Series(pd.NaT, index=categories.index, dtype='datetime64[ns]')
+    for fmt in EXPIRY_FORMATS:
+        pending = parsed.isna()
+        if not pending.any():
+            break
+        parsed[pending] = pd.to_datetime(categories[pending], format=fmt, errors='coerce')
+    # Missing values have code -1, which picks the NaT appended last
+    lookup = np.append(parsed.to_numpy(), np.datetime64('NaT', 'ns'))
+    return pd.Series(lookup[values.cat.codes.to_numpy()], index=values.index)
+
+
+def read_tick_chunks(path, chunk_bytes=CHUNK_BYTES):
+    """Typed frames of TICK_TYPES columns, one per CSV block; missing optional columns come back as NaN"""
+    with open(path) as f:
+        header = f.readline().rstrip('\r\n').split(',')
+    columns = {}
+    for name in header:
+        canonical = TICK_ALIASES.get(name.strip().upper())
+        if canonical is not None and canonical not in columns.values():
+            columns[name] = canonical
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns.values()]
+    if missing:
+        raise ValueError(f"{path}: no {', '.join(missing)} column")
+
+    types = {name: pa.dictionary(pa.int32(), pa.string()) if canonical == 'EXPIRY' else TICK_TYPES[canonical]
+             for name, canonical in columns.items()}
+    reader = pacsv.open_csv(path, read_options=pacsv.ReadOptions(block_size=chunk_bytes),
+                            convert_options=pacsv.ConvertOptions(
+                                column_types=types,
+                                include_columns=list(columns), timestamp_parsers=TIMESTAMP_FORMATS,
+                                strings_can_be_null=True))
+    for batch in reader:
+        chunk = batch.to_pandas().rename(columns=columns)
+        if 'EXPIRY' in chunk:
+            chunk['EXPIRY'] = _parse_expiries(chunk['EXPIRY'])
+        for column, kind in TICK_TYPES.items():
+            if column not in chunk:
+                chunk[column] = pd.Series(pd.NaT if pa.types.is_timestamp(kind) else np.nan, index=chunk.index,
+                                          dtype='datetime64[ns]' if pa.types.is_timestamp(kind) else None)
+        yield chunk[list(TICK_TYPES)]
+
+
+class DayPartitionWriter:
+    """
+    Appends ticks to one zstd Parquet file per trading day, date=YYYY-MM-DD/ticks-{name}.parquet.
+
+    Each day's file is written row group by row group as chunks arrive and
+    only appears under its final name once closed. Ticks without a TIMESTAMP
+    belong to no day; they are counted in `dropped` instead.
+    """
+
+    def __init__(self, root, name):
+        self.root = root
+        self.name = name
+        self.writers = {}
+        self.rows = {}
+        self.dropped = 0
+
+    def _path(self, day):
+        return os.path.join(self.root, f'date={day}', f'ticks-{self.name}.parquet')
+
+    def write(self, frame):
+        missing = frame['TIMESTAMP'].isna()
+        if missing.any():
+            self.dropped += int(missing.sum())
+            frame = frame[~missing]
+        days = frame['TIMESTAMP'].dt.strftime('%Y-%m-%d')
+        for day, part in frame.groupby(days, sort=False):
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            if day not in self.writers:
+                path = self._path(day)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self.writers[day] = pq.ParquetWriter(path + '.tmp', table.schema, compression=COMPRESSION)
+                self.rows[day] = 0
+            self.writers[day].write_table(table)
+            self.rows[day] += len(part)
+
+    def close(self):
+        for day, writer in self.writers.items():
+            writer.close()
+            os.replace(self._path(day) + '.tmp', self._path(day))
+        self.writers = {}
+        return dict(self.rows)
+
+    def abort(self):
+        """Close and delete the unfinished files, publishing nothing"""
+        for day, writer in self.writers.items():
+            writer.close()
+            os.remove(self._path(day) + '.tmp')
+        self.writers = {}
+
+
+def ingest_ticks(path, output_dir=DEFAULT_OUTPUT_DIR, horizons=None, chunk_bytes=CHUNK_BYTES,
+                 config_file=DEFAULT_CONFIG_FILE):
+    """
+    Stream one tick CSV into per-day partitions with rolling aggregates.
+
+    Horizons default to analysis.time_horizons (seconds). Returns {day: rows}.
+    """
+    horizons = horizons or load_config(config_file)['analysis']['time_horizons']
+    aggregator = TickAggregator(horizons)
+    writer = DayPartitionWriter(output_dir, os.path.splitext(os.path.basename(path))[0])
+    try:
+        for chunk in read_tick_chunks(path, chunk_bytes):
+            writer.write(aggregator.update(chunk))
+    except BaseException:
+        writer.abort()
+        raise
+    if writer.dropped:
+        print(f"⚠️  {path}: dropped {writer.dropped} ticks without a TIMESTAMP")
+    return writer.close()
+
+
+def write_synthetic(path, ticks, instruments=50, seed=42, start='2025-08-26 09:15:00'):
+    """A synthetic snapshot CSV: random-walk LTPs, cumulative volumes and bid/ask per option, in time order"""
+    rng = np.random.default_rng(seed)
+    instrument = rng.integers(0, instruments, ticks)
+    times = pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.uniform(0, 6.25 * 3600, ticks)), unit='s')
+    base = rng.uniform(20, 400, instruments)
+    steps = rng.normal(0, 0.002, ticks)
+    log_price = np.log(base[instrument]) + pd.Series(steps).groupby(instrument).cumsum().to_numpy()
+    ltp = np.round(np.exp(log_price) / 0.05) * 0.05
+    volume = pd.Series(rng.integers(0, 20, ticks) * 75).groupby(instrument).cumsum().to_numpy()
+    strikes = 24000 + 50 * (np.arange(instruments) // 2 - instruments // 4)
+    frame = pd.DataFrame({
+        'TIMESTAMP': times.strftime('%Y-%m-%d %H:%M:%S.%f'),
+        'SYMBOL': 'NIFTY',
+        'EXPIRY': '28-Aug-2025',
+        'STRIKE_PRICE': strikes[instrument],
+        'OPTION_TYPE': np.where(instrument % 2 == 0, 'CE', 'PE'),
+        'LTP': ltp,
+        'VOLUME': volume,
+        'BID': ltp - 0.05 * rng.integers(1, 3, ticks),
+        'ASK': ltp + 0.05 * rng.integers(1, 3, ticks),
+        'OI': 1000 * 75,
+    })
+    frame.to_csv(path, index=False)
+    return path
+
+
+def main():
+    """Ingest an intraday tick CSV (config data.options_file by default) into per-day partitions"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', nargs='?', help="tick/snapshot CSV")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_BYTES >> 20)
+    parser.add_argument('--synthetic', type=int, metavar='TICKS', help="first write a synthetic file of TICKS rows")
+    args = parser.parse_args()
+
+    path = args.path
+    if path is None:
+        path = os.path.join(os.path.dirname(DEFAULT_CONFIG_FILE), load_config()['data']['options_file'])
+    if args.synthetic:
+        write_synthetic(path, args.synthetic)
+        print(f"🧪 Wrote {args.synthetic} synthetic ticks to {path}")
+
+    started = time.perf_counter()
+    rows = ingest_ticks(path, args.output_dir, chunk_bytes=args.chunk_mb << 20)
+    elapsed = time.perf_counter() - started
+    total = sum(rows.values())
+    print(f"⏱️  {total} ticks in {elapsed:.2f}s ({total / max(elapsed, 1e-9) / 1e6:.2f}M/s)")
+    for day, count in sorted(rows.items()):
+        print(f"   {day}: {count} ticks -> {args.output_dir}/date={day}/")
+
+if __name__ == "__main__":
+    main()
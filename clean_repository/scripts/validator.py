@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Ingest-Time Data Quality Validator
+One vectorized pass per batch: flags bad rows in a compact violations table and quarantines them
+"""
+
+import argparse
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from expiry_calendar import read_holidays
+from parquet_store import write_table
+from schema import KEY_COLUMNS, normalize
+from strike_planner import SPOT_FILES, load_spot
+
+QUARANTINE_DIR = '_quarantine'
+
+MISSING_KEY = 'missing_key'    # no DATE or EXPIRY, so the row has no contract-day or partition
+OHLC = 'ohlc'                  # LOW/HIGH do not bound OPEN/CLOSE, or a negative price
+SETTLE_SPOT = 'settle_spot'    # option settle at or above its no-arbitrage bound (spot for CE, strike for PE);
+                               # not applied on expiry day, when SETTLE PRICE is the final settlement price
+DUPLICATE = 'duplicate_key'    # contract-day already seen earlier in the batch
+OI_CONTINUITY = 'oi_continuity'  # OPEN INTEREST - previous day's != CHANGE IN OI
+LOT_CHANGE = 'lot_change'      # MARKET LOT differs from the contract's previous day
+
+CHECKS = pd.CategoricalDtype([MISSING_KEY, OHLC, SETTLE_SPOT, DUPLICATE, OI_CONTINUITY, LOT_CHANGE])
+
+# Rows failing these are quarantined; the others are only reported
+QUARANTINE_CHECKS = (MISSING_KEY, OHLC, SETTLE_SPOT, DUPLICATE)
+
+# A settle within this fraction of its bound is treated as the underlying's price
+SETTLE_BOUND_TOLERANCE = 0.02
+# Oldest spot close the settle check may use
+SPOT_TOLERANCE = np.timedelta64(5, 'D')
+OI_TOLERANCE = 0.5
+
+CONTRACT_COLUMNS = ['SYMBOL', 'INSTRUMENT_TYPE', 'EXPIRY', 'STRIKE PRICE', 'OPTION TYPE']
+
+
+def _values(frame, column):
+    return frame[column].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _contract_codes(frame):
+    """Integer id per contract (missing strike/option type count as values)"""
+    keys = frame[CONTRACT_COLUMNS].astype(object).fillna('')
+    return keys.groupby(CONTRACT_COLUMNS, sort=False, observed=True).ngroup().to_numpy()
+
+
+def _asof_spot(dates, spot):
+    """Last underlying close on or before each date (NaN beyond SPOT_TOLERANCE)"""
+    spot_dates = spot['DATE'].to_numpy(dtype='datetime64[ns]')
+    closes = spot['CLOSE'].to_numpy(dtype=np.float64)
+    position = np.searchsorted(spot_dates, dates, side='right') - 1
+    found = position >= 0
+    position = np.clip(position, 0, None)
+    found &= dates - spot_dates[position] <= SPOT_TOLERANCE
+    return np.where(found, closes[position], np.nan)
+
+
+class Validator:
+    """
+    Checks every batch on its way into a store and keeps running violation counts.
+
+    validate() returns the violations table: one row per (row, check) with the
+    batch row position, the check, the observed value and the bound or
+    expected value it was compared with. screen() also moves rows failing a
+    QUARANTINE_CHECKS check out of the batch into {store}/_quarantine/.
+    """
+
+    def __init__(self, history_dir=None, holidays=None):
+        self.history_dir = history_dir
+        self.holidays = read_holidays() if holidays is None else holidays
+        self.counts = {check: 0 for check in CHECKS.categories}
+        self.rows_checked = 0
+        self.rows_quarantined = 0
+        self._spot = {}
+        self._lock = threading.Lock()
+
+    def spot(self, symbol):
+        if symbol not in self._spot:
+            kwargs = {'directory': self.history_dir} if self.history_dir else {}
+            self._spot[symbol] = load_spot(symbol, **kwargs) if symbol in SPOT_FILES else None
+        return self._spot[symbol]
+
+    def validate(self, frame, symbol=None):
+        """Violations table of a canonical batch (row positions refer to `frame` as given)"""
+        n = len(frame)
+        open_, high, low, close = (_values(frame, c) for c in ('OPEN', 'HIGH', 'LOW', 'CLOSE'))
+        settle, strike = _values(frame, 'SETTLE PRICE'), _values(frame, 'STRIKE PRICE')
+        oi, oi_change, lot = (_values(frame, c) for c in ('OPEN INTEREST', 'CHANGE IN OI', 'MARKET LOT'))
+        dates = frame['DATE'].to_numpy(dtype='datetime64[ns]')
+        expiries = frame['EXPIRY'].to_numpy(dtype='datetime64[ns]')
+        option_type = frame['OPTION TYPE'].astype(object).to_numpy()
+        results = []
+
+        missing = np.isnat(dates) | np.isnat(expiries)
+        results.append((MISSING_KEY, missing, settle, np.full(n, np.nan)))
+
+        # OHLC: only rows that traded (all four prices set and non-zero)
+        traded = (open_ > 0) & (high > 0) & (low > 0) & (close > 0)
+        with np.errstate(invalid='ignore'):
+            bad = traded & ((low > np.minimum(open_, close)) | (high < np.maximum(open_, close)))
+            bad |= (np.fmin(np.fmin(open_, high), np.fmin(low, close)) < 0)
+        results.append((OHLC, bad, low, np.minimum(open_, close)))
+
+        # Settle price sanity: a call is worth less than spot, a put less than its strike.
+        # On expiry day the settle is the final settlement price rather than a premium.
+        spot = self.spot(symbol) if symbol is not None else None
+        spot_close = _asof_spot(dates, spot) if spot is not None else np.full(n, np.nan)
+        bound = np.where(option_type == 'CE', spot_close, np.where(option_type == 'PE', strike, np.nan))
+        expiry_day = dates == expiries
+        with np.errstate(invalid='ignore'):
+            bad = ~expiry_day & (settle >= bound * (1 - SETTLE_BOUND_TOLERANCE))
+        results.append((SETTLE_SPOT, bad, settle, bound))
+
+        # Duplicate contract-days: every repeat after the first
+        keys = [c for c in KEY_COLUMNS if c in frame.columns]
+        duplicated = frame.duplicated(keys).to_numpy()
+        results.append((DUPLICATE, duplicated, settle, np.full(n, np.nan)))
+
+        # Day-over-day checks on each contract's series (first occurrences with a DATE and EXPIRY only)
+        contract = _contract_codes(frame)
+        order = np.lexsort((dates, contract))
+        order = order[~duplicated[order] & ~missing[order]]
+        same = np.zeros(len(order), dtype=bool)
+        same[1:] = contract[order[1:]] == contract[order[:-1]]
+        previous = np.full(n, -1)
+        previous[order[1:][same[1:]]] = order[:-1][same[1:]]
+        has_previous = previous >= 0
+        before = np.where(has_previous, previous, 0)
+
+        # OI continuity only between consecutive trading days, where no day is missing in between
+        consecutive = has_previous.copy()
+        consecutive[has_previous] = np.busday_count(dates[before[has_previous]].astype('datetime64[D]'),
+                                                    dates[has_previous].astype('datetime64[D]'),
+                                                    holidays=self.holidays) == 1
+        expected_oi = oi[before] + oi_change
+        with np.errstate(invalid='ignore'):
+            bad = consecutive & (np.abs(oi - expected_oi) > OI_TOLERANCE)
+            results.append((OI_CONTINUITY, bad, oi, expected_oi))
+            bad = has_previous & (lot != lot[before]) & ~np.isnan(lot) & ~np.isnan(lot[before])
+        results.append((LOT_CHANGE, bad, lot, lot[before]))
+
+        parts = []
+        for check, bad, value, expected in results:
+            rows = np.flatnonzero(bad)
+            parts.append(pd.DataFrame({
+                'ROW': rows.astype(np.int32),
+                'CHECK': pd.Categorical([check] * len(rows), dtype=CHECKS),
+                'VALUE': value[rows].astype(np.float32),
+                'EXPECTED': expected[rows].astype(np.float32),
+            }))
+        violations = pd.concat(parts, ignore_index=True)
+        with self._lock:
+            self.rows_checked += n
+            for check, count in violations['CHECK'].value_counts().items():
+                self.counts[check] += int(count)
+        return violations
+
+    def screen(self, frame, root, symbol, name):
+        """
+        Validate one batch bound for part-{name} of `root` and return the rows to keep.
+
+        Quarantined rows and the batch's violations (with their contract-day keys)
+        are written to {root}/_quarantine/symbol={symbol}/, replacing what an
+        earlier write of the same batch left there.
+        """
+        frame = normalize(frame).reset_index(drop=True)
+        violations = self.validate(frame, symbol)
+        quarantined = np.zeros(len(frame), dtype=bool)
+        blocking = violations['CHECK'].isin(QUARANTINE_CHECKS).to_numpy()
+        quarantined[violations['ROW'].to_numpy()[blocking]] = True
+
+        directory = os.path.join(root, QUARANTINE_DIR, f'symbol={symbol}')
+        rows_file = os.path.join(directory, f'rows-{name}.parquet')
+        violations_file = os.path.join(directory, f'violations-{name}.parquet')
+        for path in (rows_file, violations_file):
+            if os.path.exists(path):
+                os.remove(path)
+        if len(violations):
+            os.makedirs(directory, exist_ok=True)
+            context = frame.loc[violations['ROW'], ['DATE', 'EXPIRY', 'OPTION TYPE', 'STRIKE PRICE']]
+            report = pd.concat([violations, context.reset_index(drop=True)], axis=1)
+            report.to_parquet(violations_file, index=False, compression='zstd')
+        if quarantined.any():
+            write_table(frame[quarantined], rows_file)
+            with self._lock:
+                self.rows_quarantined += int(quarantined.sum())
+        return frame[~quarantined]
+
+    def describe(self):
+        found = ", ".join(f"{check} {count}" for check, count in self.counts.items() if count) or "no violations"
+        return f"{self.rows_checked} rows checked, {self.rows_quarantined} quarantined ({found})"
+
+
+def read_violations(root, symbol=None):
+    """Every violations table written under a store's quarantine directory"""
+    directory = os.path.join(root, QUARANTINE_DIR)
+    if not os.path.isdir(directory):
+        return pd.DataFrame()
+    frames = []
+    for symbol_dir in sorted(os.listdir(directory)):
+        if symbol is not None and symbol_dir != f'symbol={symbol}':
+            continue
+        for name in sorted(os.listdir(os.path.join(directory, symbol_dir))):
+            if name.startswith('violations-'):
+                frame = pd.read_parquet(os.path.join(directory, symbol_dir, name))
+                frame.insert(0, 'SYMBOL', symbol_dir.split('=', 1)[1])
+                frame.insert(1, 'BATCH', name[len('violations-'):-len('.parquet')])
+                frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def main():
+    """Summarise the violations recorded for one or more stores"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('roots', nargs='+')
+    parser.add_argument('--symbol')
+    args = parser.parse_args()
+
+    for root in args.roots:
+        violations = read_violations(root, args.symbol)
+        if violations.empty:
+            print(f"✅ {root}: no violations recorded")
+            continue
+        print(f"⚠️  {root}: {len(violations)} violations")
+        counts = violations.groupby(['SYMBOL', 'CHECK'], observed=True).size()
+        for (symbol, check), count in counts.items():
+            print(f"   {symbol} {check}: {count}")
+
+if __name__ == "__main__":
+    main()
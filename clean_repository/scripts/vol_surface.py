@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Incremental Volatility Surfaces
+Daily IV on the config moneyness and delta grids as date x tenor x grid arrays, updating only new or changed dates
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+import numba
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from catalog import PartitionCatalog
+from config import DEFAULT_CONFIG_FILE, analysis_settings
+from greeks import MODEL_VERSION, greeks_dataset, greeks_root
+from implied_vol import CONVERGED
+from parquet_store import list_partitions
+from schema import KEY_COLUMNS
+from strike_planner import DEFAULT_HISTORY_DIR
+
+SURFACE_DIR = '_surface'
+SURFACE_VERSION = 2
+
+# Columns of the Greeks store a surface is built from
+INPUT_COLUMNS = KEY_COLUMNS + ['FORWARD', 'SPOT', 'TIME_TO_EXPIRY', 'IV', 'IV_STATUS', 'DELTA']
+
+ARRAYS = ['dates', 'digests', 'expiries', 'tte', 'moneyness_iv', 'delta_iv']
+
+
+@numba.njit(parallel=True, cache=True)
+def _interpolate(x, y, starts, grid, out):
+    """Linear interpolation of each group's (x ascending, y) points onto grid; NaN outside the quoted range"""
+    for g in numba.prange(starts.shape[0] - 1):
+        lo, hi = starts[g], starts[g + 1]
+        for j in range(grid.shape[0]):
+            out[g, j] = np.nan
+            if hi - lo < 2 or grid[j] < x[lo] or grid[j] > x[hi - 1]:
+                continue
+            k = lo + np.searchsorted(x[lo:hi], grid[j])
+            if x[k] == grid[j]:
+                out[g, j] = y[k]
+            else:
+                weight = (grid[j] - x[k - 1]) / (x[k] - x[k - 1])
+                out[g, j] = y[k - 1] + weight * (y[k] - y[k - 1])
+
+
+def _quotes(frame):
+    """
+    Out-of-the-money option rows with a converged IV, as plain arrays.
+
+    Puts quote strikes below the forward and calls the rest, so each strike
+    contributes its time-value side once. CALL_DELTA puts both on one axis
+    (put delta + 1 under the zero-rate Greeks).
+    """
+    frame = frame.drop_duplicates(KEY_COLUMNS, keep='last')
+    option_type = frame['OPTION TYPE'].astype(object).to_numpy()
+    forward = frame['FORWARD'].to_numpy(dtype=np.float64, na_value=np.nan)
+    forward = np.where(np.isnan(forward), frame['SPOT'].to_numpy(dtype=np.float64, na_value=np.nan), forward)
+    strike = frame['STRIKE PRICE'].to_numpy(dtype=np.float64, na_value=np.nan)
+    tte = frame['TIME_TO_EXPIRY'].to_numpy(dtype=np.float64, na_value=np.nan)
+    keep = ((frame['IV_STATUS'].to_numpy() == CONVERGED) & (tte > 0)
+            & (((option_type == 'CE') & (strike >= forward)) | ((option_type == 'PE') & (strike < forward))))
+    delta = frame['DELTA'].to_numpy(dtype=np.float64, na_value=np.nan)
+    return pd.DataFrame({
+        'DATE': frame['DATE'].to_numpy().astype('datetime64[D]')[keep],
+        'EXPIRY': frame['EXPIRY'].to_numpy().astype('datetime64[D]')[keep],
+        'LOG_MONEYNESS': np.log(strike[keep] / forward[keep]),
+        'CALL_DELTA': np.where(option_type == 'PE', delta + 1.0, delta)[keep],
+        'TTE': tte[keep],
+        'IV': frame['IV'].to_numpy(dtype=np.float64)[keep],
+    })
+
+
+def _day_digests(quotes):
+    """(dates, digest) with one order-independent 64-bit digest of each date's quotes"""
+    hashes = pd.util.hash_pandas_object(quotes, index=False).to_numpy()
+    dates, inverse = np.unique(quotes['DATE'].to_numpy().astype('datetime64[D]'), return_inverse=True)
+    digests = np.zeros(len(dates), dtype=np.uint64)
+    np.add.at(digests, inverse, hashes)
+    return dates, digests
+
+
+def _starts(keys):
+    """Start row of every run of equal keys (rows sorted by them), plus the end"""
+    if not len(keys):
+        return np.zeros(1, dtype=np.int64)
+    differs = keys[1:] != keys[:-1]
+    if differs.ndim > 1:
+        differs = differs.any(axis=1)
+    return np.r_[0, np.flatnonzero(differs) + 1, len(keys)].astype(np.int64)
+
+
+def _grid_iv(quotes, x_column, grid):
+    """One row of grid IVs per (DATE, EXPIRY) group of quotes, with the groups' keys"""
+    quotes = quotes.sort_values(['DATE', 'EXPIRY', x_column], kind='stable')
+    starts = _starts(quotes[['DATE', 'EXPIRY']].to_numpy())
+    out = np.empty((len(starts) - 1, len(grid)), dtype=np.float64)
+    _interpolate(quotes[x_column].to_numpy(), quotes['IV'].to_numpy(), starts, np.asarray(grid, np.float64), out)
+    return quotes.iloc[starts[:-1]][['DATE', 'EXPIRY', 'TTE']].reset_index(drop=True), out
+
+
+def _within(dates, ranges):
+    """Mask of the dates inside any of the inclusive (first, last) ranges"""
+    mask = np.zeros(len(dates), dtype=bool)
+    for first, last in ranges:
+        mask |= (dates >= np.datetime64(first, 'D')) & (dates <= np.datetime64(last, 'D'))
+    return mask
+
+
+class VolSurface:
+    """
+    One symbol's daily implied-volatility surfaces as dense arrays.
+
+    Axis 0 is the trading date, axis 1 the tenor bucket and axis 2 the grid.
+    Bucket i holds expiries with tenor_days[i - 1] < days to expiry <=
+    tenor_days[i] (the nearest one when a date quotes several), so a slice at
+    one bucket is the same tenor on every date; `expiries` and `tte` record
+    the contract in each cell. `moneyness_iv` is IV at STRIKE / FORWARD =
+    moneyness_levels and `delta_iv` IV at call delta = delta_levels / 100 (so
+    25 is the 25-delta call and 75 the 25-delta put). Grid points outside a
+    day's quoted strikes, and buckets with no expiry, are NaN. Queries over
+    dates are slices of these arrays.
+    """
+
+    def __init__(self, moneyness_levels, delta_levels, tenor_days, arrays=None):
+        self.moneyness_levels = np.asarray(moneyness_levels, dtype=np.float64)
+        self.delta_levels = np.asarray(delta_levels, dtype=np.int64)
+        self.tenor_days = np.asarray(tenor_days, dtype=np.int64)
+        if arrays is None:
+            arrays = self._empty(0)
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    def _empty(self, dates):
+        return {
+            'dates': np.empty(dates, dtype='datetime64[D]'),
+            'digests': np.zeros(dates, dtype=np.uint64),
+            'expiries': np.full((dates, self.tenors), np.datetime64('NaT'), dtype='datetime64[D]'),
+            'tte': np.full((dates, self.tenors), np.nan, dtype=np.float32),
+            'moneyness_iv': np.full((dates, self.tenors, len(self.moneyness_levels)), np.nan, dtype=np.float32),
+            'delta_iv': np.full((dates, self.tenors, len(self.delta_levels)), np.nan, dtype=np.float32),
+        }
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def tenors(self):
+        return len(self.tenor_days)
+
+    def buckets(self, dates, expiries):
+        """Tenor bucket of each (date, expiry), or self.tenors when it is past the longest one"""
+        days = (np.asarray(expiries, dtype='datetime64[D]') - np.asarray(dates, dtype='datetime64[D]')).astype(np.int64)
+        return np.searchsorted(self.tenor_days, days, side='left')
+
+    def update(self, frame, ranges=None):
+        """
+        Bring the surface in line with a Greeks frame (see greeks.read_greeks).
+
+        Without `ranges` the frame holds every quote and dates no longer in it
+        are dropped. With `ranges`, a list of inclusive (first, last) dates, only
+        the dates inside them are brought in line with the frame (which must
+        hold every quote of those dates) and the others are kept as they are.
+        Only dates that are new or whose quotes changed are interpolated.
+        Returns the recomputed dates.
+        """
+        quotes = _quotes(frame)
+        scope = np.ones(len(self.dates), dtype=bool)
+        if ranges is not None:
+            quotes = quotes[_within(quotes['DATE'].to_numpy(), ranges)]
+            scope = _within(self.dates, ranges)
+        dates, digests = _day_digests(quotes)
+        known = dict(zip(self.dates.tolist(), self.digests.tolist()))
+        fresh_day = np.array([known.get(date) != digest for date, digest in zip(dates.tolist(), digests.tolist())],
+                             dtype=bool)
+        changed = dates[fresh_day]
+
+        fresh = quotes[np.isin(quotes['DATE'].to_numpy(), changed)]
+        groups, moneyness_iv = _grid_iv(fresh, 'LOG_MONEYNESS', np.log(self.moneyness_levels))
+        _, delta_iv = _grid_iv(fresh, 'CALL_DELTA', self.delta_levels / 100.0)
+        # Groups come sorted by DATE then EXPIRY, so the first of each (date, bucket) is its nearest expiry
+        bucket = self.buckets(groups['DATE'].to_numpy(), groups['EXPIRY'].to_numpy())
+        use = (bucket < self.tenors) & ~pd.DataFrame({'DATE': groups['DATE'], 'BUCKET': bucket}).duplicated().to_numpy()
+
+        keep = ~scope | (np.isin(self.dates, dates) & ~np.isin(self.dates, changed))
+        arrays = self._empty(0)
+        arrays['dates'] = np.union1d(self.dates[keep], changed).astype('datetime64[D]')
+        arrays.update({name: values for name, values in self._empty(len(arrays['dates'])).items() if name != 'dates'})
+        kept_rows = np.searchsorted(arrays['dates'], self.dates[keep])
+        for name in ARRAYS[1:]:
+            arrays[name][kept_rows] = getattr(self, name)[keep]
+        arrays['digests'][np.searchsorted(arrays['dates'], changed)] = digests[fresh_day]
+        rows = np.searchsorted(arrays['dates'], groups['DATE'].to_numpy()[use])
+        arrays['expiries'][rows, bucket[use]] = groups['EXPIRY'].to_numpy()[use]
+        arrays['tte'][rows, bucket[use]] = groups['TTE'].to_numpy()[use]
+        arrays['moneyness_iv'][rows, bucket[use]] = moneyness_iv[use]
+        arrays['delta_iv'][rows, bucket[use]] = delta_iv[use]
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        return changed
+
+    def save(self, directory, meta=None):
+        """Write every array (.npy) and the grids, replacing any old surface"""
+        staging = directory.rstrip(os.sep) + '.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for name in ARRAYS:
+            np.save(os.path.join(staging, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump(dict(meta or {}, version=SURFACE_VERSION,
+                           moneyness_levels=self.moneyness_levels.tolist(),
+                           delta_levels=self.delta_levels.tolist(),
+                           tenor_days=self.tenor_days.tolist()), f)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+        return directory
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Open a saved surface; arrays are memory-mapped unless mmap is False"""
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mode) for name in ARRAYS}
+        surface = cls(meta['moneyness_levels'], meta['delta_levels'], meta['tenor_days'], arrays)
+        surface.meta = meta
+        return surface
+
+    def window(self, start=None, end=None):
+        """Slice of the date axis covering [start, end]"""
+        first = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start), 'D')))
+        last = len(self.dates) if end is None else int(
+            np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end), 'D'), side='right'))
+        return slice(first, last)
+
+    def _level(self, levels, value):
+        matches = np.flatnonzero(np.isclose(levels, value))
+        if not len(matches):
+            raise ValueError(f"{value} is not on the surface grid {levels.tolist()}")
+        return int(matches[0])
+
+    def _tenor(self, days):
+        """Axis-1 position of the bucket ending at `days` (the shortest when None)"""
+        return 0 if days is None else self._level(self.tenor_days, days)
+
+    def atm_term_structure(self, start=None, end=None):
+        """IV at STRIKE = FORWARD per date (rows) and tenor bucket (columns, labelled by their last day)"""
+        days = self.window(start, end)
+        atm = self._level(self.moneyness_levels, 1.0)
+        return pd.DataFrame(self.moneyness_iv[days, :, atm], index=pd.DatetimeIndex(self.dates[days], name='DATE'),
+                            columns=pd.Index(self.tenor_days, name='TENOR_DAYS'))
+
+    def front_atm(self, start=None, end=None):
+        """ATM IV of the shortest tenor bucket quoted on each date, i.e. the front contract"""
+        return self.atm_term_structure(start, end).bfill(axis=1).iloc[:, 0].rename('FRONT_ATM_IV')
+
+    def skew(self, delta=25, tenor=None, start=None, end=None):
+        """Risk reversal IV(delta put) - IV(delta call) per date in one tenor bucket (default the shortest)"""
+        days = self.window(start, end)
+        put = self._level(self.delta_levels, 100 - delta)
+        call = self._level(self.delta_levels, delta)
+        column = self._tenor(tenor)
+        values = self.delta_iv[days, column, put] - self.delta_iv[days, column, call]
+        return pd.Series(values, index=pd.DatetimeIndex(self.dates[days], name='DATE'), name=f'{delta}D_SKEW')
+
+    def smile(self, date, tenor=None):
+        """IV across the moneyness grid on one date in one tenor bucket (default the shortest)"""
+        row = self.window(date, date).start
+        if row >= len(self.dates) or self.dates[row] != np.datetime64(pd.Timestamp(date), 'D'):
+            raise KeyError(f"no surface for {date}")
+        column = self._tenor(tenor)
+        return pd.Series(self.moneyness_iv[row, column], index=self.moneyness_levels,
+                         name=str(self.expiries[row, column]))
+
+
+def surface_path(root, symbol):
+    """Directory of a symbol's saved surface inside a dataset root"""
+    return os.path.join(root, SURFACE_DIR, f'symbol={symbol}')
+
+
+def _greeks_partitions(root, symbol):
+    """
+    (partitions, files) of a symbol in the Greeks store, from its catalog.
+
+    `partitions` maps 'YYYY-MM' to the partition's key (its part files'
+    checksums) and DATE range; `files` holds each part file's path and DATE range.
+    """
+    catalog = PartitionCatalog(greeks_root(root))
+    catalog.refresh()
+    files = catalog.files(symbol)
+    catalog.close()
+    partitions = {}
+    for (year, month), part in files.groupby(['year', 'month']):
+        key = hashlib.sha256(json.dumps(sorted(zip(part['path'], part['checksum']))).encode()).hexdigest()[:16]
+        partitions[f'{int(year)}-{int(month):02d}'] = {'key': key, 'min_date': part['min_date'].min(),
+                                                       'max_date': part['max_date'].max()}
+    return partitions, files
+
+
+def _read_ranges(root, files, ranges):
+    """INPUT_COLUMNS of the Greeks part files whose DATE range overlaps any of `ranges`"""
+    paths = [os.path.join(greeks_root(root), path) for path, first, last in
+             zip(files['path'], files['min_date'], files['max_date'])
+             if first is not None and any(first <= high and last >= low for low, high in ranges)]
+    if not paths:
+        return pd.DataFrame(columns=INPUT_COLUMNS)
+    schema = pa.unify_schemas([pq.read_schema(path) for path in paths], promote_options='permissive')
+    return ds.dataset(paths, schema=schema, format='parquet').to_table(columns=INPUT_COLUMNS).to_pandas()
+
+
+def update_dataset_surface(root, symbol, history_dir=DEFAULT_HISTORY_DIR, config_file=DEFAULT_CONFIG_FILE):
+    """
+    Update and save one symbol's surface; returns (surface, recomputed dates).
+
+    The Greeks store is refreshed first. Only the DATE ranges of its
+    partitions that were added, changed or removed since the last save (by
+    their catalog checksums) are re-read, with the part files overlapping
+    them. The saved surface is rebuilt from scratch when the grids, tenors or
+    the Greeks model changed.
+    """
+    settings = analysis_settings('volatility', config_file)
+    directory = surface_path(root, symbol)
+    surface = None
+    known = {}
+    if os.path.exists(os.path.join(directory, 'meta.json')):
+        saved = VolSurface.load(directory, mmap=False)
+        if (saved.meta['version'] == SURFACE_VERSION and saved.meta.get('model') == MODEL_VERSION
+                and saved.meta['moneyness_levels'] == list(map(float, settings['moneyness_levels']))
+                and saved.meta['delta_levels'] == list(map(int, settings['delta_levels']))
+                and saved.meta['tenor_days'] == list(map(int, settings['tenor_days']))):
+            surface = saved
+            known = saved.meta.get('partitions', {})
+    if surface is None:
+        surface = VolSurface(settings['moneyness_levels'], settings['delta_levels'], settings['tenor_days'])
+
+    greeks_dataset(root, symbol, history_dir, config_file)
+    partitions, files = _greeks_partitions(root, symbol)
+    changed = [partition for partition in sorted(set(partitions) | set(known))
+               if partitions.get(partition, {}).get('key') != known.get(partition, {}).get('key')]
+    ranges = [(info['min_date'], info['max_date']) for partition in changed
+              for info in (known.get(partition), partitions.get(partition))
+              if info is not None and info['min_date'] is not None]
+    recomputed = np.empty(0, dtype='datetime64[D]')
+    if ranges:
+        recomputed = surface.update(_read_ranges(root, files, ranges), ranges)
+    if changed or not os.path.exists(directory):
+        surface.save(directory, {'model': MODEL_VERSION, 'partitions': partitions})
+    return surface, recomputed
+
+
+def build_surfaces(root, symbols=None, history_dir=DEFAULT_HISTORY_DIR, config_file=DEFAULT_CONFIG_FILE):
+    """Update the surface of every symbol (or the given ones) of a store; run after ingest"""
+    symbols = symbols or sorted({symbol for symbol, _, _ in list_partitions(root)})
+    return {symbol: update_dataset_surface(root, symbol, history_dir, config_file) for symbol in symbols}
+
+
+def load_dataset_surface(root, symbol, mmap=True):
+    return VolSurface.load(surface_path(root, symbol), mmap=mmap)
+
+
+def main():
+    """Update the surfaces of one or more stores and print the latest ATM term structure and skew"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('roots', nargs='+', help="dataset directories (symbol=/year=/month= stores)")
+    parser.add_argument('--symbol', action='append', help="only these symbols")
+    parser.add_argument('--history-dir', default=DEFAULT_HISTORY_DIR)
+    args = parser.parse_args()
+
+    for root in args.roots:
+        for symbol, (surface, changed) in build_surfaces(root, args.symbol, args.history_dir).items():
+            print(f"🌋 {root} {symbol}: {len(surface)} dates x {surface.tenors} tenors "
+                  f"({len(changed)} dates recomputed)")
+            if len(surface):
+                print("   ATM IV by tenor bucket (last day), last dates:")
+                print(surface.atm_term_structure().dropna(how='all').tail(3).to_string())
+                print("   25-delta skew (shortest bucket), last dates:")
+                print(surface.skew(25).dropna().tail(3).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Partition Catalog Tests
+Per-file statistics, which part files a query can skip, and DataStore queries pruned by them
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import data_store  # noqa: E402
+from catalog import PartitionCatalog  # noqa: E402
+from data_store import DataStore  # noqa: E402
+from stream_writer import PartitionWriter  # noqa: E402
+
+
+def contracts(dates, expiry, strike, close=100.0):
+    """NIFTY call rows of one contract on the given dates"""
+    return pd.DataFrame({
+        'DATE': pd.to_datetime(dates),
+        'EXPIRY': pd.Timestamp(expiry),
+        'SYMBOL': 'NIFTY',
+        'INSTRUMENT_TYPE': 'OPTIDX',
+        'OPTION TYPE': 'CE',
+        'STRIKE PRICE': strike,
+        'CLOSE': close,
+    })
+
+
+def write_store(root):
+    """Three part files: two in the January expiry partition, one in February"""
+    writer = PartitionWriter(str(root))
+    writer.write(contracts(['2024-01-02', '2024-01-03'], '2024-01-25', 21000.0), 'NIFTY', 'early')
+    writer.write(contracts(['2024-01-22', '2024-01-23'], '2024-01-25', 21500.0), 'NIFTY', 'late')
+    writer.write(contracts(['2024-01-23', '2024-02-01'], '2024-02-29', 21500.0), 'NIFTY', 'next')
+    return writer
+
+
+def names(paths):
+    return sorted(os.path.basename(path) for path in paths)
+
+
+def test_files_and_partitions_are_cataloged_as_written(tmp_path):
+    write_store(tmp_path)
+    catalog = PartitionCatalog(str(tmp_path))
+    partitions = catalog.partitions('NIFTY')
+    assert partitions[['month', 'files', 'rows']].values.tolist() == [[1, 2, 4], [2, 1, 2]]
+    assert partitions['min_date'].tolist() == ['2024-01-02', '2024-01-23']
+    assert catalog.gaps('NIFTY', '2023-12', '2024-03') == ['2023-12', '2024-03']
+    assert catalog.refresh() == 0
+
+    before = catalog.fingerprint('NIFTY')
+    os.remove(os.path.join(tmp_path, catalog.files('NIFTY')['path'].iloc[0]))
+    assert catalog.refresh() == 1
+    assert catalog.fingerprint('NIFTY') != before and len(catalog.files('NIFTY')) == 2
+
+
+def test_skippable_files_miss_the_dates_or_strikes(tmp_path):
+    write_store(tmp_path)
+    catalog = PartitionCatalog(str(tmp_path))
+    assert names(catalog.skippable('NIFTY', '2024-01-20', '2024-01-31')) == ['part-early.parquet']
+    assert names(catalog.skippable('NIFTY', '2024-01-01', '2024-01-31', strikes=[21000])) == [
+        'part-late.parquet', 'part-next.parquet']
+
+    # A file rewritten behind the catalog's back is read whatever its old statistics say
+    path = sorted(catalog.skippable('NIFTY', '2024-01-20', '2024-01-31'))[0]
+    contracts(['2024-01-24'], '2024-01-25', 21000.0).to_parquet(path, index=False)
+    assert not catalog.skippable('NIFTY', '2024-01-20', '2024-01-31')
+
+
+def test_queries_read_only_files_that_can_match(tmp_path, monkeypatch):
+    write_store(tmp_path / 'maximized_working_symbols')
+    # A lower-priority dataset holding one of the same contract-days at another price
+    PartitionWriter(str(tmp_path / 'full_5year_derivatives')).write(
+        contracts(['2024-01-23', '2024-01-24'], '2024-01-25', 21500.0, close=99.0), 'NIFTY', 'other')
+    store = DataStore(str(tmp_path))
+    assert store.datasets == ['maximized_working_symbols', 'full_5year_derivatives']
+
+    read = []
+    read_schema = data_store.pq.read_schema
+    monkeypatch.setattr(data_store.pq, 'read_schema',
+                        lambda path, **kwargs: read.append(os.path.basename(path)) or read_schema(path, **kwargs))
+    rows = store.query('NIFTY', '2024-01-20', '2024-01-31', strikes=[21500])
+    assert sorted(read) == ['part-late.parquet', 'part-next.parquet', 'part-other.parquet']
+    assert rows[['DATE', 'EXPIRY', 'CLOSE']].astype(str).values.tolist() == [
+        ['2024-01-22', '2024-01-25', '100.0'], ['2024-01-23', '2024-01-25', '100.0'],
+        ['2024-01-23', '2024-02-29', '100.0'], ['2024-01-24', '2024-01-25', '99.0']]
+
+    # Partitions expiring before the window start are not listed at all
+    read.clear()
+    store.query('NIFTY', '2024-02-01', '2024-02-29', columns=['DATE', 'CLOSE'])
+    assert read == ['part-next.parquet']
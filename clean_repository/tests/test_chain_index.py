@@ -0,0 +1,91 @@
+"""
+Chain Index Tests
+Every lookup checked against plain pandas filters, before and after a memory-mapped save/load round trip
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from chain_index import ChainIndex, build_dataset_index, load_dataset_index  # noqa: E402
+from stream_writer import PartitionWriter  # noqa: E402
+
+DATES = pd.bdate_range('2024-01-15', '2024-01-25')
+EXPIRIES = pd.to_datetime(['2024-01-25', '2024-02-29'])
+STRIKES = [21000.0, 21050.0, 21100.05, 21500.0]
+
+
+def chain():
+    """Every date x expiry x strike x CE/PE, plus a futures row per date, shuffled"""
+    index = pd.MultiIndex.from_product([DATES, EXPIRIES, STRIKES, ['CE', 'PE']],
+                                       names=['DATE', 'EXPIRY', 'STRIKE PRICE', 'OPTION TYPE'])
+    options = index.to_frame(index=False)
+    futures = pd.DataFrame({'DATE': DATES, 'EXPIRY': EXPIRIES[0], 'STRIKE PRICE': np.nan, 'OPTION TYPE': None})
+    frame = pd.concat([options, futures], ignore_index=True)
+    frame['SYMBOL'] = 'NIFTY'
+    frame['INSTRUMENT_TYPE'] = np.where(frame['OPTION TYPE'].isna(), 'FUTIDX', 'OPTIDX')
+    frame['CLOSE'] = np.arange(len(frame), dtype=np.float64)
+    return frame.sample(frac=1.0, random_state=7).reset_index(drop=True)
+
+
+def matching(frame, **conditions):
+    mask = np.ones(len(frame), dtype=bool)
+    for column, value in conditions.items():
+        mask &= (frame[column] == value).to_numpy()
+    return frame[mask]
+
+
+def check_lookups(index):
+    rows = index.frame()
+    date, expiry = DATES[3], EXPIRIES[1]
+
+    day = rows.iloc[index.day_chain(date)]
+    assert len(day) == len(matching(rows, DATE=date)) == len(EXPIRIES) * len(STRIKES) * 2 + 1
+    assert set(rows.iloc[index.day_chain(date, expiry)]['EXPIRY']) == {expiry}
+    puts = rows.iloc[index.day_chain(date, expiry, 'PE')]
+    assert np.allclose(puts['STRIKE PRICE'], STRIKES)
+    assert set(puts['OPTION TYPE']) == {'PE'}
+
+    series = rows.iloc[index.series(expiry, 21100.05, 'CE')]
+    expected = matching(rows, EXPIRY=expiry, **{'OPTION TYPE': 'CE'})
+    expected = expected[np.isclose(expected['STRIKE PRICE'], 21100.05)]
+    assert series['DATE'].tolist() == list(DATES) and series['CLOSE'].tolist() == expected['CLOSE'].tolist()
+
+    assert len(index.expiry_rows(expiry)) == len(DATES) * len(STRIKES) * 2
+    assert len(index.expiry_rows(EXPIRIES[0], 'CE')) == len(DATES) * len(STRIKES)
+
+    position = index.locate(date, expiry, 21500.0, 'CE')
+    assert rows.iloc[position][['DATE', 'EXPIRY', 'STRIKE PRICE', 'OPTION TYPE']].tolist() == [
+        date, expiry, 21500.0, 'CE']
+    assert index.locate(date, expiry, 21550.0, 'CE') == -1
+    assert index.locate(pd.Timestamp('2024-01-13'), expiry, 21500.0, 'CE') == -1
+
+
+def test_lookups_match_pandas_filters():
+    frame = chain()
+    index = ChainIndex.build(frame)
+    assert len(index) == len(frame)
+    check_lookups(index)
+
+
+def test_saved_index_loads_memory_mapped(tmp_path):
+    PartitionWriter(str(tmp_path)).write(chain(), 'NIFTY', 'chain')
+    build_dataset_index(str(tmp_path), 'NIFTY')
+    index = load_dataset_index(str(tmp_path), 'NIFTY')
+    assert isinstance(index.chain, np.memmap) and isinstance(index.contracts, np.memmap)
+    check_lookups(index)
+
+    in_memory = load_dataset_index(str(tmp_path), 'NIFTY', mmap=False)
+    np.testing.assert_array_equal(in_memory.chain, index.chain)
+    np.testing.assert_array_equal(in_memory.contracts, index.contracts)
+
+
+def test_dates_outside_the_key_range_raise():
+    frame = chain().head(1).assign(DATE=pd.Timestamp('1989-12-31'))
+    with pytest.raises(ValueError):
+        ChainIndex.build(frame)
@@ -0,0 +1,83 @@
+"""
+Collection Plan Tests
+Plan loading, window coalescing per contract, and routing merged responses back to every collection
+"""
+
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+import pytest
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from collection_plan import RequestPlan, _window, coalesce, load_plan  # noqa: E402
+from expiry_calendar import ExpiryCalendar  # noqa: E402
+from fetch_engine import FetchJob  # noqa: E402
+
+EXPIRY = date(2024, 1, 25)
+
+
+def job(from_day, to_day, strike=21000.0, expiry=EXPIRY):
+    return FetchJob('NIFTY', expiry, strike_price=strike, option_type='CE',
+                    from_date=date(2024, 1, from_day), to_date=date(2024, 1, to_day))
+
+
+def write_plan(path, collections, defaults=None):
+    with open(path, 'w') as f:
+        yaml.safe_dump({'defaults': defaults or {'window_days': 30, 'strikes': {'policy': 'fixed'}},
+                        'collections': collections}, f)
+    return str(path)
+
+
+def test_overlapping_and_touching_windows_merge_per_contract():
+    jobs = [job(1, 10), job(11, 20), job(5, 12), job(23, 25), job(1, 10, strike=21500.0)]
+    requests, consumers = coalesce(jobs)
+    assert sorted((request.strike_price, request.from_date.day, request.to_date.day) for request in requests) == [
+        (21000.0, 1, 20), (21000.0, 23, 25), (21500.0, 1, 10)]
+    merged = next(request for request in requests if request.to_date.day == 20)
+    assert sorted(consumers[merged], key=lambda consumer: consumer.from_date) == [job(1, 10), job(5, 12), job(11, 20)]
+
+
+def test_merged_responses_are_sliced_back_to_each_window():
+    data = pd.DataFrame({'DATE': pd.date_range('2024-01-01', '2024-01-20').strftime('%d-%b-%Y'), 'CLOSE': 1.0})
+    assert len(_window(data, job(5, 12))) == 8
+
+
+def test_plan_defaults_apply_and_unknown_policies_raise(tmp_path):
+    path = write_plan(tmp_path / 'plan.yaml', {
+        'fixed': {'output_dir': 'out', 'symbols': ['NIFTY'], 'strikes': {'values': [21000]},
+                  'periods': [{'start': '2024-01', 'end': '2024-02'}, {'start': '2024-02', 'end': '2024-03'}]},
+    })
+    collection = load_plan(path)['fixed']
+    assert collection.months == ((2024, 1), (2024, 2), (2024, 3))
+    assert collection.strike_policy == 'fixed' and collection.strikes == (21000.0,)
+    assert collection.window_days == 30 and collection.option_types == ('CE', 'PE')
+
+    bad = write_plan(tmp_path / 'bad.yaml', {'bad': {'output_dir': 'out', 'symbols': ['NIFTY'],
+                                                     'strikes': {'policy': 'nearest'},
+                                                     'periods': [{'start': '2024-01', 'end': '2024-01'}]}})
+    with pytest.raises(ValueError):
+        load_plan(bad)
+
+
+def test_collections_sharing_contracts_fetch_them_once(tmp_path):
+    period = [{'start': '2024-01', 'end': '2024-02'}]
+    path = write_plan(tmp_path / 'plan.yaml', {
+        'wide': {'output_dir': 'a', 'symbols': ['NIFTY'], 'periods': period, 'strikes': {'values': [21000]}},
+        'narrow': {'output_dir': 'b', 'symbols': ['NIFTY'], 'periods': period, 'window_days': 10,
+                   'option_types': ['CE'], 'strikes': {'values': [21000]}},
+    })
+    plan = RequestPlan(list(load_plan(path).values()), calendar=ExpiryCalendar(cache_dir=str(tmp_path / 'calendar')))
+
+    # Two monthly expiries: wide wants CE and PE, narrow a CE window inside wide's
+    assert plan.request_counts() == {'wide': 4, 'narrow': 2}
+    assert len(plan.requests) == 4
+    for request in plan.requests:
+        assert (request.to_date - request.from_date).days == 30
+        served = plan.consumers[request]
+        assert len(served) == (2 if request.option_type == 'CE' else 1)
+        assert sorted(name for consumer in served for name in plan.destinations[consumer]) == (
+            ['narrow', 'wide'] if request.option_type == 'CE' else ['wide'])
@@ -0,0 +1,87 @@
+"""
+Compaction Tests
+Priority and provenance of deduplicated contract-days, and reruns that change nothing unless a source did
+"""
+
+import os
+import shutil
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from compaction import Compactor  # noqa: E402
+from data_store import CANONICAL_DATASET, DataStore  # noqa: E402
+from parquet_store import list_partitions, partition_path, read_dataset  # noqa: E402
+from stream_writer import PartitionWriter  # noqa: E402
+
+HIGH = 'maximized_working_symbols'
+LOW = 'full_5year_derivatives'
+
+
+def contracts(dates, expiry, close):
+    return pd.DataFrame({
+        'DATE': pd.to_datetime(dates),
+        'EXPIRY': pd.Timestamp(expiry),
+        'SYMBOL': 'NIFTY',
+        'INSTRUMENT_TYPE': 'OPTIDX',
+        'OPTION TYPE': 'CE',
+        'STRIKE PRICE': 21500.0,
+        'CLOSE': close,
+    })
+
+
+def write_sources(root):
+    PartitionWriter(str(root / HIGH)).write(
+        contracts(['2024-01-22', '2024-01-23'], '2024-01-25', [100.0, 110.0]), 'NIFTY', 'a')
+    PartitionWriter(str(root / LOW)).write(pd.concat([
+        contracts(['2024-01-23', '2024-01-24'], '2024-01-25', [111.0, 120.0]),
+        contracts(['2024-02-01'], '2024-02-29', [90.0]),
+    ]), 'NIFTY', 'b')
+
+
+def canonical(root):
+    return read_dataset(str(root / CANONICAL_DATASET), 'NIFTY').sort_values(['EXPIRY', 'DATE']).reset_index(drop=True)
+
+
+def test_priority_and_provenance(tmp_path):
+    write_sources(tmp_path)
+    compactor = Compactor(str(tmp_path))
+    rebuilt = compactor.run()
+    assert rebuilt[('NIFTY', 2024, 1)] == {'rows_in': 4, 'rows_out': 3, 'conflicts': 1}
+
+    rows = canonical(tmp_path)
+    assert rows['CLOSE'].tolist() == [100.0, 110.0, 120.0, 90.0]
+    assert [compactor.dataset_names(sources) for sources in rows['SOURCES']] == [[HIGH], [HIGH, LOW], [LOW], [LOW]]
+    assert rows['CONFLICT'].tolist() == [False, True, False, False]
+
+
+def test_rerunning_changes_nothing(tmp_path):
+    write_sources(tmp_path)
+    Compactor(str(tmp_path)).run()
+    first = canonical(tmp_path)
+    files = sorted((os.path.join(dirpath, name), os.stat(os.path.join(dirpath, name)).st_mtime_ns)
+                   for dirpath, _, names in os.walk(tmp_path / CANONICAL_DATASET / 'symbol=NIFTY') for name in names)
+
+    assert Compactor(str(tmp_path)).run() == {}
+    assert sorted((path, os.stat(path).st_mtime_ns) for path, _ in files) == files
+
+    # A forced rebuild, and the canonical store itself being queried, give the same rows
+    assert len(Compactor(str(tmp_path)).run(force=True)) == 2
+    pd.testing.assert_frame_equal(canonical(tmp_path), first)
+    queried = DataStore(str(tmp_path)).query('NIFTY', '2024-01-01', '2024-02-29')
+    assert queried['CLOSE'].tolist() == [100.0, 110.0, 120.0, 90.0]
+
+
+def test_only_changed_partitions_are_rebuilt(tmp_path):
+    write_sources(tmp_path)
+    Compactor(str(tmp_path)).run()
+    PartitionWriter(str(tmp_path / LOW)).write(contracts(['2024-02-02'], '2024-02-29', [95.0]), 'NIFTY', 'c')
+    assert list(Compactor(str(tmp_path)).run()) == [('NIFTY', 2024, 2)]
+    assert canonical(tmp_path)['CLOSE'].tolist()[-2:] == [90.0, 95.0]
+
+    # Partitions no source holds any more are dropped
+    shutil.rmtree(partition_path(str(tmp_path / LOW), 'NIFTY', 2024, 2))
+    Compactor(str(tmp_path)).run()
+    assert list_partitions(str(tmp_path / CANONICAL_DATASET)) == [('NIFTY', 2024, 1)]
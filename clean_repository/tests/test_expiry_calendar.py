@@ -0,0 +1,63 @@
+"""
+Expiry Calendar Tests
+Monthly expiries against the EXPIRY values stored in the bundled datasets, holiday shifts and regime switches
+"""
+
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from csv_loader import load_history  # noqa: E402
+from expiry_calendar import MONTHLY, WEEKLY, ExpiryCalendar  # noqa: E402
+
+DATA_ROOT = os.path.join(os.path.dirname(__file__), '..', 'data')
+DATASETS = ['full_5year_derivatives', 'full_5year_monthly_derivatives', 'maximized_working_symbols',
+            'working_banknifty_data', 'historical_derivatives']
+
+
+@pytest.fixture(scope='module')
+def calendar(tmp_path_factory):
+    return ExpiryCalendar(cache_dir=str(tmp_path_factory.mktemp('expiry_calendar')))
+
+
+@pytest.mark.parametrize('dataset', DATASETS)
+def test_stored_expiries_are_calendar_expiries(calendar, dataset):
+    directory = os.path.join(DATA_ROOT, dataset)
+    if not os.path.isdir(directory):
+        pytest.skip(f"{dataset} not present")
+    frame = load_history(directory)
+    mismatches = calendar.mismatches(frame)
+    assert mismatches.empty, mismatches.to_string()
+
+    months = frame[['SYMBOL', 'EXPIRY']].dropna().astype({'SYMBOL': str}).drop_duplicates()
+    for symbol, expiry in zip(months['SYMBOL'], months['EXPIRY']):
+        assert calendar.monthly(symbol, expiry.year, expiry.month) == expiry.date()
+
+
+def test_holiday_shifts_and_regime_switches(calendar):
+    # Bakri Id 2023 moved to Wednesday 28 June, leaving the Thursday expiry in place
+    assert calendar.monthly('NIFTY', 2023, 6) == date(2023, 6, 29)
+    # Holi (Thursday 29 March 2023) pulls the expiry back a day
+    assert calendar.monthly('NIFTY', 2023, 3) == date(2023, 3, 29)
+    # Bank Nifty monthlies moved to Wednesday from the April 2024 contract
+    assert calendar.monthly('BANKNIFTY', 2024, 3) == date(2024, 3, 28)
+    assert calendar.monthly('BANKNIFTY', 2024, 4) == date(2024, 4, 24)
+    assert calendar.monthly('NIFTY', 2025, 9) == date(2025, 9, 30)
+
+
+def test_weekly_expiries_skip_the_monthly_week(calendar):
+    january = calendar.expiries('NIFTY', date(2024, 1, 1), date(2024, 1, 31))
+    assert january == [date(2024, 1, 4), date(2024, 1, 11), date(2024, 1, 18), date(2024, 1, 25)]
+    assert calendar.expiries('NIFTY', date(2024, 1, 1), date(2024, 1, 31), kind=MONTHLY) == [date(2024, 1, 25)]
+    assert len(calendar.expiries('NIFTY', date(2024, 1, 1), date(2024, 1, 31), kind=WEEKLY)) == 3
+
+
+def test_years_outside_the_holiday_list_raise(calendar, tmp_path):
+    with pytest.raises(ValueError):
+        ExpiryCalendar(cache_dir=str(tmp_path), years=(2019, 2024))
+    with pytest.raises(ValueError):
+        calendar.trading_days(date(2025, 12, 29), date(2026, 1, 2))
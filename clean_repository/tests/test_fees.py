@@ -0,0 +1,62 @@
+"""
+Fee Engine Tests
+Per-trade costs under the rates in force on each trade's date, and schedules taken from the given config
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import fees  # noqa: E402
+
+FEES = {
+    'exchange': 0.05, 'clearing': 0.02, 'stamp_duty': 0.0001, 'brokerage': 0.0005,
+    'stt_options': 0.0005, 'stt_futures': 0.0001, 'data_cost_per_msg': 0.001, 'infra_cost_per_msg': 0.0005,
+    'changes': [{'from': '2023-04-01', 'stt_options': 0.000625}, {'from': '2024-10-01', 'stt_options': 0.001}],
+}
+
+
+def test_costs_use_the_rates_in_force_on_each_date():
+    schedule = fees.FeeSchedule.from_config(FEES)
+    dates = pd.to_datetime(['2023-03-31', '2023-04-01', '2024-10-01', '2024-10-01'])
+    # 2 lots of 50 at 100: traded value 10,000 INR
+    costs = fees.trade_costs(dates, ['OPTIDX', 'OPTIDX', 'OPTIDX', 'OPTIDX'], ['SELL', 'SELL', 'SELL', 'BUY'],
+                             2, 100.0, messages=4, lot=50, schedule=schedule)
+    np.testing.assert_allclose(costs['STT'], [5.0, 6.25, 10.0, 0.0])
+    np.testing.assert_allclose(costs['STAMP_DUTY'], [0.0, 0.0, 0.0, 1.0])
+    fixed = 2 * 0.05 + 2 * 0.02 + 10_000 * 0.0005 + 4 * 0.0015
+    np.testing.assert_allclose(costs['TOTAL'], [fixed + 5.0, fixed + 6.25, fixed + 10.0, fixed + 1.0])
+
+
+def test_futures_stt_and_frame_costs():
+    trades = pd.DataFrame({
+        'DATE': pd.to_datetime(['2024-01-02', '2024-01-02']),
+        'INSTRUMENT_TYPE': ['FUTIDX', 'OPTIDX'],
+        'SIDE': [-1, -1],
+        'QUANTITY': [1, 1],
+        'PRICE': [20000.0, 100.0],
+        'MARKET LOT': [50, 50],
+    }, index=[10, 11])
+    costs = fees.frame_costs(trades, fees.FeeSchedule.from_config(FEES))
+    assert list(costs.index) == [10, 11]
+    np.testing.assert_allclose(costs['STT'], [1_000_000 * 0.0001, 5000 * 0.000625])
+
+
+def test_schedule_comes_from_the_given_config(tmp_path):
+    config = tmp_path / 'config.yaml'
+    config.write_text(yaml.safe_dump({'fees': dict(FEES, exchange=1.0, changes=[])}))
+    costs = fees.trade_costs(['2024-01-02'], 'OPTIDX', 'BUY', 3, 10.0, config_file=str(config))
+    assert costs['EXCHANGE'].iloc[0] == 3.0
+
+
+def test_unknown_rates_and_early_trades_raise():
+    with pytest.raises(ValueError):
+        fees.FeeSchedule.from_config(dict(FEES, changes=[{'from': '2024-01-01', 'stt': 0.1}]))
+    with pytest.raises(ValueError):
+        fees.FeeSchedule.from_config(FEES).rates_at(['1980-01-01'])
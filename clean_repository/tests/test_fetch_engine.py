@@ -0,0 +1,147 @@
+"""
+Fetch Engine Tests
+Token-bucket pacing on a fake clock, bounded concurrency, error propagation and resuming from a manifest
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from fetch_engine import FetchJob, TokenBucket, option_jobs, run_jobs  # noqa: E402
+from job_manifest import DONE, FAILED, JobManifest  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+EXPIRED = date(2024, 1, 25)
+
+
+class FakeClock:
+    """monotonic/sleep pair where sleeping only advances the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class CountingBucket(TokenBucket):
+    def __init__(self):
+        super().__init__(rate=1e6, burst=1000)
+        self.acquired = 0
+        self._count_lock = threading.Lock()
+
+    def acquire(self):
+        with self._count_lock:
+            self.acquired += 1
+        super().acquire()
+
+
+def frame_for(strike_price=None, **params):
+    return pd.DataFrame({'DATE': [params['to_date']], 'CLOSE': [strike_price]})
+
+
+def test_token_bucket_paces_requests_after_the_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=3, clock=clock, sleep=clock.sleep)
+    for _ in range(10):
+        bucket.acquire()
+    # Three back to back, then one every half second
+    assert clock.now == pytest.approx((10 - 3) / 2.0)
+    assert clock.sleeps == pytest.approx([0.5] * 7)
+
+    # Idle time refills the bucket up to the burst only
+    clock.now += 60
+    for _ in range(3):
+        bucket.acquire()
+    assert len(clock.sleeps) == 7
+
+
+def test_token_bucket_rejects_non_positive_rates():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_request_window_defaults_to_thirty_days_before_expiry():
+    job = option_jobs('NIFTY', EXPIRED, [21000.0], year=2024, month=1)[1]
+    assert job == FetchJob('NIFTY', EXPIRED, 'OPTIDX', 21000.0, 'PE', year=2024, month=1)
+    assert job.request_kwargs()['from_date'] == EXPIRED - timedelta(days=30)
+    assert job.key == FetchJob('NIFTY', EXPIRED, strike_price=21000, option_type='PE').key
+
+
+def test_concurrency_is_bounded_by_the_worker_count():
+    lock = threading.Lock()
+    in_flight = [0]
+    peak = [0]
+
+    def fetch(**params):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+        return frame_for(**params)
+
+    jobs = option_jobs('NIFTY', EXPIRED, [float(strike) for strike in range(21000, 22000, 100)])
+    results = list(run_jobs(jobs, fetch, max_workers=3, limiter=TokenBucket(rate=1e6, burst=1000)))
+    assert sorted(job.key for job, _, _ in results) == sorted(job.key for job in jobs)
+    assert 1 < peak[0] <= 3
+
+
+def test_errors_are_yielded_without_stopping_other_jobs():
+    def fetch(**params):
+        if params['strike_price'] == 21500.0:
+            raise ConnectionError("reset by peer")
+        if params['strike_price'] == 22000.0:
+            return pd.DataFrame()
+        return frame_for(**params)
+
+    jobs = option_jobs('NIFTY', EXPIRED, [21000.0, 21500.0, 22000.0], option_types=('CE',))
+    results = {job.strike_price: (frame, error) for job, frame, error in
+               run_jobs(jobs, fetch, limiter=TokenBucket(rate=1e6, burst=1000))}
+    assert results[21000.0][0]['CLOSE'].tolist() == [21000.0] and results[21000.0][1] is None
+    assert results[21500.0][0] is None and isinstance(results[21500.0][1], ConnectionError)
+    assert results[22000.0] == (None, None)
+
+
+def test_cache_hits_take_no_tokens(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    jobs = option_jobs('NIFTY', EXPIRED, [21000.0, 21500.0])
+    limiter = CountingBucket()
+    list(run_jobs(jobs, frame_for, limiter=limiter, cache=cache))
+    list(run_jobs(jobs, frame_for, limiter=limiter, cache=cache))
+    assert limiter.acquired == len(jobs)
+
+
+def test_restart_reruns_only_failed_jobs(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache'))
+    jobs = option_jobs('NIFTY', EXPIRED, [21000.0, 21500.0], option_types=('CE',))
+    calls = []
+
+    def flaky(**params):
+        calls.append(params['strike_price'])
+        if params['strike_price'] == 21500.0 and calls.count(21500.0) == 1:
+            raise TimeoutError("read timed out")
+        return frame_for(**params)
+
+    first = JobManifest('run', root=str(tmp_path))
+    list(run_jobs(jobs, flaky, limiter=CountingBucket(), cache=cache, manifest=first))
+    assert first.states() == {jobs[0].key: DONE, jobs[1].key: FAILED}
+
+    resumed = JobManifest('run', root=str(tmp_path))
+    results = list(run_jobs(jobs, flaky, limiter=CountingBucket(), cache=cache, manifest=resumed))
+    assert sorted(calls) == [21000.0, 21500.0, 21500.0]
+    assert all(error is None and frame is not None for _, frame, error in results)
+    assert resumed.states() == {jobs[0].key: DONE, jobs[1].key: DONE}
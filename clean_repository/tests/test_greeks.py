@@ -0,0 +1,63 @@
+"""
+Greeks Tests
+Analytic Black-76 Greeks against central finite differences of the pricer, with and without discounting
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import greeks  # noqa: E402
+from implied_vol import black_price  # noqa: E402
+
+# Calls and puts in, at and out of the money, short and long dated
+FORWARD = np.array([22000.0, 22000.0, 22000.0, 22000.0, 48000.0, 48000.0])
+STRIKE = np.array([20000.0, 22000.0, 24000.0, 21000.0, 48000.0, 52000.0])
+TTE = np.array([0.05, 0.1, 0.25, 0.02, 0.5, 1.0])
+SIGMA = np.array([0.15, 0.12, 0.2, 0.3, 0.18, 0.25])
+IS_CALL = np.array([True, True, False, False, True, False])
+
+
+def value(forward=FORWARD, tte=TTE, sigma=SIGMA, rate=0.0):
+    return black_price(forward, STRIKE, tte, sigma, IS_CALL, np.exp(-rate * tte))
+
+
+@pytest.mark.parametrize('rate', [0.0, 0.07])
+def test_greeks_match_finite_differences(rate):
+    analytic = greeks.greeks(FORWARD, STRIKE, TTE, SIGMA, IS_CALL, rate)
+    df = FORWARD * 1e-3
+    dv = 1e-3
+    dt = 1e-4
+
+    up, down = value(FORWARD + df, rate=rate), value(FORWARD - df, rate=rate)
+    delta = (up - down) / (2 * df)
+    gamma = (up - 2 * value(rate=rate) + down) / df ** 2
+    vega = (value(sigma=SIGMA + dv, rate=rate) - value(sigma=SIGMA - dv, rate=rate)) / (2 * dv)
+    # Theta is the change per calendar day as time passes, i.e. -dV/dT / 365
+    theta = -(value(tte=TTE + dt, rate=rate) - value(tte=TTE - dt, rate=rate)) / (2 * dt) / greeks.DAYS_PER_YEAR
+    vanna = (value(FORWARD + df, sigma=SIGMA + dv, rate=rate) - value(FORWARD + df, sigma=SIGMA - dv, rate=rate)
+             - value(FORWARD - df, sigma=SIGMA + dv, rate=rate) + value(FORWARD - df, sigma=SIGMA - dv, rate=rate)
+             ) / (4 * df * dv)
+    volga = (value(sigma=SIGMA + dv, rate=rate) - 2 * value(rate=rate) + value(sigma=SIGMA - dv, rate=rate)) / dv ** 2
+
+    numeric = np.column_stack([delta, gamma, vega, theta, vanna, volga])
+    for j, column in enumerate(greeks.GREEK_COLUMNS):
+        np.testing.assert_allclose(analytic[:, j], numeric[:, j], rtol=1e-3, atol=1e-6, err_msg=column)
+
+
+def test_put_call_parity_of_delta_and_shared_greeks():
+    calls = greeks.greeks(FORWARD, STRIKE, TTE, SIGMA, True, rate=0.07)
+    puts = greeks.greeks(FORWARD, STRIKE, TTE, SIGMA, False, rate=0.07)
+    np.testing.assert_allclose(calls[:, 0] - puts[:, 0], np.exp(-0.07 * TTE))
+    np.testing.assert_allclose(calls[:, [1, 2, 4, 5]], puts[:, [1, 2, 4, 5]])
+
+
+def test_unusable_inputs_give_nan_and_buckets_use_the_nearest_level():
+    out = greeks.greeks(np.array([22000.0, 22000.0]), 22000.0, np.array([0.1, 0.0]), np.array([np.nan, 0.2]), True)
+    assert np.isnan(out).all()
+    buckets = greeks.delta_buckets(np.array([0.52, -0.24, 0.08, 0.95, np.nan]), [10, 25, 50, 75, 90])
+    assert buckets.tolist() == [50, 25, 10, 90, 0]
@@ -0,0 +1,54 @@
+"""
+Implied Volatility Tests
+Price -> IV -> price round trips and the status codes of rows the solver cannot settle
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import implied_vol  # noqa: E402
+
+
+def test_round_trip_recovers_volatility_and_price():
+    rng = np.random.default_rng(7)
+    n = 20_000
+    forward = np.full(n, 22000.0)
+    strike = forward * rng.uniform(0.85, 1.15, n)
+    tte = rng.uniform(7 / 365, 0.5, n)
+    sigma = rng.uniform(0.08, 0.8, n)
+    is_call = rng.random(n) < 0.5
+    discount = np.exp(-0.07 * tte)
+    price = implied_vol.black_price(forward, strike, tte, sigma, is_call, discount)
+
+    iv, status = implied_vol.implied_vol(price, forward, strike, tte, is_call, discount, min_iv=0.01, max_iv=5.0)
+    # Far from the money the out-of-the-money side is worth almost nothing; only compare where it is material
+    otm = np.minimum(price, implied_vol.black_price(forward, strike, tte, sigma, ~is_call, discount))
+    material = otm > 1.0
+    assert np.all(status[material] == implied_vol.CONVERGED)
+    np.testing.assert_allclose(iv[material], sigma[material], rtol=1e-6)
+    np.testing.assert_allclose(implied_vol.black_price(forward, strike, tte, iv, is_call, discount)[material],
+                               price[material], rtol=1e-9, atol=1e-6)
+
+
+def test_status_codes():
+    forward, strike, tte = 22000.0, 22000.0, 30 / 365
+    price = implied_vol.black_price(np.array([forward] * 3), strike, tte, np.array([0.03, 0.2, 3.0]), True)
+    price = np.append(price, [-1.0, 22500.0])
+    iv, status = implied_vol.implied_vol(price, forward, strike, tte, True, min_iv=0.05, max_iv=2.0)
+    assert status.tolist() == [implied_vol.CLIPPED, implied_vol.CONVERGED, implied_vol.CLIPPED,
+                               implied_vol.INVALID, implied_vol.ARBITRAGE]
+    assert iv[0] == 0.05 and iv[2] == 2.0
+    assert np.isnan(iv[3:]).all()
+
+
+def test_unconverged_rows_are_not_reported_as_clipped():
+    # One Halley step from the rational guess cannot reach a 300% volatility
+    price = implied_vol.black_price(np.array([22000.0]), 22000.0, 30 / 365, 3.0, True)
+    iv, status = implied_vol.implied_vol(price, 22000.0, 22000.0, 30 / 365, True, min_iv=0.05, max_iv=2.0,
+                                         max_iter=1)
+    assert status.tolist() == [implied_vol.NOT_CONVERGED]
+    assert 0.05 <= iv[0] <= 2.0
@@ -0,0 +1,86 @@
+"""
+Job Manifest Tests
+State bookkeeping, and which recorded jobs a restarted run skips, replays or requests again
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from fetch_engine import FetchJob, TokenBucket, run_jobs  # noqa: E402
+from job_manifest import DONE, EMPTY, FAILED, PENDING, JobManifest  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+TODAY = date(2024, 6, 1)
+EXPIRED = date(2024, 1, 25)
+LIVE = date(2024, 6, 27)
+
+
+class FakeFetch:
+    """derivatives_df stand-in: empty for `empty` strikes, raises for `failing` ones, and counts calls"""
+
+    def __init__(self, empty=(), failing=()):
+        self.empty = set(empty)
+        self.failing = set(failing)
+        self.calls = []
+
+    def __call__(self, **params):
+        self.calls.append((params['expiry_date'], params.get('strike_price')))
+        if params.get('strike_price') in self.failing:
+            raise ConnectionError("reset by peer")
+        if params.get('strike_price') in self.empty:
+            return pd.DataFrame()
+        return pd.DataFrame({'DATE': [params['to_date']], 'CLOSE': [params.get('strike_price', 0.0)]})
+
+
+def run(jobs, fetch, cache, manifest):
+    limiter = TokenBucket(rate=1e6, burst=1000)
+    return {job: (frame, error) for job, frame, error in
+            run_jobs(jobs, fetch, limiter=limiter, cache=cache, manifest=manifest)}
+
+
+def test_states_are_recorded_and_kept_on_register(tmp_path):
+    manifest = JobManifest('run', root=str(tmp_path))
+    jobs = [FetchJob('NIFTY', EXPIRED, strike_price=strike, option_type='CE') for strike in (21000, 21500, 22000)]
+    manifest.register(jobs)
+    manifest.mark(jobs[0], DONE, 10)
+    manifest.mark(jobs[1], FAILED, error=ConnectionError("timeout"))
+    manifest.register(jobs)
+    assert manifest.states() == {jobs[0].key: DONE, jobs[1].key: FAILED, jobs[2].key: PENDING}
+    assert manifest.summary() == {PENDING: 1, DONE: 1, EMPTY: 0, FAILED: 1}
+    manifest.close()
+
+    reopened = JobManifest('run', root=str(tmp_path))
+    assert reopened.states()[jobs[0].key] == DONE
+
+
+def test_restart_skips_only_final_windows(tmp_path):
+    # Every cached entry is stale at once, so only the manifest keeps final windows from being re-requested
+    cache = ResponseCache(str(tmp_path / 'cache'), mutable_ttl=-1, today=lambda: TODAY)
+    jobs = [FetchJob('NIFTY', expiry, strike_price=strike, option_type='CE')
+            for expiry in (EXPIRED, LIVE) for strike in (21000.0, 21500.0, 22000.0)]
+    fetch = FakeFetch(empty={21500.0}, failing={22000.0})
+    first = run(jobs, fetch, cache, JobManifest('run', root=str(tmp_path)))
+    assert len(fetch.calls) == 6
+    assert [error is not None for frame, error in first.values()].count(True) == 2
+
+    fetch = FakeFetch(empty={21500.0})
+    second = run(jobs, fetch, cache, JobManifest('run', root=str(tmp_path)))
+    # Expired: done replayed from cache, empty skipped, failed retried. Live: everything requested again.
+    assert sorted(fetch.calls) == [(EXPIRED, 22000.0), (LIVE, 21000.0), (LIVE, 21500.0), (LIVE, 22000.0)]
+    assert second[jobs[0]][0]['CLOSE'].tolist() == [21000.0]
+    assert second[jobs[1]] == (None, None)
+    assert JobManifest('run', root=str(tmp_path)).summary() == {PENDING: 0, DONE: 4, EMPTY: 2, FAILED: 0}
+
+
+def test_restart_without_cache_refetches_live_windows(tmp_path):
+    live = date.today() + timedelta(days=30)
+    jobs = [FetchJob('NIFTY', expiry, strike_price=21000.0, option_type='CE') for expiry in (EXPIRED, live)]
+    run(jobs, FakeFetch(empty={21000.0}), None, JobManifest('run', root=str(tmp_path)))
+    fetch = FakeFetch(empty={21000.0})
+    run(jobs, fetch, None, JobManifest('run', root=str(tmp_path)))
+    assert fetch.calls == [(live, 21000.0)]
@@ -0,0 +1,63 @@
+"""
+Market-Making Simulator Tests
+Fills against stale quotes at each latency, and open inventory marked at intrinsic value on expiry day
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import market_making  # noqa: E402
+
+
+def arrays(mark_on_expiry):
+    """One contract over three days; 1000 contracts a day, so quotes are filled for 10 per side"""
+    return {
+        'high': np.array([100.0, 99.96, 99.7]),
+        'low': np.array([100.0, 99.0, 99.6]),
+        'settle': np.array([100.0, 99.5, 99.65]),
+        'mark': np.array([100.0, 99.5, mark_on_expiry]),
+        'contracts': np.full(3, 1000.0),
+        'lot': np.ones(3),
+    }
+
+
+def test_latency_quotes_off_stale_settles():
+    # Two ticks wide: 0.05 either side of the reference settle
+    fresh = market_making.simulate(arrays(97.0), [0], [3], width=2, cap=100, latency=0)[0]
+    # Day 1 buys 10 at 99.95 off 100, day 2 sells them at 99.55 off 99.5
+    assert np.allclose(fresh, [10 * (99.55 - 99.95), 20, 10, 0, 2])
+
+    stale = market_making.simulate(arrays(97.0), [0], [3], width=2, cap=100, latency=1)[0]
+    # Day 2 still quotes off day 0's 100: its 99.95 bid is picked off and the 10 are marked at 97
+    assert np.allclose(stale, [10 * (97.0 - 99.95), 10, 10, 10, 1])
+
+
+def test_missing_mark_gives_no_pnl():
+    result = market_making.simulate(arrays(np.nan), [0], [3], width=2, cap=100, latency=1)[0]
+    assert np.isnan(result[0]) and result[3] == 10
+
+
+def test_expiry_day_rows_are_marked_at_intrinsic_value(tmp_path, monkeypatch):
+    rows = pd.DataFrame({
+        'SYMBOL': 'NIFTY', 'INSTRUMENT_TYPE': 'OPTIDX',
+        'DATE': pd.to_datetime(['2024-01-24', '2024-01-25', '2024-01-24', '2024-01-25', '2024-01-25']),
+        'EXPIRY': pd.Timestamp('2024-01-25'),
+        'STRIKE PRICE': [21000.0, 21000.0, 21500.0, 21500.0, 22000.0],
+        'OPTION TYPE': ['CE', 'CE', 'PE', 'PE', 'PE'],
+        'HIGH': [460.0, 400.0, 60.0, 150.0, 650.0], 'LOW': [400.0, 340.0, 40.0, 100.0, 600.0],
+        'CLOSE': [450.0, 352.0, 50.0, 148.0, 640.0],
+        'SETTLE PRICE': [450.0, 21352.6, 50.0, 21352.6, 21352.6],
+        'SPOT': [21453.95, 21352.6, 21453.95, 21352.6, np.nan],
+        'TOTAL TRADED QUANTITY': 5000.0, 'MARKET LOT': 50.0,
+    })
+    monkeypatch.setattr(market_making, 'read_enriched', lambda *args, **kwargs: rows)
+    directory, contracts = market_making.prepare_inputs(str(tmp_path), 'NIFTY', cache_dir=str(tmp_path))
+    mark = np.load(os.path.join(directory, 'mark.npy'))
+    # CE 21000: settle then spot - strike; PE 21500: settle then strike - spot; no spot, no mark
+    assert np.allclose(mark, [450.0, 352.6, 50.0, 147.4, np.nan], equal_nan=True)
+    assert contracts['END'].tolist() == [2, 4, 5]
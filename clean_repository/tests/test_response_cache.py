@@ -0,0 +1,80 @@
+"""
+Response Cache Tests
+Expired windows kept forever, live windows refreshed after the TTL, cached empties and LRU eviction
+"""
+
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from response_cache import ResponseCache, cache_key, cached_fetch, is_final  # noqa: E402
+
+TODAY = date(2024, 6, 1)
+EXPIRED = {'symbol': 'NIFTY', 'expiry_date': date(2024, 1, 25), 'from_date': date(2023, 12, 26),
+           'to_date': date(2024, 1, 25), 'strike_price': 21000, 'option_type': 'CE'}
+LIVE = dict(EXPIRED, expiry_date=date(2024, 6, 27), from_date=date(2024, 5, 28), to_date=date(2024, 6, 27))
+
+
+def frame(rows=3):
+    return pd.DataFrame({'DATE': pd.date_range('2024-01-22', periods=rows), 'CLOSE': [100.0 + i for i in range(rows)]})
+
+
+def test_keys_ignore_argument_types_and_order():
+    same = dict(reversed(list(EXPIRED.items())), strike_price=21000.0, expiry_date='2024-01-25')
+    assert cache_key(same) == cache_key(EXPIRED)
+    assert cache_key(dict(EXPIRED, option_type='PE')) != cache_key(EXPIRED)
+
+
+def test_final_windows_end_on_a_past_expiry():
+    assert is_final(EXPIRED, TODAY)
+    assert not is_final(LIVE, TODAY)
+    assert not is_final(dict(EXPIRED, to_date=date(2024, 2, 1)), TODAY)
+    assert not is_final({'symbol': 'NIFTY'}, TODAY)
+
+
+def test_expired_windows_never_go_stale(tmp_path):
+    cache = ResponseCache(str(tmp_path), mutable_ttl=-1, today=lambda: TODAY)
+    cache.store(EXPIRED, frame())
+    cache.store(LIVE, frame())
+    hit, cached = cache.lookup(EXPIRED)
+    assert hit and cached['CLOSE'].tolist() == [100.0, 101.0, 102.0]
+    assert cache.lookup(LIVE) == (False, None)
+    assert cache.lookup(LIVE, allow_stale=True)[0]
+    assert cache.stats()['immutable'] == 1
+
+    # Stale live entries are what evict() drops first
+    assert cache.evict() == 1
+    assert cache.stats()['entries'] == 1
+
+
+def test_live_windows_are_served_within_the_ttl(tmp_path):
+    cache = ResponseCache(str(tmp_path), mutable_ttl=3600, today=lambda: TODAY)
+    cache.store(LIVE, frame())
+    assert cache.lookup(LIVE)[0]
+
+
+def test_empty_responses_are_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path), today=lambda: TODAY)
+    calls = []
+    fetch = cached_fetch(lambda **params: calls.append(params) or pd.DataFrame(), cache)
+    assert fetch(**EXPIRED).empty
+    assert fetch(**EXPIRED) is None
+    assert len(calls) == 1
+
+
+def test_least_recently_used_entries_are_evicted_over_the_size_cap(tmp_path):
+    cache = ResponseCache(str(tmp_path), today=lambda: TODAY)
+    older = dict(EXPIRED, strike_price=20000)
+    cache.store(older, frame(50))
+    cache.store(EXPIRED, frame(50))
+    size = cache.stats()['bytes']
+    cache.lookup(older)
+
+    cache.max_bytes = size - 1
+    assert cache.evict() == 1
+    assert cache.lookup(older)[0] and not cache.lookup(EXPIRED)[0]
+    assert len(os.listdir(tmp_path / 'blobs' / cache_key(older)[:2])) == 1
@@ -0,0 +1,57 @@
+"""
+Stream Writer Tests
+Batches split into expiry-month part files, and rows without a DATE or EXPIRY accounted for
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from parquet_store import list_partitions, read_dataset  # noqa: E402
+from stream_writer import PartitionWriter, RunningSummary  # noqa: E402
+from validator import MISSING_KEY, Validator, read_violations  # noqa: E402
+
+
+def batch():
+    """Five NIFTY call rows over two expiry months, one without a DATE and one without an EXPIRY"""
+    return pd.DataFrame({
+        'DATE': pd.to_datetime(['2024-01-23', '2024-01-24', None, '2024-02-01', '2024-02-02']),
+        'EXPIRY': pd.to_datetime(['2024-01-25', '2024-01-25', '2024-01-25', '2024-02-29', None]),
+        'SYMBOL': 'NIFTY',
+        'INSTRUMENT_TYPE': 'OPTIDX',
+        'OPTION TYPE': 'CE',
+        'STRIKE PRICE': 21500.0,
+        'CLOSE': [100.0, 120.0, 90.0, 80.0, 70.0],
+    })
+
+
+def test_rows_without_keys_are_dropped_and_counted(tmp_path, capsys):
+    writer = PartitionWriter(str(tmp_path))
+    written = writer.write(batch(), 'NIFTY', 'batch')
+    assert len(written) == 2 and writer.rows_written == 3 and writer.rows_dropped == 2
+    assert "dropped 2 rows without DATE/EXPIRY" in capsys.readouterr().out
+    assert sorted(list_partitions(str(tmp_path))) == [('NIFTY', 2024, 1), ('NIFTY', 2024, 2)]
+
+
+def test_rows_without_keys_are_quarantined_by_the_validator(tmp_path):
+    writer = PartitionWriter(str(tmp_path), validator=Validator())
+    writer.write(batch(), 'NIFTY', 'batch')
+    assert writer.rows_written == 3 and writer.rows_dropped == 0
+    violations = read_violations(str(tmp_path))
+    assert (violations['CHECK'] == MISSING_KEY).sum() == 2
+    assert len(read_dataset(str(tmp_path), 'NIFTY')) == 3
+
+
+def test_rewriting_a_batch_replaces_its_rows(tmp_path):
+    writer = PartitionWriter(str(tmp_path))
+    frame = batch().dropna()
+    writer.write(frame, 'NIFTY', 'batch')
+    writer.write(frame, 'NIFTY', 'batch')
+    assert len(read_dataset(str(tmp_path), 'NIFTY')) == 3
+
+    summary = RunningSummary()
+    summary.update(frame)
+    assert summary.records(2024, 1) == 2 and summary.months(2024) == [1, 2]
@@ -0,0 +1,66 @@
+"""
+Tick Stream Tests
+Rolling aggregates against a pandas reference on a dense stream, and the all-or-nothing partition writes
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import tick_stream  # noqa: E402
+
+HORIZONS = [1, 5, 60, 300]
+
+
+def reference(ticks, horizon):
+    """RETURN, VOLUME and UPDATES of one instrument's ticks over `horizon`-second windows of whole seconds"""
+    seconds = ticks['TIMESTAMP'].dt.floor('s')
+    traded = ticks['VOLUME'].diff().fillna(0.0)
+    updated = ((ticks['BID'] != ticks['BID'].shift()) | (ticks['ASK'] != ticks['ASK'].shift())).astype(float)
+    window = f'{horizon}s'
+    volume = pd.Series(traded.to_numpy(), index=seconds).rolling(window).sum().to_numpy()
+    updates = pd.Series(updated.to_numpy(), index=seconds).rolling(window).sum().to_numpy()
+    closes = ticks.groupby(seconds)['LTP'].last().rename('REFERENCE').rename_axis('SECOND').reset_index()
+    targets = pd.DataFrame({'SECOND': seconds - pd.Timedelta(seconds=horizon)})
+    prices = pd.merge_asof(targets, closes, on='SECOND')['REFERENCE'].to_numpy()
+    return np.log(ticks['LTP'].to_numpy() / prices), volume, updates
+
+
+def test_dense_stream_matches_pandas_rolling(tmp_path):
+    # One liquid instrument at about 9 ticks/s: the 300s windows hold thousands of ticks
+    path = tick_stream.write_synthetic(str(tmp_path / 'dense.csv'), 200_000, instruments=1)
+    aggregator = tick_stream.TickAggregator(HORIZONS)
+    ticks = pd.concat([aggregator.update(chunk) for chunk in tick_stream.read_tick_chunks(path, 1 << 20)],
+                      ignore_index=True)
+    assert len(ticks) == 200_000
+
+    for horizon in HORIZONS:
+        returns, volume, updates = reference(ticks, horizon)
+        np.testing.assert_array_equal(ticks[f'VOLUME_{horizon}S'].to_numpy(), volume)
+        np.testing.assert_array_equal(ticks[f'UPDATES_{horizon}S'].to_numpy(), updates)
+        np.testing.assert_allclose(ticks[f'RETURN_{horizon}S'].to_numpy(), returns, rtol=1e-5, atol=1e-6)
+    assert ticks['VOLUME_300S'].max() > 1_000_000
+
+
+def test_failed_ingest_publishes_nothing(tmp_path):
+    path = tick_stream.write_synthetic(str(tmp_path / 'ticks.csv'), 50_000, instruments=10)
+    with open(path, 'a') as f:
+        f.write('2025-08-26 15:30:00.000000,NIFTY,28-Aug-2025,24000,CE,not-a-price,0,1,2,75000\n')
+    output = tmp_path / 'intraday'
+    with pytest.raises(Exception):
+        tick_stream.ingest_ticks(path, str(output), HORIZONS, chunk_bytes=1 << 18)
+    assert not [name for _, _, names in os.walk(output) for name in names]
+
+
+def test_ticks_without_timestamp_are_counted(tmp_path, capsys):
+    path = tick_stream.write_synthetic(str(tmp_path / 'ticks.csv'), 1_000, instruments=4)
+    with open(path, 'a') as f:
+        f.write(',NIFTY,28-Aug-2025,24000,CE,101.5,750,101.45,101.55,75000\n')
+    rows = tick_stream.ingest_ticks(path, str(tmp_path / 'intraday'), HORIZONS)
+    assert rows == {'2025-08-26': 1_000}
+    assert "dropped 1 ticks without a TIMESTAMP" in capsys.readouterr().out
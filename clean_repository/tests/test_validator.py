@@ -0,0 +1,110 @@
+"""
+Validator Tests
+Each check on hand-built batches, and what screen() keeps, quarantines and reports
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import validator  # noqa: E402
+from parquet_store import read_dataset  # noqa: E402
+from schema import normalize  # noqa: E402
+from stream_writer import PartitionWriter  # noqa: E402
+
+# NIFTY closed at 21453.95 on 24 Jan 2024 and 21352.60 on 25 Jan 2024, the January expiry
+EXPIRY = '2024-01-25'
+
+
+def batch(rows):
+    """Canonical option batch of NIFTY January contracts from (DATE, OPTION TYPE, STRIKE, SETTLE) tuples"""
+    frame = pd.DataFrame(rows, columns=['DATE', 'OPTION TYPE', 'STRIKE PRICE', 'SETTLE PRICE'])
+    frame['DATE'] = pd.to_datetime(frame['DATE'])
+    frame['EXPIRY'] = pd.Timestamp(EXPIRY)
+    frame['SYMBOL'] = 'NIFTY'
+    frame['INSTRUMENT_TYPE'] = 'OPTIDX'
+    for column in ('OPEN', 'HIGH', 'LOW', 'CLOSE'):
+        frame[column] = frame['SETTLE PRICE']
+    frame['MARKET LOT'] = 50.0
+    return normalize(frame)
+
+
+def checks(violations):
+    return sorted(zip(violations['ROW'], violations['CHECK'].astype(str)))
+
+
+def test_expiry_day_settlement_is_kept(tmp_path):
+    # On expiry day SETTLE PRICE is the final settlement price (about spot) for calls and puts alike
+    frame = batch([
+        (EXPIRY, 'CE', 21000.0, 21352.6),
+        (EXPIRY, 'PE', 21500.0, 21352.6),
+        ('2024-01-24', 'CE', 21000.0, 21400.0),
+        ('2024-01-24', 'PE', 21500.0, 21450.0),
+    ])
+    check = validator.Validator()
+    assert checks(check.validate(frame, 'NIFTY')) == [(2, validator.SETTLE_SPOT), (3, validator.SETTLE_SPOT)]
+
+    kept = check.screen(frame, str(tmp_path), 'NIFTY', 'expiry')
+    assert list(kept['DATE'].dt.strftime('%Y-%m-%d')) == [EXPIRY, EXPIRY]
+    assert check.rows_quarantined == 2
+
+
+def test_checks_flag_the_offending_rows():
+    frame = batch([
+        ('2024-01-23', 'CE', 21500.0, 100.0),
+        ('2024-01-24', 'CE', 21500.0, 120.0),
+        ('2024-01-24', 'CE', 21500.0, 120.0),
+        ('2024-01-23', 'PE', 21000.0, 80.0),
+        ('2024-01-24', 'PE', 21000.0, 60.0),
+    ])
+    frame.loc[0, 'LOW'] = 105.0                # above OPEN/CLOSE
+    frame['OPEN INTEREST'] = [1000.0, 1500.0, 1500.0, 2000.0, 1800.0]
+    frame['CHANGE IN OI'] = [0.0, 500.0, 500.0, 0.0, -100.0]  # PE: 2000 - 100 != 1800
+    frame.loc[4, 'MARKET LOT'] = 25.0
+
+    violations = validator.Validator().validate(frame, 'NIFTY')
+    assert checks(violations) == [
+        (0, validator.OHLC),
+        (2, validator.DUPLICATE),
+        (4, validator.LOT_CHANGE),
+        (4, validator.OI_CONTINUITY),
+    ]
+    oi = violations[violations['CHECK'] == validator.OI_CONTINUITY]
+    assert oi['VALUE'].iloc[0] == 1800.0 and oi['EXPECTED'].iloc[0] == 1900.0
+
+
+def test_screen_quarantines_only_blocking_checks(tmp_path):
+    frame = batch([
+        ('2024-01-23', 'CE', 21500.0, 100.0),
+        ('2024-01-23', 'CE', 21500.0, 100.0),
+        ('2024-01-24', 'CE', 21500.0, 120.0),
+    ])
+    frame.loc[2, 'MARKET LOT'] = 25.0
+    check = validator.Validator()
+    kept = check.screen(frame, str(tmp_path), 'NIFTY', 'batch')
+
+    assert len(kept) == 2 and check.rows_quarantined == 1
+    assert len(pd.read_parquet(tmp_path / '_quarantine' / 'symbol=NIFTY' / 'rows-batch.parquet')) == 1
+    report = validator.read_violations(str(tmp_path))
+    assert sorted(report['CHECK'].astype(str)) == [validator.DUPLICATE, validator.LOT_CHANGE]
+    assert np.all(report['BATCH'] == 'batch')
+
+    # A clean rewrite of the batch clears what the earlier one quarantined
+    check.screen(frame.iloc[[0]], str(tmp_path), 'NIFTY', 'batch')
+    assert validator.read_violations(str(tmp_path)).empty
+
+
+def test_writer_counts_only_rows_that_reach_the_store(tmp_path):
+    frame = batch([
+        ('2024-01-23', 'CE', 21500.0, 100.0),
+        ('2024-01-23', 'CE', 21500.0, 100.0),
+        ('2024-01-24', 'PE', 21000.0, 60.0),
+    ])
+    writer = PartitionWriter(str(tmp_path), validator=validator.Validator())
+    writer.write(frame, 'NIFTY', 'batch')
+    assert writer.rows_written == 2
+    assert len(read_dataset(str(tmp_path), 'NIFTY')) == 2
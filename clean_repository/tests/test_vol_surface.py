@@ -0,0 +1,123 @@
+"""
+Volatility Surface Tests
+Fixed days-to-expiry buckets on the tenor axis, in-place range updates, and re-reading only changed Greeks partitions
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import vol_surface  # noqa: E402
+from greeks import greeks_root  # noqa: E402
+from implied_vol import CONVERGED  # noqa: E402
+
+MONEYNESS = [0.9, 1.0, 1.1]
+DELTAS = [25, 50, 75]
+TENORS = [7, 14, 30, 60, 90]
+
+
+def quotes(date, expiry, iv, forward=100.0):
+    """Greeks rows of one (date, expiry) with a flat smile at `iv`, calls and puts at every strike"""
+    strikes = np.arange(80.0, 125.0, 5.0)
+    call_delta = np.linspace(0.95, 0.05, len(strikes))
+    frame = pd.DataFrame({
+        'STRIKE PRICE': np.r_[strikes, strikes],
+        'OPTION TYPE': ['CE'] * len(strikes) + ['PE'] * len(strikes),
+        'DELTA': np.r_[call_delta, call_delta - 1.0],
+    })
+    frame['SYMBOL'] = 'NIFTY'
+    frame['INSTRUMENT_TYPE'] = 'OPTIDX'
+    frame['DATE'] = pd.Timestamp(date)
+    frame['EXPIRY'] = pd.Timestamp(expiry)
+    frame['FORWARD'] = frame['SPOT'] = forward
+    frame['TIME_TO_EXPIRY'] = (pd.Timestamp(expiry) - pd.Timestamp(date)).days / 365.0
+    frame['IV'] = iv
+    frame['IV_STATUS'] = CONVERGED
+    return frame
+
+
+def chain(levels):
+    return pd.concat([quotes(date, expiry, iv) for (date, expiry), iv in levels.items()], ignore_index=True)
+
+
+# Days to expiry: 2, 9, 16, 23, 58 and 86 on 2 Jan; 5, 40, 68 and 159 on 20 Jan
+LEVELS = {
+    ('2024-01-02', '2024-01-04'): 0.10, ('2024-01-02', '2024-01-11'): 0.11, ('2024-01-02', '2024-01-18'): 0.12,
+    ('2024-01-02', '2024-01-25'): 0.13, ('2024-01-02', '2024-02-29'): 0.14, ('2024-01-02', '2024-03-28'): 0.15,
+    ('2024-01-20', '2024-01-25'): 0.20, ('2024-01-20', '2024-02-29'): 0.21, ('2024-01-20', '2024-03-28'): 0.22,
+    ('2024-01-20', '2024-06-27'): 0.23,
+}
+
+
+def test_tenor_axis_is_fixed_days_to_expiry_buckets(tmp_path):
+    surface = vol_surface.VolSurface(MONEYNESS, DELTAS, TENORS)
+    changed = surface.update(chain(LEVELS))
+    assert len(changed) == 2
+
+    # Each bucket keeps its nearest expiry; 159 days is past the last bucket
+    atm = surface.atm_term_structure()
+    assert list(atm.index.strftime('%Y-%m-%d')) == ['2024-01-02', '2024-01-20']
+    assert atm.columns.tolist() == TENORS
+    np.testing.assert_allclose(atm.to_numpy(), [[0.10, 0.11, 0.12, 0.14, 0.15], [0.20, np.nan, np.nan, 0.21, 0.22]],
+                               atol=1e-6)
+    assert str(surface.expiries[0, 2]) == '2024-01-18'
+    assert str(surface.expiries[1, 3]) == '2024-02-29'
+    assert np.allclose(surface.front_atm(), [0.10, 0.20])
+    assert np.allclose(surface.smile('2024-01-20', tenor=90), 0.22)
+
+    surface.save(str(tmp_path / 'surface'))
+    loaded = vol_surface.VolSurface.load(str(tmp_path / 'surface'))
+    assert loaded.tenor_days.tolist() == TENORS
+    for name in vol_surface.ARRAYS:
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(surface, name))
+
+
+def test_update_within_ranges_keeps_other_dates():
+    surface = vol_surface.VolSurface(MONEYNESS, DELTAS, TENORS)
+    surface.update(chain(LEVELS))
+    before = surface.moneyness_iv[0].copy()
+
+    moved = {key: iv + 0.05 for key, iv in LEVELS.items() if key[0] == '2024-01-20'}
+    changed = surface.update(chain(moved), ranges=[('2024-01-20', '2024-01-20')])
+    assert [str(date) for date in changed] == ['2024-01-20']
+    assert len(surface) == 2
+    np.testing.assert_array_equal(surface.moneyness_iv[0], before)
+    assert np.allclose(surface.atm_term_structure().loc['2024-01-20', 90], 0.27)
+
+    # Unchanged quotes are not recomputed
+    assert not len(surface.update(chain(moved), ranges=[('2024-01-20', '2024-01-20')]))
+
+
+def write_partition(root, expiry_month, frame):
+    directory = os.path.join(greeks_root(root), 'symbol=NIFTY', 'year=2024', f'month={expiry_month}')
+    os.makedirs(directory, exist_ok=True)
+    frame.to_parquet(os.path.join(directory, 'part-0.parquet'), index=False)
+
+
+def test_dataset_update_rereads_only_changed_partitions(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    monkeypatch.setattr(vol_surface, 'greeks_dataset', lambda *args, **kwargs: None)
+    reads = []
+    read_ranges = vol_surface._read_ranges
+    monkeypatch.setattr(vol_surface, '_read_ranges',
+                        lambda *args: reads.append(read_ranges(*args)) or reads[-1])
+
+    january = chain({('2024-01-02', '2024-01-25'): 0.13, ('2024-01-10', '2024-01-25'): 0.14})
+    february = chain({('2024-02-01', '2024-02-29'): 0.20, ('2024-02-08', '2024-02-29'): 0.21})
+    write_partition(root, '01', january)
+    write_partition(root, '02', february)
+    surface, changed = vol_surface.update_dataset_surface(root, 'NIFTY')
+    assert len(changed) == 4 and len(reads[-1]) == len(january) + len(february)
+
+    assert not len(vol_surface.update_dataset_surface(root, 'NIFTY')[1])
+    assert len(reads) == 1
+
+    write_partition(root, '02', chain({('2024-02-01', '2024-02-29'): 0.20, ('2024-02-08', '2024-02-29'): 0.25}))
+    surface, changed = vol_surface.update_dataset_surface(root, 'NIFTY')
+    assert [str(date) for date in changed] == ['2024-02-08']
+    assert len(reads[-1]) == len(february)
+    assert np.allclose(surface.front_atm(), [0.13, 0.14, 0.20, 0.25])